@@ -0,0 +1,172 @@
+"""
+One Endpoint per route of users/urls.py and inventory/urls.py (and method,
+where a route serves several). Each request is built from a shared Fixtures
+object and a request index, so a phase can replay the same sequence and
+writes never collide between phases.
+"""
+from datetime import timedelta
+import json
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from inventory.models import BloodBag, BloodRequest
+from inventory.seeding import PASSWORD
+from users.authentication import get_tokens_for_user
+
+User = get_user_model()
+
+BLOOD_GROUPS = [group for group, _ in BloodBag.BLOOD_GROUPS]
+SAMPLE_SIZE = 200
+
+
+class Fixtures:
+    """Seeded rows the requests point at, read once before the first phase."""
+
+    def __init__(self):
+        def emails(user_type, **filters):
+            return list(
+                User.objects.filter(user_type=user_type, **filters)
+                .order_by('email').values_list('email', flat=True)[:SAMPLE_SIZE]
+            )
+
+        self.banks = emails('BLOOD_BANK', blood_bank_profile__status='VERIFIED')
+        self.staff = emails('STAFF')
+        self.donors = emails('DONOR')
+        self.consumers = emails('CONSUMER')
+        self.pending_requests = [
+            str(pk) for pk in BloodRequest.objects.filter(status='PENDING').order_by('id').values_list('id', flat=True)
+        ]
+        self.tokens = {
+            user_type: str(get_tokens_for_user(User.objects.get(email=sample[0])).access_token)
+            for user_type, sample in [
+                ('BLOOD_BANK', self.banks), ('STAFF', self.staff),
+                ('DONOR', self.donors), ('CONSUMER', self.consumers),
+            ]
+        }
+        self.bank_tokens = [
+            str(get_tokens_for_user(user).access_token)
+            for user in User.objects.filter(email__in=self.banks[:20]).select_related('blood_bank_profile')
+        ]
+
+    @staticmethod
+    def pick(sample, index):
+        return sample[index % len(sample)]
+
+
+class Endpoint:
+    """
+    name: stable key used in results and baselines.
+    path(fixtures, i) and body(fixtures, i) build request i; token(fixtures, i)
+    returns the bearer token to send, if any.
+    """
+
+    def __init__(self, name, method, path, body=None, token=None):
+        self.name = name
+        self.method = method
+        self.path = path if callable(path) else (lambda fixtures, i, path=path: path)
+        self.body = body
+        self.token = token
+
+    def request(self, fixtures, index):
+        body = self.body(fixtures, index) if self.body else None
+        token = self.token(fixtures, index) if self.token else None
+        return (
+            self.method,
+            self.path(fixtures, index),
+            json.dumps(body) if body is not None else None,
+            {'Authorization': f'Bearer {token}'} if token else {},
+        )
+
+
+def _registration(kind, **profile):
+    def body(fixtures, i):
+        return dict(email=f'bench-{kind}{i}@bench.test', password=PASSWORD, name=f'Bench {kind} {i}',
+                    contact='+919876543210', **profile)
+    return body
+
+
+def _staff_registration(fixtures, i):
+    body = _registration('staff', role='Technician')(fixtures, i)
+    body['blood_bank_email'] = fixtures.pick(fixtures.banks, i)
+    return body
+
+
+def _bag(fixtures, i):
+    today = timezone.localdate()
+    return {
+        'blood_group': BLOOD_GROUPS[i % len(BLOOD_GROUPS)],
+        'volume_ml': '450.00',
+        'collection_date': str(today),
+        'expiration_date': str(today + timedelta(days=42)),
+        'donor_email': fixtures.pick(fixtures.donors, i),
+        'blood_bank_email': fixtures.pick(fixtures.banks, i),
+    }
+
+
+def _blood_request(fixtures, i):
+    return {
+        'consumer_email': fixtures.pick(fixtures.consumers, i),
+        'blood_bank_email': fixtures.pick(fixtures.banks, i),
+        'blood_group': BLOOD_GROUPS[i % len(BLOOD_GROUPS)],
+        'units_required': 1 + i % 3,
+        'priority': 'NORMAL',
+        'patient_name': f'Patient {i}',
+        'patient_age': 30,
+        'patient_gender': 'Female',
+        'hospital_name': 'Bench Hospital',
+        'required_date': str(timezone.localdate() + timedelta(days=2)),
+    }
+
+
+PLACE = dict(address='1 Bench Road', city='Pune', state='Maharashtra', pincode=411001)
+
+ENDPOINTS = [
+    # users/urls.py
+    Endpoint('login', 'POST', '/api/login/',
+             body=lambda f, i: {'email': f.pick(f.donors, i), 'password': PASSWORD}),
+    Endpoint('blood_banks.list', 'GET', '/api/blood-banks/'),
+    Endpoint('blood_banks.verified', 'GET', '/api/blood-banks/verified/'),
+    Endpoint('blood_banks.detail', 'GET', lambda f, i: f'/api/blood-banks/{f.pick(f.banks, i)}/'),
+    Endpoint('blood_banks.register', 'POST', '/api/blood-banks/', body=_registration('bank', **PLACE)),
+    Endpoint('blood_banks.update', 'PUT', lambda f, i: f'/api/blood-banks/{f.pick(f.banks, i)}/',
+             body=lambda f, i: {'contact': f'+9198765{i % 100000:05d}'}),
+    Endpoint('blood_banks.delete', 'DELETE', lambda f, i: f'/api/blood-banks/bench-bank{i}@bench.test/'),
+    Endpoint('staff.list', 'GET', '/api/staff/'),
+    Endpoint('staff.detail', 'GET', lambda f, i: f'/api/staff/{f.pick(f.staff, i)}/'),
+    Endpoint('staff.register', 'POST', '/api/staff/', body=_staff_registration),
+    Endpoint('staff.update', 'PUT', lambda f, i: f'/api/staff/{f.pick(f.staff, i)}/',
+             body=lambda f, i: {'role': 'Technician'}),
+    Endpoint('staff.delete', 'DELETE', lambda f, i: f'/api/staff/bench-staff{i}@bench.test/'),
+    Endpoint('donors.list', 'GET', '/api/donors/'),
+    Endpoint('donors.detail', 'GET', lambda f, i: f'/api/donors/{f.pick(f.donors, i)}/'),
+    Endpoint('donors.register', 'POST', '/api/donors/',
+             body=_registration('donor', blood_group='O+', **PLACE)),
+    Endpoint('donors.update', 'PUT', lambda f, i: f'/api/donors/{f.pick(f.donors, i)}/',
+             body=lambda f, i: {'city': 'Pune'}),
+    Endpoint('donors.delete', 'DELETE', lambda f, i: f'/api/donors/bench-donor{i}@bench.test/'),
+    Endpoint('consumers.list', 'GET', '/api/consumers/'),
+    Endpoint('consumers.detail', 'GET', lambda f, i: f'/api/consumers/{f.pick(f.consumers, i)}/'),
+    Endpoint('consumers.register', 'POST', '/api/consumers/',
+             body=_registration('consumer', blood_group='B+', **PLACE)),
+    Endpoint('consumers.update', 'PUT', lambda f, i: f'/api/consumers/{f.pick(f.consumers, i)}/',
+             body=lambda f, i: {'city': 'Pune'}),
+    Endpoint('consumers.delete', 'DELETE', lambda f, i: f'/api/consumers/bench-consumer{i}@bench.test/'),
+    Endpoint('test.bloodbank', 'GET', '/api/test/bloodbank/', token=lambda f, i: f.tokens['BLOOD_BANK']),
+    Endpoint('test.staff', 'GET', '/api/test/staff/', token=lambda f, i: f.tokens['STAFF']),
+    Endpoint('test.donor', 'GET', '/api/test/donor/', token=lambda f, i: f.tokens['DONOR']),
+    Endpoint('test.consumer', 'GET', '/api/test/consumer/', token=lambda f, i: f.tokens['CONSUMER']),
+
+    # inventory/urls.py
+    Endpoint('bags.create', 'POST', '/inventory/create/', body=_bag),
+    Endpoint('bags.create_batch', 'POST', '/inventory/create/batch/',
+             body=lambda f, i: [_bag(f, i * 50 + n) for n in range(50)]),
+    Endpoint('requests.create', 'POST', '/inventory/request/create/', body=_blood_request),
+    Endpoint('requests.respond', 'PATCH',
+             lambda f, i: f'/inventory/request/{f.pick(f.pending_requests, i)}/respond/',
+             body=lambda f, i: {'status': 'APPROVED'}),
+    Endpoint('search.by_blood_group', 'GET',
+             lambda f, i: f'/inventory/blood-banks/{BLOOD_GROUPS[i % len(BLOOD_GROUPS)]}/'),
+    Endpoint('dashboard', 'GET', '/inventory/hospital-dashboard/',
+             token=lambda f, i: f.pick(f.bank_tokens, i)),
+]
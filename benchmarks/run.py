@@ -0,0 +1,327 @@
+"""
+Load test of every endpoint in users/urls.py and inventory/urls.py.
+
+    python -m benchmarks.run [--scale small] [--requests 200] [--concurrency 8]
+                             [--phases client http] [--url http://host:port]
+                             [--output results.json] [--baseline benchmarks/baselines/small.json]
+
+The scale's database is seeded once into a template file (--data-dir) and
+copied for every run, so each run starts from the same rows. The `client`
+phase sends requests one at a time through the Django test client and also
+counts queries; the `http` phase sends them from --concurrency threads over
+keep-alive connections, to --url or to a threaded WSGI server started in
+this process. Results (throughput, latency percentiles, query counts and
+status codes per endpoint) are written as JSON. With --baseline, endpoints
+that got slower or less throughput than --threshold allows, run more
+queries or fail more requests are listed and the exit status is 1. Latency
+baselines only mean something on the machine that recorded them; query
+counts hold anywhere.
+"""
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import http.client
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import django
+
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(ordered, p):
+    """Nearest rank percentile of an already sorted list."""
+    return ordered[max(1, math.ceil(p / 100 * len(ordered))) - 1]
+
+
+def summarize(latencies, statuses, wall, queries=None):
+    ordered = sorted(latencies)
+    result = {
+        'requests': len(ordered),
+        # 4xx included: a request the seeded data should satisfy and does not is a failure too
+        'failed': sum(count for status, count in statuses.items() if status == 0 or status >= 400),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'wall_seconds': round(wall, 4),
+        'throughput_rps': round(len(ordered) / wall, 2) if wall else None,
+        'latency_ms': {
+            'mean': round(sum(ordered) / len(ordered) * 1000, 3),
+            **{f'p{p}': round(percentile(ordered, p) * 1000, 3) for p in LATENCY_PERCENTILES},
+            'max': round(ordered[-1] * 1000, 3),
+        },
+    }
+    if queries is not None:
+        result['queries'] = {'mean': round(sum(queries) / len(queries), 2), 'max': max(queries)}
+    return result
+
+
+def prepare_database(scale, seed_value, data_dir, reseed, jobs):
+    """Points the default database at a fresh copy of the seeded template for this scale."""
+    from django.core.management import call_command
+    from django.db import connection
+    from inventory.seeding import SCALES, seed
+
+    def use(path):
+        connection.close()
+        connection.settings_dict['NAME'] = path
+
+    os.makedirs(data_dir, exist_ok=True)
+    template = os.path.join(data_dir, f'{scale}-{seed_value}.sqlite3')
+    working = os.path.join(data_dir, f'{scale}-{seed_value}.run.sqlite3')
+
+    if reseed or not os.path.exists(template):
+        building = f'{template}.tmp'
+        if os.path.exists(building):
+            os.remove(building)
+        use(building)
+        started = time.perf_counter()
+        call_command('migrate', verbosity=0)
+        counts = seed(SCALES[scale], seed_value, jobs)
+        connection.close()
+        os.replace(building, template)
+        print(f'Seeded {scale} {counts} in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+    shutil.copyfile(template, working)
+    use(working)
+    call_command('migrate', verbosity=0)
+
+
+def run_client(endpoints, fixtures, requests, warmup, offset):
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client(raise_request_exception=False)
+    results = {}
+    for endpoint in endpoints:
+        cache.clear()
+        latencies, statuses, queries = [], Counter(), []
+        started = None
+        for i in range(warmup + requests):
+            if i == warmup:
+                started = time.perf_counter()
+            method, path, body, headers = endpoint.request(fixtures, offset + i)
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = client.generic(method, path, body or '', content_type='application/json', headers=headers)
+                elapsed = time.perf_counter() - start
+            if i >= warmup:
+                latencies.append(elapsed)
+                statuses[response.status_code] += 1
+                queries.append(len(captured.captured_queries))
+        results[endpoint.name] = summarize(latencies, statuses, time.perf_counter() - started, queries)
+        print_line('client', endpoint.name, results[endpoint.name])
+    return results
+
+
+class LocalServer:
+    """The project's WSGI application on a threaded server on a free local port."""
+
+    def __init__(self):
+        from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+        from django.core.handlers.wsgi import WSGIHandler
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+        self.server.set_app(WSGIHandler())
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self.url
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run_http(endpoints, fixtures, requests, warmup, offset, url, concurrency, timeout):
+    target = urlsplit(url)
+    local = threading.local()
+
+    def send(endpoint, index):
+        method, path, body, headers = endpoint.request(fixtures, index)
+        headers = {**headers, 'Content-Type': 'application/json', 'Host': target.netloc}
+        for attempt in range(2):
+            if getattr(local, 'connection', None) is None:
+                local.connection = http.client.HTTPConnection(target.hostname, target.port, timeout=timeout)
+            start = time.perf_counter()
+            try:
+                local.connection.request(method, path, body=body, headers=headers)
+                response = local.connection.getresponse()
+                response.read()
+                if response.will_close:
+                    local.connection.close()
+                    local.connection = None
+                return time.perf_counter() - start, response.status
+            except (OSError, http.client.HTTPException):
+                # Keep-alive connection dropped by the server: reconnect once
+                local.connection.close()
+                local.connection = None
+        return time.perf_counter() - start, 0
+
+    from django.core.cache import cache
+
+    results = {}
+    with ThreadPoolExecutor(concurrency) as pool:
+        for endpoint in endpoints:
+            cache.clear()
+            for i in range(warmup):
+                send(endpoint, offset + i)
+
+            indexes = itertools.count(offset + warmup)
+            stop = offset + warmup + requests
+
+            def worker():
+                timings = []
+                for index in indexes:
+                    if index >= stop:
+                        return timings
+                    timings.append(send(endpoint, index))
+
+            started = time.perf_counter()
+            timings = [t for future in [pool.submit(worker) for _ in range(concurrency)] for t in future.result()]
+            wall = time.perf_counter() - started
+
+            results[endpoint.name] = summarize(
+                [elapsed for elapsed, _ in timings], Counter(status for _, status in timings), wall
+            )
+            print_line('http', endpoint.name, results[endpoint.name])
+    return results
+
+
+def print_line(phase, name, result):
+    latency = result['latency_ms']
+    queries = f"  q {result['queries']['mean']:6.1f}" if 'queries' in result else ''
+    print(f"{phase:<6} {name:<24} {result['throughput_rps']:9.1f} req/s  "
+          f"p50 {latency['p50']:8.2f}  p95 {latency['p95']:8.2f}  p99 {latency['p99']:8.2f} ms"
+          f"{queries}  failed {result['failed']}", file=sys.stderr)
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """
+    [(phase, endpoint, metric, baseline value, current value), ...] that regressed.
+    Timing changes under min_delta_ms are noise on millisecond endpoints and ignored.
+    """
+    regressions = []
+    for phase, endpoints in baseline['results'].items():
+        for name, base in endpoints.items():
+            current = results.get(phase, {}).get(name)
+            if current is None:
+                continue
+            before, after = base['latency_ms'], current['latency_ms']
+            if after['p95'] > before['p95'] * (1 + threshold) and after['p95'] - before['p95'] > min_delta_ms:
+                regressions.append((phase, name, 'p95 ms', before['p95'], after['p95']))
+            if current['throughput_rps'] < base['throughput_rps'] * (1 - threshold) and \
+                    after['mean'] - before['mean'] > min_delta_ms:
+                regressions.append((phase, name, 'req/s', base['throughput_rps'], current['throughput_rps']))
+            if 'queries' in base and current['queries']['max'] > base['queries']['max']:
+                regressions.append((phase, name, 'queries', base['queries']['max'], current['queries']['max']))
+            if current['failed'] > base['failed']:
+                regressions.append((phase, name, 'failed', base['failed'], current['failed']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', default='small', help='smoke, small or large (see inventory.seeding.SCALES)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'raktkadi-benchmarks'))
+    parser.add_argument('--reseed', action='store_true', help='rebuild the seeded template database')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='processes seeding the template')
+    parser.add_argument('--phases', nargs='+', choices=['client', 'http'], default=['client', 'http'])
+    parser.add_argument('--endpoints', nargs='+', help='only these endpoint names (prefixes match)')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per endpoint and phase')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--url', help='drive this server in the http phase instead of a local one')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--output', help='write the results JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative p95 latency increase / throughput drop')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                        help='ignore latency changes smaller than this')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'raktkadi.settings')
+    django.setup()
+    # Failed requests are counted in the results, not printed one by one
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    from inventory.seeding import SCALES
+    if args.scale not in SCALES:
+        parser.error(f'unknown scale {args.scale}, expected one of {", ".join(SCALES)}')
+    prepare_database(args.scale, args.seed, args.data_dir, args.reseed, args.jobs)
+
+    from .endpoints import ENDPOINTS, Fixtures
+    endpoints = [
+        endpoint for endpoint in ENDPOINTS
+        if not args.endpoints or any(endpoint.name.startswith(prefix) for prefix in args.endpoints)
+    ]
+    fixtures = Fixtures()
+    results = {}
+    span = args.warmup + args.requests
+    if 'client' in args.phases:
+        results['client'] = run_client(endpoints, fixtures, args.requests, args.warmup, offset=0)
+    if 'http' in args.phases:
+        if args.url:
+            results['http'] = run_http(endpoints, fixtures, args.requests, args.warmup, span,
+                                       args.url, args.concurrency, args.timeout)
+        else:
+            with LocalServer() as url:
+                results['http'] = run_http(endpoints, fixtures, args.requests, args.warmup, span,
+                                           url, args.concurrency, args.timeout)
+
+    report = {
+        'meta': {
+            'scale': args.scale,
+            'seed': args.seed,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'concurrency': args.concurrency,
+            'url': args.url,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'machine': platform.platform(),
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline['meta']['scale'] != args.scale:
+            print(f"Warning: baseline was recorded at scale {baseline['meta']['scale']}", file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for phase, name, metric, before, after in regressions:
+            print(f'REGRESSION {phase} {name}: {metric} {before} -> {after}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print('No regressions against the baseline', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
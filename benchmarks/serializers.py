@@ -0,0 +1,97 @@
+"""
+ModelSerializer vs the values() read path on the user list serializers.
+
+    python -m benchmarks.serializers [--rows 1000 10000 100000] [--repeat 3]
+
+Runs against a throwaway test database, checks both paths render the same
+bytes and prints the best of --repeat timings for each row count.
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'raktkadi.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+
+from users.models import BloodBankProfile, DonorProfile
+from users.serializers import BloodBankSerializer, DonorSerializer
+
+User = get_user_model()
+
+
+def seed(rows):
+    User.objects.all().delete()
+    users = User.objects.bulk_create(
+        [User(email=f'bank{i}@bench.test', name=f'Bank {i}', contact='+919999999999', user_type='BLOOD_BANK')
+         for i in range(rows)]
+        + [User(email=f'donor{i}@bench.test', name=f'Donor {i}', contact='+919999999999', user_type='DONOR')
+           for i in range(rows)],
+        batch_size=2000
+    )
+    BloodBankProfile.objects.bulk_create(
+        [BloodBankProfile(user=user, address='Address', city='Pune', pincode='411001', status='VERIFIED',
+                          license_document=f'blood_bank_documents/license/{user.email}.pdf')
+         for user in users[:rows]],
+        batch_size=2000
+    )
+    DonorProfile.objects.bulk_create(
+        [DonorProfile(user=user, blood_group='O+', address='Address', pincode='411001')
+         for user in users[rows:]],
+        batch_size=2000
+    )
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def run(rows, repeat):
+    seed(rows)
+    renderer = JSONRenderer()
+    for serializer_class, user_type in [(BloodBankSerializer, 'BLOOD_BANK'), (DonorSerializer, 'DONOR')]:
+        queryset = User.objects.filter(user_type=user_type).order_by('email')
+        reader = serializer_class.values_serializer()
+
+        serializer_time, expected = best_of(repeat, lambda: renderer.render(
+            serializer_class(serializer_class.setup_eager_loading(queryset), many=True).data
+        ))
+        values_time, actual = best_of(repeat, lambda: renderer.render(
+            reader.data(reader.values(queryset))
+        ))
+        if actual != expected:
+            raise SystemExit(f'{serializer_class.__name__}: values() output differs from the serializer')
+        print(f'{serializer_class.__name__:<20} {rows:>7} rows  '
+              f'serializer {serializer_time * 1000:9.1f}ms  values {values_time * 1000:9.1f}ms  '
+              f'x{serializer_time / values_time:.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        for rows in args.rows:
+            run(rows, args.repeat)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Gunicorn settings for serving raktkadi.asgi with Uvicorn workers:
+
+    gunicorn raktkadi.asgi:application -c gunicorn.conf.py
+
+Each worker runs an event loop, so the async views (blood bank search,
+verified blood banks, hospital dashboard) serve many connections without a
+thread each. Workers are recycled after GUNICORN_MAX_REQUESTS requests and
+`kill -HUP <master pid>` replaces them gracefully with freshly loaded code.
+Without REDIS_URL the cache is per process (see settings) and a worker would
+keep serving pages another one has invalidated, so one worker is started;
+with it, 2 * cores + 1. GUNICORN_WORKERS overrides either default.
+
+The master never imports Django; everything below is plain configuration.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+default_workers = multiprocessing.cpu_count() * 2 + 1 if os.environ.get('REDIS_URL') else 1
+workers = int(os.environ.get('GUNICORN_WORKERS', default_workers))
+worker_class = 'uvicorn_worker.UvicornWorker'
+
+# Recycle workers to bound memory growth; the jitter keeps them from all
+# restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Seconds: a silent worker is killed after timeout, a worker asked to stop
+# (HUP, recycling, shutdown) gets graceful_timeout to finish its requests
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Each worker imports the app itself: HUP then picks up new code, and no
+# database connection or logging thread is shared across a fork
+preload_app = False
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+# Workers share their metrics through this directory (raktkadi.metrics)
+os.environ.setdefault('METRICS_MULTIPROCESS_DIR', os.path.join(tempfile.gettempdir(), 'raktkadi-metrics'))
+
+
+def on_starting(server):
+    if server.cfg.workers > 1 and not os.environ.get('REDIS_URL'):
+        server.log.warning(
+            "%s workers without REDIS_URL: each one caches on its own and may serve stale pages",
+            server.cfg.workers
+        )
+    directory = os.environ['METRICS_MULTIPROCESS_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def worker_exit(server, worker):
+    # Keep the counts of a recycled worker without keeping its file
+    from raktkadi.metrics import registry
+    registry.retire()
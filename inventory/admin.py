@@ -4,6 +4,8 @@ from django.db.models import Count
 from django.template.loader import render_to_string
 from django.utils.safestring import mark_safe
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import Sum
 
 class BloodBagAdmin(admin.ModelAdmin):
     list_display = ('blood_group', 'volume_ml', 'collection_date', 'expiration_date', 'status', 'barcode', 'blood_bank', 'donor')
@@ -11,6 +13,17 @@ class BloodBagAdmin(admin.ModelAdmin):
     list_filter = ('blood_group', 'status', 'collection_date', 'expiration_date', 'blood_bank')
     ordering = ('-collection_date',)
     readonly_fields = ('barcode',)
+
+    def delete_queryset(self, request, queryset):
+        # Bulk deletes bypass BloodBag.delete, so settle the counters here
+        with transaction.atomic():
+            deltas = {
+                (row['blood_bank_id'], row['blood_group'], row['status']): -row['units']
+                for row in queryset.order_by().values('blood_bank_id', 'blood_group', 'status')
+                .annotate(units=Count('id'))
+            }
+            super().delete_queryset(request, queryset)
+            BankStockLevel.adjust(deltas)
     
     def changelist_view(self, request, extra_context=None):
         stats_html = self.get_stats_html(request)
@@ -18,19 +31,25 @@ class BloodBagAdmin(admin.ModelAdmin):
         return super().changelist_view(request, extra_context=extra_context)
     
     def get_stats_html(self, request):
-        qs = self.get_queryset(request)
-        
+        # Read from the materialized counters instead of recounting bags
+        by_status = dict(
+            BankStockLevel.objects.values('status').annotate(
+                units=Sum('units')
+            ).values_list('status', 'units')
+        )
+
         # Calculate statistics
         context = {
-            'total_bags': qs.count(),
-            'available_bags': qs.filter(status='AVAILABLE').count(),
-            'reserved_bags': qs.filter(status='RESERVED').count(),
-            'used_bags': qs.filter(status='USED').count(),
-            'expired_bags': qs.filter(status='EXPIRED').count(),
-            'blood_group_stats': qs.filter(
-                status='AVAILABLE'
+            'total_bags': sum(by_status.values()),
+            'available_bags': by_status.get('AVAILABLE', 0),
+            'reserved_bags': by_status.get('RESERVED', 0),
+            'used_bags': by_status.get('USED', 0),
+            'expired_bags': by_status.get('EXPIRED', 0),
+            'blood_group_stats': BankStockLevel.objects.filter(
+                status='AVAILABLE',
+                units__gt=0
             ).values('blood_group').annotate(
-                count=Count('id')
+                count=Sum('units')
             ).order_by('blood_group')
         }
         return render_to_string('admin/inventory/blood_bags.html', context)
@@ -47,6 +66,16 @@ class InventoryAlertAdmin(admin.ModelAdmin):
     list_filter = ('alert_type', 'blood_group', 'is_active', 'created_at', 'resolved_at')
     ordering = ('-created_at',)
 
+class BankStockLevelAdmin(admin.ModelAdmin):
+    list_display = ('blood_bank', 'blood_group', 'status', 'units')
+    list_filter = ('blood_group', 'status')
+    search_fields = ('blood_bank__user__email',)
+    readonly_fields = ('blood_bank', 'blood_group', 'status', 'units')
+
+class AlertThresholdAdmin(admin.ModelAdmin):
+    list_display = ('blood_bank', 'low_stock_units', 'critical_shortage_units', 'near_expiry_days')
+    search_fields = ('blood_bank__user__email',)
+
 class BloodRequestAdmin(admin.ModelAdmin):
     list_display = ('id', 'consumer', 'blood_bank', 'blood_group', 'units_required', 'priority', 'status', 'requested_date', 'required_date')
     list_filter = ('status', 'priority', 'blood_group', 'requested_date')
@@ -58,4 +87,6 @@ class BloodRequestAdmin(admin.ModelAdmin):
 admin.site.register(BloodBag, BloodBagAdmin)
 admin.site.register(StockTransaction, StockTransactionAdmin)
 admin.site.register(BloodRequest , BloodRequestAdmin)
-# admin.site.register(InventoryAlert, InventoryAlertAdmin)
\ No newline at end of file
+admin.site.register(InventoryAlert, InventoryAlertAdmin)
+admin.site.register(AlertThreshold, AlertThresholdAdmin)
+admin.site.register(BankStockLevel, BankStockLevelAdmin)
\ No newline at end of file
@@ -0,0 +1,133 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import AlertThreshold, BloodBag, InventoryAlert
+import logging
+
+logger = logging.getLogger('api_logger')
+
+
+def get_thresholds(blood_bank_id):
+    """Thresholds for a bank, falling back to settings.INVENTORY_ALERT_THRESHOLDS."""
+    defaults = settings.INVENTORY_ALERT_THRESHOLDS
+    threshold = (
+        AlertThreshold.objects
+        .filter(blood_bank_id=blood_bank_id)
+        .values('low_stock_units', 'critical_shortage_units', 'near_expiry_days')
+        .first()
+    )
+    return threshold or {
+        'low_stock_units': defaults['LOW_STOCK'],
+        'critical_shortage_units': defaults['CRITICAL_SHORTAGE'],
+        'near_expiry_days': defaults['NEAR_EXPIRY_DAYS'],
+    }
+
+
+def _expected_alerts(blood_group, available, near_expiry, thresholds):
+    """alert_type -> description for every alert that should be active."""
+    expected = {}
+    if available <= thresholds['critical_shortage_units']:
+        expected['CRITICAL_SHORTAGE'] = f"Critical shortage: {available} units of {blood_group} available"
+    elif available <= thresholds['low_stock_units']:
+        expected['LOW_STOCK'] = f"Low stock: {available} units of {blood_group} available"
+    if near_expiry:
+        expected['NEAR_EXPIRY'] = (
+            f"{near_expiry} units of {blood_group} expire within {thresholds['near_expiry_days']} days"
+        )
+    return expected
+
+
+def evaluate_alerts(blood_bank_id, blood_groups):
+    """
+    Re-evaluates alerts for one bank and the given blood groups only.
+
+    Costs a fixed number of queries whatever the size of the inventory: the
+    thresholds, one aggregate over the AVAILABLE (blood_bank, blood_group) index,
+    the currently active alerts, then at most one bulk insert and one update.
+    Opening and resolving is idempotent, so it is safe to call repeatedly.
+    """
+    blood_groups = sorted(set(blood_groups))
+    if not blood_groups:
+        return
+
+    thresholds = get_thresholds(blood_bank_id)
+    today = timezone.now().date()
+    near_expiry_date = today + timedelta(days=thresholds['near_expiry_days'])
+
+    counts = {
+        row['blood_group']: row
+        for row in BloodBag.objects.filter(
+            blood_bank_id=blood_bank_id,
+            blood_group__in=blood_groups,
+            status='AVAILABLE'
+        ).order_by().values('blood_group').annotate(
+            available=Count('id'),
+            near_expiry=Count('id', filter=Q(expiration_date__lte=near_expiry_date))
+        )
+    }
+
+    active = {
+        (alert['blood_group'], alert['alert_type']): alert['id']
+        for alert in InventoryAlert.objects.filter(
+            blood_bank_id=blood_bank_id,
+            blood_group__in=blood_groups,
+            is_active=True
+        ).values('id', 'blood_group', 'alert_type')
+    }
+
+    to_open = []
+    keep = set()
+    for blood_group in blood_groups:
+        row = counts.get(blood_group, {})
+        expected = _expected_alerts(
+            blood_group, row.get('available', 0), row.get('near_expiry', 0), thresholds
+        )
+        for alert_type, description in expected.items():
+            if (blood_group, alert_type) in active:
+                keep.add((blood_group, alert_type))
+            else:
+                to_open.append(InventoryAlert(
+                    blood_bank_id=blood_bank_id,
+                    blood_group=blood_group,
+                    alert_type=alert_type,
+                    description=description
+                ))
+
+    to_resolve = [alert_id for key, alert_id in active.items() if key not in keep]
+    if not (to_open or to_resolve):
+        return
+
+    with transaction.atomic():
+        if to_open:
+            InventoryAlert.objects.bulk_create(to_open, ignore_conflicts=True)
+        if to_resolve:
+            InventoryAlert.objects.filter(id__in=to_resolve, is_active=True).update(
+                is_active=False,
+                resolved_at=timezone.now()
+            )
+
+    logger.info(
+        f"Inventory alerts for blood bank {blood_bank_id} - opened: {len(to_open)}, resolved: {len(to_resolve)}"
+    )
+
+
+def stock_changed(pairs):
+    """
+    Schedules alert evaluation for the (blood_bank_id, blood_group) pairs
+    touched by a stock change, once the surrounding transaction commits.
+    Called by BankStockLevel.adjust, which every bag status change goes through.
+    """
+    by_bank = {}
+    for blood_bank_id, blood_group in pairs:
+        by_bank.setdefault(blood_bank_id, set()).add(blood_group)
+
+    def evaluate():
+        for blood_bank_id, blood_groups in by_bank.items():
+            try:
+                evaluate_alerts(blood_bank_id, blood_groups)
+            except Exception as e:
+                logger.error(f"Inventory alert evaluation failed for blood bank {blood_bank_id} - Error: {str(e)}")
+
+    transaction.on_commit(evaluate)
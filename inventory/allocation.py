@@ -0,0 +1,200 @@
+from dataclasses import dataclass, field
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .compatibility import compatible_donor_groups
+from .models import BankStockLevel, BloodBag, BloodRequest, StockTransaction
+import logging
+
+logger = logging.getLogger('api_logger')
+
+
+class AllocationConflict(Exception):
+    """Raised when bags picked for a request were claimed by someone else."""
+
+
+@dataclass
+class AllocationResult:
+    units_required: int
+    blood_bag_ids: list = field(default_factory=list)
+    units_by_blood_group: dict = field(default_factory=dict)
+
+    @property
+    def allocated(self):
+        return len(self.blood_bag_ids)
+
+    @property
+    def shortfall(self):
+        return max(self.units_required - self.allocated, 0)
+
+    @property
+    def is_partial(self):
+        return self.shortfall > 0
+
+    def as_dict(self):
+        return {
+            "units_required": self.units_required,
+            "allocated": self.allocated,
+            "shortfall": self.shortfall,
+            "partial": self.is_partial,
+            "units_by_blood_group": self.units_by_blood_group,
+            "blood_bag_ids": self.blood_bag_ids,
+        }
+
+
+def available_bags(blood_request, blood_groups=None):
+    """
+    Queryset of the bags a request may be filled from. Bags past their
+    expiration date are left out even while still AVAILABLE, as the expiry
+    sweep may not have run yet (BLOOD_BAG_EXPIRY_SWEEP_INTERVAL is off by
+    default).
+    """
+    return BloodBag.objects.filter(
+        blood_bank_id=blood_request.blood_bank_id,
+        blood_group__in=blood_groups or [blood_request.blood_group],
+        status='AVAILABLE',
+        expiration_date__gte=timezone.now().date()
+    )
+
+
+class FEFOPolicy:
+    """
+    First-expiry-first-out: unexpired bags closest to their expiration date
+    go first. Served by the partial (blood_bank, blood_group, status,
+    expiration_date) index on AVAILABLE bags, so picking N bags is a range
+    scan rather than a sort.
+
+    With exclude_expiring_before_required_date, bags that would expire before
+    the request's required_date are left on the shelf. With
+    allow_substitution, a request is filled from ABO/Rh compatible groups
+    once its own group runs out (see inventory.compatibility).
+    """
+    exclude_expiring_before_required_date = False
+
+    def __init__(self, exclude_expiring_before_required_date=None, allow_substitution=None):
+        if exclude_expiring_before_required_date is not None:
+            self.exclude_expiring_before_required_date = exclude_expiring_before_required_date
+        if allow_substitution is None:
+            allow_substitution = settings.BLOOD_BAG_ALLOW_SUBSTITUTION
+        self.allow_substitution = allow_substitution
+
+    def available(self, blood_request, blood_groups=None):
+        queryset = available_bags(blood_request, blood_groups)
+        if self.exclude_expiring_before_required_date and blood_request.required_date:
+            queryset = queryset.filter(expiration_date__gte=blood_request.required_date)
+        return queryset
+
+    def candidates(self, blood_request, blood_group=None):
+        blood_groups = [blood_group] if blood_group else None
+        return self.available(blood_request, blood_groups).order_by('expiration_date', 'id')
+
+    def plan(self, blood_request):
+        """
+        Returns [(blood_group, units), ...] to draw from, in preference order.
+        Availability for every compatible group comes from one grouped query.
+        """
+        if not self.allow_substitution:
+            return [(blood_request.blood_group, blood_request.units_required)]
+
+        blood_groups = compatible_donor_groups(blood_request.blood_group)
+        available = dict(
+            self.available(blood_request, blood_groups)
+            .order_by()
+            .values('blood_group')
+            .annotate(units=Count('id'))
+            .values_list('blood_group', 'units')
+        )
+
+        plan = []
+        remaining = blood_request.units_required
+        for blood_group in blood_groups:
+            if remaining <= 0:
+                break
+            units = min(available.get(blood_group, 0), remaining)
+            if units:
+                plan.append((blood_group, units))
+                remaining -= units
+        return plan
+
+
+class ExpiryAwareFEFOPolicy(FEFOPolicy):
+    """FEFO that skips bags expiring before the request's required_date."""
+    exclude_expiring_before_required_date = True
+
+
+def get_allocation_policy():
+    """Instantiates the policy named by settings.BLOOD_BAG_ALLOCATION_POLICY."""
+    return import_string(settings.BLOOD_BAG_ALLOCATION_POLICY)()
+
+
+def allocate_blood_bags(blood_request, destination=None, policy=None):
+    """
+    Reserves up to blood_request.units_required available bags for the request,
+    in the order given by the allocation policy (FEFO unless configured).
+
+    Runs in one transaction: candidate rows are claimed with
+    select_for_update(skip_locked=True) where the backend supports it, flipped
+    to RESERVED with a single update(), and the ALLOCATION transactions and
+    allocated_blood_bags rows are written with bulk_create. The returned
+    AllocationResult says how many units could not be filled.
+    """
+    result = AllocationResult(units_required=blood_request.units_required)
+    policy = policy or get_allocation_policy()
+
+    with transaction.atomic():
+        picked = []
+        for blood_group, units in policy.plan(blood_request):
+            candidates = policy.candidates(blood_request, blood_group)
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            blood_bag_ids = list(candidates.values_list('id', flat=True)[:units])
+            picked += [(blood_bag_id, blood_group) for blood_bag_id in blood_bag_ids]
+            if blood_bag_ids:
+                result.units_by_blood_group[blood_group] = len(blood_bag_ids)
+        if not picked:
+            return result
+
+        blood_bag_ids = [blood_bag_id for blood_bag_id, _ in picked]
+        reserved = BloodBag.objects.filter(
+            id__in=blood_bag_ids,
+            status='AVAILABLE'
+        ).update(status='RESERVED', updated_at=timezone.now())
+        if reserved != len(blood_bag_ids):
+            raise AllocationConflict(
+                f"Only {reserved} of {len(blood_bag_ids)} blood bags could be reserved for request {blood_request.id}"
+            )
+
+        source = str(blood_request.blood_bank)
+        destination = destination or blood_request.hospital_name
+        notes = f"Allocated for request #{blood_request.id} - Patient: {blood_request.patient_name}"
+        StockTransaction.objects.bulk_create([
+            StockTransaction(
+                blood_bag_id=blood_bag_id,
+                transaction_type='ALLOCATION',
+                source_location=source,
+                destination_location=destination,
+                notes=notes if blood_group == blood_request.blood_group
+                else f"{notes} - Substituted {blood_group} for {blood_request.blood_group}"
+            )
+            for blood_bag_id, blood_group in picked
+        ])
+
+        through = BloodRequest.allocated_blood_bags.through
+        through.objects.bulk_create([
+            through(bloodrequest_id=blood_request.id, bloodbag_id=blood_bag_id)
+            for blood_bag_id in blood_bag_ids
+        ], ignore_conflicts=True)
+
+        deltas = {}
+        for blood_group, units in result.units_by_blood_group.items():
+            deltas[(blood_request.blood_bank_id, blood_group, 'AVAILABLE')] = -units
+            deltas[(blood_request.blood_bank_id, blood_group, 'RESERVED')] = units
+        BankStockLevel.adjust(deltas)
+
+    result.blood_bag_ids = blood_bag_ids
+    logger.info(
+        f"Allocated {result.allocated}/{result.units_required} blood bags for request {blood_request.id}"
+    )
+    return result
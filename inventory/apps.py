@@ -1,6 +1,26 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
 
 
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from users.models import BloodBankProfile
+        from .search import blood_bank_changed
+
+        for model in (BloodBankProfile, get_user_model()):
+            post_save.connect(blood_bank_changed, sender=model, dispatch_uid=f'search_{model.__name__}_saved')
+            post_delete.connect(blood_bank_changed, sender=model, dispatch_uid=f'search_{model.__name__}_deleted')
+
+        from raktkadi.metrics import registry
+        from .metrics import stock_gauges
+        registry.register_collector(stock_gauges)
+
+        interval = getattr(settings, 'BLOOD_BAG_EXPIRY_SWEEP_INTERVAL', None)
+        if interval:
+            from .expiry import start_expiry_sweeper
+            start_expiry_sweeper(interval)
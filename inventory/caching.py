@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(namespace, key):
+    return f"{namespace}:version:{key}"
+
+
+async def aget_version(namespace, key):
+    version = await cache.aget(_version_key(namespace, key))
+    if version is None:
+        await cache.aadd(_version_key(namespace, key), 1, timeout=None)
+        version = await cache.aget(_version_key(namespace, key), 1)
+    return version
+
+
+async def aversioned_key(namespace, key, *parts):
+    """Cache key that changes whenever bump_version(namespace, key) runs."""
+    suffix = ':'.join(str(part) for part in parts)
+    return f"{namespace}:{key}:v{await aget_version(namespace, key)}:{suffix}"
+
+
+def bump_version(namespace, key):
+    """
+    Invalidates every entry built with aversioned_key(namespace, key), once the
+    current transaction commits so readers never cache pre-commit data under
+    the new version.
+    """
+    def bump():
+        try:
+            cache.incr(_version_key(namespace, key))
+        except ValueError:
+            cache.add(_version_key(namespace, key), 2, timeout=None)
+
+    transaction.on_commit(bump)
@@ -0,0 +1,35 @@
+from django.conf import settings
+from .models import BloodBag
+
+BLOOD_GROUPS = [group for group, _ in BloodBag.BLOOD_GROUPS]
+
+
+def _can_donate(donor, recipient):
+    """Red cell compatibility: donor antigens must be a subset of the recipient's."""
+    donor_abo, donor_rh = donor[:-1], donor[-1]
+    recipient_abo, recipient_rh = recipient[:-1], recipient[-1]
+    donor_antigens = set(donor_abo) - {'O'}
+    recipient_antigens = set(recipient_abo) - {'O'}
+    return donor_antigens <= recipient_antigens and (donor_rh == '-' or recipient_rh == '+')
+
+
+# recipient group -> set of donor groups it can receive, computed once at import
+COMPATIBLE_DONORS = {
+    recipient: frozenset(donor for donor in BLOOD_GROUPS if _can_donate(donor, recipient))
+    for recipient in BLOOD_GROUPS
+}
+
+
+def compatible_donor_groups(recipient):
+    """
+    Donor groups a recipient can be transfused from, in the order they should
+    be drawn: the exact group first, then the remaining compatible groups in
+    settings.BLOOD_GROUP_SUBSTITUTION_ORDER, which keeps O- for last.
+    """
+    compatible = COMPATIBLE_DONORS.get(recipient, frozenset())
+    ordered = [recipient] if recipient in compatible else []
+    ordered += [
+        group for group in settings.BLOOD_GROUP_SUBSTITUTION_ORDER
+        if group in compatible and group != recipient
+    ]
+    return ordered
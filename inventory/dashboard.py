@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from users.models import BloodBankProfile
+from .caching import aversioned_key, bump_version
+from .models import BloodBag, BloodRequest
+
+DASHBOARD_NAMESPACE = 'hospital_dashboard'
+
+
+def _count_subquery(queryset):
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values('blood_bank').annotate(total=Count('id')).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def dashboard_queryset(user_id):
+    """
+    The single aggregate query behind the dashboard of the bank owned by
+    user_id: the profile row, available units per blood group from the
+    BankStockLevel counters (conditional Sum), plus today's donations and
+    pending requests as correlated Count subqueries.
+    """
+    today = timezone.now().date()
+    blood_groups = [bg for bg, _ in BloodBag.BLOOD_GROUPS]
+
+    aggregates = {
+        f'group_{index}': Coalesce(
+            Sum(
+                'stock_levels__units',
+                filter=Q(stock_levels__status='AVAILABLE', stock_levels__blood_group=bg)
+            ),
+            0
+        )
+        for index, bg in enumerate(blood_groups)
+    }
+    return (
+        BloodBankProfile.objects
+        .filter(user_id=user_id)
+        .annotate(
+            donation_today=_count_subquery(BloodBag.objects.filter(
+                blood_bank=OuterRef('pk'),
+                status='AVAILABLE',
+                collection_date=today
+            )),
+            pending_requests=_count_subquery(BloodRequest.objects.filter(
+                blood_bank=OuterRef('pk'),
+                status='PENDING'
+            )),
+            **aggregates
+        )
+        .values('id', 'donation_today', 'pending_requests', *aggregates)
+    )
+
+
+async def acompute_dashboard(user_id):
+    """
+    Dashboard figures for the bank owned by user_id, through the async ORM.
+    Returns (blood_bank_id, data), or (None, None) for a user without a bank.
+    """
+    row = await dashboard_queryset(user_id).afirst()
+    if row is None:
+        return None, None
+
+    blood_groups = [bg for bg, _ in BloodBag.BLOOD_GROUPS]
+    response_data = {bg: row[f'group_{index}'] for index, bg in enumerate(blood_groups)}
+    response_data['total'] = sum(response_data.values())
+    response_data['donation_today'] = row['donation_today']
+    response_data['pending_requests'] = row['pending_requests']
+    return row['id'], response_data
+
+
+async def aget_dashboard(user_id, blood_bank_id=None):
+    """
+    Cached acompute_dashboard. Entries live under a per bank version that is
+    bumped by every BloodBag / BloodRequest write for the bank, so a hit is
+    never stale and costs no query. The date is part of the key so
+    donation_today rolls over at midnight. blood_bank_id, when the caller
+    already knows it (token claim), saves looking up the user's bank.
+    Returns (blood_bank_id, data) like acompute_dashboard.
+    """
+    today = timezone.now().date()
+    bank_key = f"{DASHBOARD_NAMESPACE}:bank:{user_id}"
+
+    # The versioned key is taken before computing, so a write that commits
+    # meanwhile bumps past it instead of leaving stale data under a new version
+    key = None
+    if blood_bank_id is None:
+        blood_bank_id = await cache.aget(bank_key)
+    if blood_bank_id is not None:
+        key = await aversioned_key(DASHBOARD_NAMESPACE, blood_bank_id, today)
+        data = await cache.aget(key)
+        if data is not None:
+            return blood_bank_id, data
+
+    blood_bank_id, data = await acompute_dashboard(user_id)
+    if blood_bank_id is not None:
+        timeout = settings.HOSPITAL_DASHBOARD_CACHE_TIMEOUT
+        await cache.aset(bank_key, blood_bank_id, timeout)
+        if key is not None:
+            await cache.aset(key, data, timeout)
+    return blood_bank_id, data
+
+
+def invalidate_dashboard(blood_bank_id):
+    bump_version(DASHBOARD_NAMESPACE, blood_bank_id)
@@ -0,0 +1,146 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from .alerts import stock_changed
+from collections import Counter
+from .models import AlertThreshold, BankStockLevel, BloodBag, ExpirySweep, StockTransaction
+import logging
+import threading
+
+logger = logging.getLogger('api_logger')
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def last_swept_until():
+    """
+    High-water mark of the previous sweep that finished, or None if none has.
+    A sweep that crashed or was killed partway never moves the mark.
+    """
+    return (
+        ExpirySweep.objects
+        .filter(finished_at__isnull=False)
+        .order_by('-swept_until')
+        .values_list('swept_until', flat=True)
+        .first()
+    )
+
+
+def sweep_expired_bags(today=None, chunk_size=DEFAULT_CHUNK_SIZE, full=False):
+    """
+    Moves AVAILABLE bags whose expiration_date has passed to EXPIRED and
+    records a DISPOSAL transaction for each of them.
+
+    Only bags expiring between the last high-water mark and today are looked
+    at (served by the partial expiration_date index on AVAILABLE bags), so a
+    run costs time proportional to the newly expired bags. full=True ignores the mark, e.g.
+    after back-dated intake. Each chunk is locked, flipped with one update()
+    and its transactions written with one bulk_create, in its own
+    transaction. Only the bags the update actually flipped get a DISPOSAL
+    transaction and move in BankStockLevel.
+    """
+    today = today or timezone.now().date()
+    since = None if full else last_swept_until()
+
+    sweep = ExpirySweep.objects.create(swept_until=today)
+
+    expired = BloodBag.objects.filter(status='AVAILABLE', expiration_date__lt=today)
+    if since:
+        expired = expired.filter(expiration_date__gte=since)
+    expired = expired.order_by('status', 'expiration_date')
+
+    if connection.features.has_select_for_update:
+        expired = expired.select_for_update()
+
+    while True:
+        with transaction.atomic():
+            rows = list(expired.values_list('id', 'blood_bank_id', 'blood_group')[:chunk_size])
+            if not rows:
+                break
+            blood_bag_ids = [blood_bag_id for blood_bag_id, _, _ in rows]
+
+            expired_at = timezone.now()
+            count = BloodBag.objects.filter(
+                id__in=blood_bag_ids,
+                status='AVAILABLE'
+            ).update(status='EXPIRED', updated_at=expired_at)
+            if count != len(rows):
+                # Changed by another writer since they were read (no row locks)
+                flipped = set(BloodBag.objects.filter(
+                    id__in=blood_bag_ids, status='EXPIRED', updated_at=expired_at
+                ).values_list('id', flat=True))
+                rows = [row for row in rows if row[0] in flipped]
+                blood_bag_ids = [blood_bag_id for blood_bag_id, _, _ in rows]
+
+            StockTransaction.objects.bulk_create([
+                StockTransaction(
+                    blood_bag_id=blood_bag_id,
+                    transaction_type='DISPOSAL',
+                    notes="Expired - removed from available stock"
+                )
+                for blood_bag_id in blood_bag_ids
+            ])
+            sweep.expired_count += count
+            deltas = Counter()
+            for _, blood_bank_id, blood_group in rows:
+                deltas[(blood_bank_id, blood_group, 'AVAILABLE')] -= 1
+                deltas[(blood_bank_id, blood_group, 'EXPIRED')] += 1
+            BankStockLevel.adjust(deltas)
+
+    # Bags that entered the near-expiry window since the last sweep, for the
+    # widest window of any bank; evaluate_alerts applies each bank's own
+    near_expiry_days = max(
+        settings.INVENTORY_ALERT_THRESHOLDS['NEAR_EXPIRY_DAYS'],
+        AlertThreshold.objects.aggregate(days=Max('near_expiry_days'))['days'] or 0
+    )
+    entering = BloodBag.objects.filter(
+        status='AVAILABLE',
+        expiration_date__lt=today + timedelta(days=near_expiry_days + 1)
+    )
+    if since:
+        entering = entering.filter(expiration_date__gte=since + timedelta(days=near_expiry_days + 1))
+    stock_changed(entering.order_by().values_list('blood_bank_id', 'blood_group').distinct())
+
+    sweep.finished_at = timezone.now()
+    sweep.save(update_fields=['expired_count', 'finished_at'])
+
+    logger.info(f"Expiry sweep until {today} expired {sweep.expired_count} blood bags")
+    return sweep
+
+
+class ExpirySweeper(threading.Thread):
+    """Daemon thread that runs sweep_expired_bags every `interval` seconds."""
+
+    def __init__(self, interval, chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(name='expiry-sweeper', daemon=True)
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.stopped = threading.Event()
+
+    def run(self):
+        from django.db import close_old_connections
+
+        while not self.stopped.wait(self.interval):
+            try:
+                sweep_expired_bags(chunk_size=self.chunk_size)
+            except Exception as e:
+                logger.error(f"Expiry sweep failed - Error: {str(e)}")
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self.stopped.set()
+
+
+_sweeper = None
+
+
+def start_expiry_sweeper(interval, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Starts the in-process periodic sweeper once per process."""
+    global _sweeper
+    if _sweeper is None or not _sweeper.is_alive():
+        _sweeper = ExpirySweeper(interval, chunk_size)
+        _sweeper.start()
+    return _sweeper
@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from functools import partial
+from multiprocessing import Pool
+from raktkadi.log_analysis import LogSummary, summarize_file
+import glob
+import os
+
+
+def error_rate(errors, requests):
+    return f"{errors / requests * 100:.1f}%" if requests else '-'
+
+
+def ms(value):
+    return f"{value:.2f}" if value is not None else '-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency percentiles per view and per view and hour, error rates and the slowest "
+        "requests from api_logger files (plain or gzip-rotated), streamed in bounded memory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help="Log files or glob patterns, by default every logs/api_log_* file"
+        )
+        parser.add_argument('--top', type=int, default=10, help="Number of slowest requests to list")
+        parser.add_argument(
+            '--accuracy', type=float, default=0.01,
+            help="Relative accuracy of the percentiles (0.01 = within 1%%)"
+        )
+        parser.add_argument('--jobs', type=int, default=1, help="Files analyzed in parallel")
+        parser.add_argument('--no-hourly', action='store_true', help="Skip the per view and hour table")
+
+    def handle(self, *args, **options):
+        patterns = options['paths'] or [os.path.join(settings.BASE_DIR, 'logs', 'api_log_*')]
+        paths = sorted({path for pattern in patterns for path in (glob.glob(pattern) or [pattern])})
+        missing = [path for path in paths if not os.path.isfile(path)]
+        if missing:
+            raise CommandError(f"No such log file: {', '.join(missing)}")
+
+        summarize = partial(summarize_file, top=options['top'], relative_accuracy=options['accuracy'])
+        summary = LogSummary(options['top'], options['accuracy'])
+        if options['jobs'] > 1 and len(paths) > 1:
+            with Pool(options['jobs']) as pool:
+                for file_summary in pool.imap_unordered(summarize, paths):
+                    summary.merge(file_summary)
+        else:
+            for path in paths:
+                summary.merge(summarize(path))
+
+        self.stdout.write(f"{summary.lines} lines in {len(paths)} files\n")
+        self.write_table(
+            "Per view",
+            [(view, sketch, summary.server_errors[view], summary.requests_with_status[view])
+             for view, sketch in sorted(summary.views.items())]
+        )
+        if not options['no_hourly']:
+            self.write_table(
+                "Per view and hour",
+                [(f"{hour}:00  {view}", sketch, None, None)
+                 for (view, hour), sketch in sorted(summary.hours.items(), key=lambda item: (item[0][1], item[0][0]))]
+            )
+
+        if summary.error_lines:
+            self.stdout.write("\nERROR lines per hour")
+            for hour, count in sorted(summary.error_lines.items()):
+                self.stdout.write(
+                    f"  {hour}:00  {count:>6}  ({error_rate(count, summary.hour_requests[hour])} of requests)"
+                )
+
+        self.stdout.write(f"\nSlowest {len(summary.slowest)} requests")
+        for took, time, view, status, path in sorted(summary.slowest, reverse=True):
+            self.stdout.write(f"  {took:>10.2f}ms  {time}  {view}  {status}  {path}")
+
+    def write_table(self, title, rows):
+        self.stdout.write(f"\n{title}")
+        width = max([len(row[0]) for row in rows] + [4])
+        self.stdout.write(
+            f"  {'View':<{width}}  {'count':>8}  {'5xx':>6}  {'p50':>9}  {'p95':>9}  {'p99':>9}  {'max':>9}  (ms)"
+        )
+        for name, sketch, errors, requests in rows:
+            rate = error_rate(errors, requests) if errors is not None else ''
+            self.stdout.write(
+                f"  {name:<{width}}  {sketch.count:>8}  {rate:>6}  {ms(sketch.quantile(0.5)):>9}  "
+                f"{ms(sketch.quantile(0.95)):>9}  {ms(sketch.quantile(0.99)):>9}  {ms(sketch.max):>9}"
+            )
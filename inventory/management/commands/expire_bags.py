@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from inventory.expiry import DEFAULT_CHUNK_SIZE, sweep_expired_bags
+
+
+class Command(BaseCommand):
+    help = "Marks AVAILABLE blood bags past their expiration date as EXPIRED and records their disposal"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help="Number of bags flipped per update"
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Ignore the last high-water mark and sweep every expiration date"
+        )
+
+    def handle(self, *args, **options):
+        sweep = sweep_expired_bags(chunk_size=options['chunk_size'], full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {sweep.expired_count} blood bags (swept until {sweep.swept_until})"
+        ))
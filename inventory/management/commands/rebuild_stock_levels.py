@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from inventory.models import BankStockLevel
+
+
+class Command(BaseCommand):
+    help = "Recomputes the BankStockLevel counters from the blood bag table and reports any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report drift, leave the counters untouched"
+        )
+
+    def handle(self, *args, **options):
+        drift = BankStockLevel.rebuild(dry_run=options['dry_run'])
+        for (blood_bank_id, blood_group, status), stored, actual in drift:
+            self.stdout.write(
+                f"Blood bank {blood_bank_id} {blood_group} {status}: stored {stored}, actual {actual}"
+            )
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Stock levels are in sync"))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} stock levels drifted"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt stock levels, {len(drift)} had drifted"))
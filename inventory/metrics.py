@@ -0,0 +1,21 @@
+from django.db.models import Sum
+from .models import BankStockLevel, BloodBag
+
+
+def stock_gauges():
+    """
+    Scrape-time gauges from the BankStockLevel counters: available units per
+    blood group across all banks, one grouped query.
+    """
+    units = dict(
+        BankStockLevel.objects.filter(status='AVAILABLE')
+        .values_list('blood_group')
+        .annotate(total=Sum('units'))
+        .values_list('blood_group', 'total')
+    )
+    return [(
+        'raktkadi_available_units',
+        'Available blood bag units by blood group.',
+        'gauge',
+        [({'blood_group': bg}, units.get(bg) or 0) for bg, _ in BloodBag.BLOOD_GROUPS],
+    )]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_alter_bloodbag_barcode'),
+        ('users', '0010_bloodbankprofile_city_bloodbankprofile_pincode_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarcodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('last_value', models.PositiveIntegerField(default=0)),
+                ('blood_bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='barcode_sequences', to='users.bloodbankprofile')),
+            ],
+            options={
+                'unique_together': {('blood_bank', 'date')},
+            },
+        ),
+    ]
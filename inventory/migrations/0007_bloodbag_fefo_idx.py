@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_barcodesequence'),
+        ('users', '0010_bloodbankprofile_city_bloodbankprofile_pincode_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloodbag',
+            index=models.Index(fields=['blood_bank', 'blood_group', 'status', 'expiration_date'], name='bloodbag_fefo_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_bloodbag_fefo_idx'),
+        ('users', '0010_bloodbankprofile_city_bloodbankprofile_pincode_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpirySweep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('swept_until', models.DateField()),
+                ('expired_count', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bloodbag',
+            index=models.Index(fields=['status', 'expiration_date'], name='bloodbag_status_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_expiry_sweep'),
+        ('users', '0010_bloodbankprofile_city_bloodbankprofile_pincode_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertThreshold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('low_stock_units', models.PositiveIntegerField()),
+                ('critical_shortage_units', models.PositiveIntegerField()),
+                ('near_expiry_days', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='inventoryalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('blood_bank', 'blood_group', 'alert_type'), name='inventoryalert_one_active'),
+        ),
+        migrations.AddField(
+            model_name='alertthreshold',
+            name='blood_bank',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='alert_threshold', to='users.bloodbankprofile'),
+        ),
+    ]
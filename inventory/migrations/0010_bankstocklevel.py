@@ -0,0 +1,40 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_stock_levels(apps, schema_editor):
+    BloodBag = apps.get_model('inventory', 'BloodBag')
+    BankStockLevel = apps.get_model('inventory', 'BankStockLevel')
+    counts = (
+        BloodBag.objects.order_by()
+        .values('blood_bank_id', 'blood_group', 'status')
+        .annotate(units=models.Count('id'))
+    )
+    BankStockLevel.objects.bulk_create([BankStockLevel(**row) for row in counts])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_alert_threshold'),
+        ('users', '0010_bloodbankprofile_city_bloodbankprofile_pincode_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankStockLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A +ve'), ('A-', 'A -ve'), ('B+', 'B +ve'), ('B-', 'B -ve'), ('AB+', 'AB +ve'), ('AB-', 'AB -ve'), ('O+', 'O +ve'), ('O-', 'O -ve')], max_length=5)),
+                ('status', models.CharField(choices=[('AVAILABLE', 'Available'), ('RESERVED', 'Reserved'), ('USED', 'Used'), ('EXPIRED', 'Expired')], max_length=20)),
+                ('units', models.IntegerField(default=0)),
+                ('blood_bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_levels', to='users.bloodbankprofile')),
+            ],
+            options={
+                'unique_together': {('blood_bank', 'blood_group', 'status')},
+            },
+        ),
+        migrations.RunPython(populate_stock_levels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_bankstocklevel'),
+        ('users', '0010_bloodbankprofile_city_bloodbankprofile_pincode_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bankstocklevel',
+            index=models.Index(fields=['blood_group', 'status', 'units', 'blood_bank'], name='stocklevel_search_idx'),
+        ),
+    ]
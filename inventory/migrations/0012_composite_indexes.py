@@ -0,0 +1,58 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_stocklevel_search_idx'),
+        ('users', '0012_revoked_token'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bloodbag',
+            name='bloodbag_fefo_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='bloodbag',
+            name='bloodbag_status_expiry_idx',
+        ),
+        migrations.AlterField(
+            model_name='bloodbag',
+            name='blood_bank',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='blood_bags', to='users.bloodbankprofile'),
+        ),
+        migrations.AlterField(
+            model_name='bloodrequest',
+            name='blood_bank',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='received_requests', to='users.bloodbankprofile'),
+        ),
+        migrations.AlterField(
+            model_name='stocktransaction',
+            name='blood_bag',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='inventory.bloodbag'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodbag',
+            index=models.Index(condition=models.Q(('status', 'AVAILABLE')), fields=['blood_bank', 'blood_group', 'status', 'expiration_date'], name='bloodbag_available_fefo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodbag',
+            index=models.Index(condition=models.Q(('status', 'AVAILABLE')), fields=['expiration_date'], name='bloodbag_available_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodbag',
+            index=models.Index(fields=['blood_bank', 'status', 'collection_date'], name='bloodbag_bank_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['blood_bank', 'status'], name='bloodrequest_bank_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['blood_bag', 'timestamp'], name='stocktransaction_bag_time_idx'),
+        ),
+    ]
@@ -1,7 +1,81 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils.timezone import now
 from users.models import Admin, BloodBankProfile, DonorProfile , ConsumerProfile
 import uuid 
+from collections import Counter
+
+BARCODE_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def barcode_check_character(value):
+    """
+    Luhn mod 36 check character over the alphanumeric characters of value,
+    catches single character typos and most adjacent swaps when a barcode
+    is keyed in by hand.
+    """
+    factor = 2
+    total = 0
+    for char in reversed([c for c in value.upper() if c in BARCODE_ALPHABET]):
+        addend = factor * BARCODE_ALPHABET.index(char)
+        total += addend // 36 + addend % 36
+        factor = 1 if factor == 2 else 2
+    return BARCODE_ALPHABET[(36 - total % 36) % 36]
+
+
+def format_barcode(blood_bank_id, blood_group, collection_date, sequence):
+    """BB-{blood_bank_id}-{blood_group}-{collection_date}-{sequence}-{check}, see BloodBag.generate_barcode."""
+    # Format blood bank ID with leading zeros
+    bank_id = str(blood_bank_id).zfill(3)
+
+    # Format blood group (remove + or - for shorter code)
+    blood_group_code = blood_group.replace('+', 'P').replace('-', 'N')
+
+    # Format collection date
+    date_str = collection_date.strftime('%Y%m%d')
+
+    # Combine all parts
+    body = f"BB-{bank_id}-{blood_group_code}-{date_str}-{str(sequence).zfill(5)}"
+    return f"{body}-{barcode_check_character(body)}"
+
+
+class BarcodeSequence(models.Model):
+    """
+    Barcode counter per blood bank and collection day. Sequence numbers are
+    handed out in blocks by an atomic increment, so concurrent saves and bulk
+    intake never receive the same number.
+    """
+    blood_bank = models.ForeignKey(BloodBankProfile, on_delete=models.CASCADE, related_name='barcode_sequences')
+    date = models.DateField()
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('blood_bank', 'date')
+
+    @classmethod
+    def allocate(cls, blood_bank_id, date, count=1):
+        """
+        Reserves count consecutive sequence numbers and returns the first one.
+
+        The increment is the first statement of the transaction: it takes the
+        write lock (SQLite) or row lock at once, where a read followed by a
+        write would have to upgrade a shared lock and fail with "database is
+        locked" under concurrent intake. The value is read back under that lock.
+        """
+        sequence = cls.objects.filter(blood_bank_id=blood_bank_id, date=date)
+        with transaction.atomic():
+            if not sequence.update(last_value=models.F('last_value') + count):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(blood_bank_id=blood_bank_id, date=date, last_value=count)
+                    return 1
+                except IntegrityError:
+                    # Created by a concurrent allocation meanwhile
+                    sequence.update(last_value=models.F('last_value') + count)
+            last_value = sequence.values_list('last_value', flat=True).get()
+        return last_value - count + 1
+
+    def __str__(self):
+        return f"{self.blood_bank_id} - {self.date} - {self.last_value}"
 
 
 class BloodBag(models.Model):   
@@ -23,7 +97,8 @@ class BloodBag(models.Model):
         ('EXPIRED', 'Expired')
     ]
 
-    blood_bank = models.ForeignKey(BloodBankProfile, on_delete=models.CASCADE, related_name='blood_bags')
+    # Indexed by bloodbag_bank_status_idx
+    blood_bank = models.ForeignKey(BloodBankProfile, on_delete=models.CASCADE, related_name='blood_bags', db_index=False)
     donor = models.ForeignKey(DonorProfile, on_delete=models.SET_NULL, null=True, blank=True, related_name='donated_bags')
     
     blood_group = models.CharField(max_length=5, choices=BLOOD_GROUPS)
@@ -43,41 +118,203 @@ class BloodBag(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def generate_barcode(self):
+    class Meta:
+        indexes = [
+            # FEFO allocation, availability and alert counts per bank/group:
+            # range scan in expiry order over AVAILABLE bags only, which stay a
+            # shrinking share of the table as bags are used or expire. status
+            # stays in the key so SQLite can answer from the index alone
+            models.Index(
+                fields=['blood_bank', 'blood_group', 'status', 'expiration_date'],
+                condition=models.Q(status='AVAILABLE'),
+                name='bloodbag_available_fefo_idx'
+            ),
+            # Expiry sweep: range scan over AVAILABLE bags by expiration_date
+            models.Index(
+                fields=['expiration_date'],
+                condition=models.Q(status='AVAILABLE'),
+                name='bloodbag_available_expiry_idx'
+            ),
+            # Dashboard donations per bank/status/day; also serves the
+            # blood_bank foreign key in place of its own index
+            models.Index(
+                fields=['blood_bank', 'status', 'collection_date'],
+                name='bloodbag_bank_status_idx'
+            ),
+        ]
+
+    def generate_barcode(self, sequence=None):
         """
         Generates a unique barcode with the format:
-        BB-{blood_bank_id}-{blood_group}-{collection_date}-{unique_id}
-        Example: BB-001-AP-20250206-7A3F
+        BB-{blood_bank_id}-{blood_group}-{collection_date}-{sequence}-{check}
+        Example: BB-001-AP-20250206-00042-0
+
+        The sequence comes from the per bank, per day BarcodeSequence counter,
+        so the barcode is unique without probing the table.
         """
-        # Format blood bank ID with leading zeros
-        bank_id = str(self.blood_bank.id).zfill(3)
-        
-        # Format blood group (remove + or - for shorter code)
-        blood_group_code = self.blood_group.replace('+', 'P').replace('-', 'N')
-        
-        # Format collection date
-        date_str = self.collection_date.strftime('%Y%m%d')
-        
-        # Generate a short unique identifier
-        unique_id = str(uuid.uuid4())[:4].upper()
-        
-        # Combine all parts
-        return f"BB-{bank_id}-{blood_group_code}-{date_str}-{unique_id}"
+        if sequence is None:
+            sequence = BarcodeSequence.allocate(self.blood_bank_id, self.collection_date)
+        return format_barcode(self.blood_bank_id, self.blood_group, self.collection_date, sequence)
+
+    def stock_key(self):
+        return (self.blood_bank_id, self.blood_group, self.status)
+
+    def _locked_stock_key(self):
+        """
+        The stored stock_key() of this bag, or None if it has no row. A no-op
+        update locks the row first: as the transaction's first statement it
+        takes SQLite's write lock at once, where reading first would need a
+        lock upgrade that fails with "database is locked" under concurrent
+        status changes.
+        """
+        rows = BloodBag.objects.filter(pk=self.pk)
+        if not rows.update(status=models.F('status')):
+            return None
+        return rows.values_list('blood_bank_id', 'blood_group', 'status').first()
 
     def save(self, *args, **kwargs):
+        from .dashboard import invalidate_dashboard
+
         # Generate barcode if it doesn't exist
         if not self.barcode:
             self.barcode = self.generate_barcode()
-            
-            # Ensure uniqueness
-            while BloodBag.objects.filter(barcode=self.barcode).exists():
-                self.barcode = self.generate_barcode()
-        
-        super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            previous = self._locked_stock_key() if self.pk else None
+
+            super().save(*args, **kwargs)
+
+            # Keep BankStockLevel in step with the row that was just written
+            if previous != self.stock_key():
+                update_fields = kwargs.get('update_fields')
+                if previous is None or update_fields is None or \
+                        {'blood_bank', 'blood_bank_id', 'blood_group', 'status'} & set(update_fields):
+                    deltas = Counter({self.stock_key(): 1})
+                    if previous:
+                        deltas[previous] -= 1
+                    BankStockLevel.adjust(deltas)
+            invalidate_dashboard(self.blood_bank_id)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self._locked_stock_key()
+            result = super().delete(*args, **kwargs)
+            if previous:
+                BankStockLevel.adjust(Counter({previous: -1}))
+        return result
+
+    @classmethod
+    def assign_barcodes(cls, blood_bags):
+        """
+        Assigns barcodes to unsaved blood bags ahead of a bulk_create,
+        reserving one block of sequence numbers per (blood bank, day).
+        """
+        groups = {}
+        for bag in blood_bags:
+            if not bag.barcode:
+                groups.setdefault((bag.blood_bank_id, bag.collection_date), []).append(bag)
+
+        for (blood_bank_id, collection_date), bags in groups.items():
+            first = BarcodeSequence.allocate(blood_bank_id, collection_date, count=len(bags))
+            for offset, bag in enumerate(bags):
+                bag.barcode = bag.generate_barcode(sequence=first + offset)
 
     def __str__(self):
         return f"{self.blood_group} Blood Bag - {self.barcode}"
 
+class BankStockLevel(models.Model):
+    """
+    Materialized number of bags per (blood bank, blood group, status).
+    Adjusted in the same transaction as every bag status change, so
+    availability reads are single-row lookups. Recompute it with
+    `manage.py rebuild_stock_levels`.
+    """
+    blood_bank = models.ForeignKey(BloodBankProfile, on_delete=models.CASCADE, related_name='stock_levels')
+    blood_group = models.CharField(max_length=5, choices=BloodBag.BLOOD_GROUPS)
+    status = models.CharField(max_length=20, choices=BloodBag.STATUS_CHOICES)
+    units = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('blood_bank', 'blood_group', 'status')
+        indexes = [
+            # Public search: banks holding a group, ordered by units
+            models.Index(fields=['blood_group', 'status', 'units', 'blood_bank'], name='stocklevel_search_idx'),
+        ]
+
+    @classmethod
+    def adjust(cls, deltas):
+        """
+        Applies {(blood_bank_id, blood_group, status): change} to the counters
+        and schedules alert evaluation for the affected (bank, group) pairs.
+        """
+        from .alerts import stock_changed
+        from .dashboard import invalidate_dashboard
+        from .search import invalidate_blood_bank_search
+
+        deltas = {key: change for key, change in deltas.items() if change}
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            cls.objects.bulk_create([
+                cls(blood_bank_id=blood_bank_id, blood_group=blood_group, status=status)
+                for blood_bank_id, blood_group, status in deltas
+            ], ignore_conflicts=True)
+            for (blood_bank_id, blood_group, status), change in deltas.items():
+                cls.objects.filter(
+                    blood_bank_id=blood_bank_id,
+                    blood_group=blood_group,
+                    status=status
+                ).update(units=models.F('units') + change)
+
+            stock_changed((blood_bank_id, blood_group) for blood_bank_id, blood_group, _ in deltas)
+            for blood_bank_id in {blood_bank_id for blood_bank_id, _, _ in deltas}:
+                invalidate_dashboard(blood_bank_id)
+            for blood_group in {blood_group for _, blood_group, status in deltas if status == 'AVAILABLE'}:
+                invalidate_blood_bank_search(blood_group)
+
+    @classmethod
+    def rebuild(cls, dry_run=False):
+        """
+        Recomputes every counter from the BloodBag table with one grouped
+        query. Returns [(key, stored, actual), ...] for counters that drifted.
+        """
+        with transaction.atomic():
+            actual = {
+                (row['blood_bank_id'], row['blood_group'], row['status']): row['units']
+                for row in BloodBag.objects.order_by()
+                .values('blood_bank_id', 'blood_group', 'status')
+                .annotate(units=models.Count('id'))
+            }
+            stored = {
+                (row['blood_bank_id'], row['blood_group'], row['status']): row['units']
+                for row in cls.objects.values('blood_bank_id', 'blood_group', 'status', 'units')
+            }
+            drift = [
+                (key, stored.get(key, 0), actual.get(key, 0))
+                for key in sorted(set(actual) | set(stored), key=str)
+                if stored.get(key, 0) != actual.get(key, 0)
+            ]
+
+            if drift and not dry_run:
+                cls.objects.all().delete()
+                cls.objects.bulk_create([
+                    cls(blood_bank_id=blood_bank_id, blood_group=blood_group, status=status, units=units)
+                    for (blood_bank_id, blood_group, status), units in actual.items()
+                ])
+        return drift
+
+    @classmethod
+    def available_units(cls, blood_bank_id, blood_group):
+        return cls.objects.filter(
+            blood_bank_id=blood_bank_id,
+            blood_group=blood_group,
+            status='AVAILABLE'
+        ).values_list('units', flat=True).first() or 0
+
+    def __str__(self):
+        return f"{self.blood_bank} - {self.blood_group} {self.status}: {self.units}"
+
 class StockTransaction(models.Model):
     TRANSACTION_TYPES = [
         ('COLLECTION', 'Blood Collection'),
@@ -86,7 +323,8 @@ class StockTransaction(models.Model):
         ('DISPOSAL', 'Blood Disposal')
     ]
 
-    blood_bag = models.ForeignKey(BloodBag, on_delete=models.CASCADE, related_name='transactions')
+    # Indexed by stocktransaction_bag_time_idx
+    blood_bag = models.ForeignKey(BloodBag, on_delete=models.CASCADE, related_name='transactions', db_index=False)
     transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
     
     # performer = models.ForeignKey(Admin, on_delete=models.SET_NULL, null=True)
@@ -98,9 +336,29 @@ class StockTransaction(models.Model):
     
     notes = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # A bag's history in time order
+            models.Index(fields=['blood_bag', 'timestamp'], name='stocktransaction_bag_time_idx'),
+        ]
+
     def __str__(self):
         return f"{self.transaction_type} - {self.blood_bag} - {self.timestamp}"
 
+class ExpirySweep(models.Model):
+    """
+    One row per run of the expiry sweeper. Once finished_at is set,
+    swept_until is the high-water mark: every AVAILABLE bag with an
+    expiration_date before it has been expired.
+    """
+    swept_until = models.DateField()
+    expired_count = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(default=now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Expiry sweep until {self.swept_until} - {self.expired_count} bags"
+
 class InventoryAlert(models.Model):
     ALERT_TYPES = [
         ('LOW_STOCK', 'Low Blood Stock'),
@@ -119,8 +377,31 @@ class InventoryAlert(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            # At most one open alert of each type per bank and blood group
+            models.UniqueConstraint(
+                fields=['blood_bank', 'blood_group', 'alert_type'],
+                condition=models.Q(is_active=True),
+                name='inventoryalert_one_active'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.alert_type} - {self.blood_group}"
+
+class AlertThreshold(models.Model):
+    """
+    Per blood bank alert thresholds. Banks without a row use
+    settings.INVENTORY_ALERT_THRESHOLDS.
+    """
+    blood_bank = models.OneToOneField(BloodBankProfile, on_delete=models.CASCADE, related_name='alert_threshold')
+    low_stock_units = models.PositiveIntegerField()
+    critical_shortage_units = models.PositiveIntegerField()
+    near_expiry_days = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"Alert thresholds - {self.blood_bank}"
     
 class BloodRequest(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -148,7 +429,8 @@ class BloodRequest(models.Model):
         ('O-', 'O -ve')
     ]
     consumer = models.ForeignKey(ConsumerProfile, on_delete=models.CASCADE, related_name='blood_requests')
-    blood_bank = models.ForeignKey(BloodBankProfile, on_delete=models.CASCADE, related_name='received_requests')
+    # Indexed by bloodrequest_bank_status_idx
+    blood_bank = models.ForeignKey(BloodBankProfile, on_delete=models.CASCADE, related_name='received_requests', db_index=False)
     # Request Details
     # blood_group = models.CharField(max_length=5)
     blood_group = models.CharField(max_length=5, choices=BLOOD_GROUPS)
@@ -175,6 +457,39 @@ class BloodRequest(models.Model):
     notes = models.TextField(blank=True, null=True)
     rejection_reason = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Pending requests per bank on the dashboard
+            models.Index(fields=['blood_bank', 'status'], name='bloodrequest_bank_status_idx'),
+        ]
+
+    def _locked_stock_key(self):
+        """
+        The stored stock_key() of this bag, or None if it has no row. A no-op
+        update locks the row first: as the transaction's first statement it
+        takes SQLite's write lock at once, where reading first would need a
+        lock upgrade that fails with "database is locked" under concurrent
+        status changes.
+        """
+        rows = BloodBag.objects.filter(pk=self.pk)
+        if not rows.update(status=models.F('status')):
+            return None
+        return rows.values_list('blood_bank_id', 'blood_group', 'status').first()
+
+    def save(self, *args, **kwargs):
+        from .dashboard import invalidate_dashboard
+
+        super().save(*args, **kwargs)
+        invalidate_dashboard(self.blood_bank_id)
+
+    def delete(self, *args, **kwargs):
+        from .dashboard import invalidate_dashboard
+
+        blood_bank_id = self.blood_bank_id
+        result = super().delete(*args, **kwargs)
+        invalidate_dashboard(blood_bank_id)
+        return result
+
     def __str__(self):
         return f"Request {self.id} - {self.blood_group} for {self.patient_name}"
     
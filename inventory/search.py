@@ -0,0 +1,56 @@
+from django.db.models import F
+from users.models import BloodBankProfile
+from raktkadi.pagination import KeysetPagination
+from .caching import aversioned_key, bump_version
+from .models import BloodBag
+
+SEARCH_NAMESPACE = 'blood_bank_search'
+
+
+class BloodBankSearchPagination(KeysetPagination):
+    orderings = ('-units', 'units')
+    unique_field = 'bank_id'
+
+
+def blood_banks_with_group(blood_group):
+    """
+    Verified banks holding available units of blood_group, with their unit
+    count, in one query: a join on the BankStockLevel counter row of each bank,
+    read in order from the (blood_group, status, units, blood_bank) index.
+    No per-bank count, no sort.
+    """
+    return BloodBankProfile.objects.filter(
+        status='VERIFIED',
+        stock_levels__blood_group=blood_group,
+        stock_levels__status='AVAILABLE',
+        stock_levels__units__gt=0
+    ).values(
+        'address',
+        bank_id=F('stock_levels__blood_bank_id'),
+        name=F('user__name'),
+        email=F('user__email'),
+        contact=F('user__contact'),
+        units=F('stock_levels__units')
+    )
+
+
+async def asearch_cache_key(blood_group, request):
+    return await aversioned_key(
+        SEARCH_NAMESPACE, blood_group, request.get_host(), request.query_params.urlencode()
+    )
+
+
+def invalidate_blood_bank_search(blood_group=None):
+    """Drops cached search pages for one blood group, or for all of them."""
+    blood_groups = [blood_group] if blood_group else [bg for bg, _ in BloodBag.BLOOD_GROUPS]
+    for bg in blood_groups:
+        bump_version(SEARCH_NAMESPACE, bg)
+
+
+def blood_bank_changed(sender, instance, **kwargs):
+    """
+    post_save / post_delete receiver: a bank's verification status, name,
+    contact or address appear in every search result, so drop them all.
+    """
+    if sender is BloodBankProfile or getattr(instance, 'user_type', None) == 'BLOOD_BANK':
+        invalidate_blood_bank_search()
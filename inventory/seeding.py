@@ -0,0 +1,335 @@
+"""
+Deterministic bulk data generator behind `manage.py seed` and the benchmarks.
+
+Every row is derived from the seed: users and profiles from one
+random.Random(seed) in this process, bags and requests in chunks, each chunk
+from its own Random(f'{seed}:<kind>:<chunk>'), so the output is the same
+whether the chunks are generated in one process or spread over a Pool.
+Workers build plain tuples already converted to database values and this
+process writes them with executemany: at millions of rows bulk_create's
+per row model instances and per field SQL compilation cost more than the
+inserts themselves. Nothing is hashed per row, every user shares one
+pre-hashed password.
+
+Models are imported inside the functions so that spawned workers can import
+this module before django.setup() has run.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from functools import partial
+from multiprocessing import Pool
+import random
+import uuid
+
+PASSWORD = 'Pass1234'
+
+SCALES = {
+    'smoke': dict(banks=20, staff=40, donors=200, consumers=100, bags=2_000, requests=400),
+    'small': dict(banks=100, staff=300, donors=5_000, consumers=1_000, bags=10_000, requests=2_000),
+    'large': dict(banks=5_000, staff=15_000, donors=200_000, consumers=50_000, bags=2_000_000, requests=200_000),
+}
+
+# Same addresses dummy.py used: hospital1@mail.com, staff1@mail.com, ...
+EMAIL_PREFIXES = {'BLOOD_BANK': 'hospital', 'STAFF': 'staff', 'DONOR': 'donor', 'CONSUMER': 'consumer'}
+
+# Rough ABO/Rh distribution of Indian donors
+BLOOD_GROUP_WEIGHTS = {
+    'B+': 32, 'O+': 29, 'A+': 21, 'AB+': 8, 'B-': 3, 'O-': 3, 'A-': 2, 'AB-': 2,
+}
+CITIES = [
+    ('Pune', 'Maharashtra', '411001'), ('Mumbai', 'Maharashtra', '400001'),
+    ('Bengaluru', 'Karnataka', '560001'), ('Chennai', 'Tamil Nadu', '600001'),
+    ('Delhi', 'Delhi', '110001'), ('Kolkata', 'West Bengal', '700001'),
+    ('Hyderabad', 'Telangana', '500001'), ('Ahmedabad', 'Gujarat', '380001'),
+]
+# Whole blood in CPDA-1 keeps 35 days, red cells in SAGM 42
+SHELF_LIFE_DAYS = (35, 42)
+COLLECTION_WINDOW_DAYS = 60
+CHUNK_SIZE = 20_000
+BATCH_SIZE = 5_000
+
+
+def email(user_type, number):
+    return f'{EMAIL_PREFIXES[user_type]}{number}@mail.com'
+
+
+def _blood_groups(rng, count):
+    return rng.choices(list(BLOOD_GROUP_WEIGHTS), weights=list(BLOOD_GROUP_WEIGHTS.values()), k=count)
+
+
+USER_FIELDS = ('email', 'password', 'name', 'contact', 'user_type', 'is_active', 'is_staff',
+               'is_superuser', 'date_joined', 'created_date', 'modified_date')
+BANK_FIELDS = ('id', 'user', 'address', 'city', 'state', 'pincode', 'status')
+STAFF_FIELDS = ('id', 'user', 'blood_bank', 'role')
+DONOR_FIELDS = ('id', 'user', 'blood_group', 'last_donation', 'address', 'city', 'state', 'pincode')
+CONSUMER_FIELDS = ('id', 'user', 'blood_group', 'address', 'city', 'state', 'pincode')
+BAG_FIELDS = ('id', 'blood_bank', 'donor', 'blood_group', 'volume_ml', 'collection_date', 'expiration_date',
+              'status', 'barcode', 'created_at', 'updated_at')
+TRANSACTION_FIELDS = ('blood_bag', 'transaction_type', 'timestamp')
+REQUEST_FIELDS = ('id', 'consumer', 'blood_bank', 'blood_group', 'units_required', 'priority', 'patient_name',
+                  'patient_age', 'patient_gender', 'hospital_name', 'status', 'requested_date', 'required_date',
+                  'response_date', 'rejection_reason')
+
+
+# Fields whose python values need converting for the database, the rest are sent as they are
+CONVERTED_TYPES = {'DateField', 'DateTimeField', 'DecimalField', 'UUIDField', 'BooleanField'}
+
+
+def prepare(model, field_names, rows):
+    """rows of python values (in field_names order) as database values, what bulk_create would send."""
+    from django.db import DEFAULT_DB_ALIAS, connections
+
+    connection = connections[DEFAULT_DB_ALIAS]
+    fields = [model._meta.get_field(name) for name in field_names]
+    converted = [
+        (position, partial(field.get_db_prep_save, connection=connection))
+        for position, field in enumerate(fields) if field.get_internal_type() in CONVERTED_TYPES
+    ]
+    prepared = []
+    for row in rows:
+        row = list(row)
+        for position, convert in converted:
+            row[position] = convert(row[position])
+        prepared.append(tuple(row))
+    return prepared
+
+
+def insert(model, field_names, rows):
+    """Inserts rows already converted by prepare(), BATCH_SIZE rows per executemany."""
+    from django.db import connection
+
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(model._meta.get_field(name).column) for name in field_names),
+        ', '.join(['%s'] * len(field_names)),
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), BATCH_SIZE):
+            cursor.executemany(sql, rows[start:start + BATCH_SIZE])
+
+
+def next_id(model):
+    from django.db.models import Max
+
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def seed_users(rng, now, banks, staff, donors, consumers):
+    """
+    Users and profiles. Returns the verified bank ids and the (id, blood
+    group) of every donor and consumer profile.
+    """
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from users.models import BloodBankProfile, ConsumerProfile, DonorProfile, StaffProfile
+
+    User = get_user_model()
+    password = make_password(PASSWORD)
+    today = now.date()
+
+    def users(user_type, count):
+        emails = [email(user_type, number) for number in range(1, count + 1)]
+        insert(User, USER_FIELDS, prepare(User, USER_FIELDS, [
+            (user_email, password, f'{EMAIL_PREFIXES[user_type].title()} {number}',
+             f'+91{rng.randrange(7_000_000_000, 9_999_999_999)}', user_type, True, False, False, now, now, now)
+            for number, user_email in enumerate(emails, 1)
+        ]))
+        return emails
+
+    def profiles(model, fields, emails, values):
+        first = next_id(model)
+        rows = [(first + offset, user, *value) for offset, (user, value) in enumerate(zip(emails, values))]
+        insert(model, fields, prepare(model, fields, rows))
+        return rows
+
+    def place():
+        city, state, pincode = rng.choice(CITIES)
+        return f'{rng.randrange(1, 400)} Main Road', city, state, pincode
+
+    bank_rows = profiles(BloodBankProfile, BANK_FIELDS, users('BLOOD_BANK', banks), [
+        (*place(), rng.choices(['VERIFIED', 'PENDING', 'REJECTED'], [90, 7, 3])[0]) for _ in range(banks)
+    ])
+    if bank_rows:
+        profiles(StaffProfile, STAFF_FIELDS, users('STAFF', staff), [
+            (rng.choice(bank_rows)[0], rng.choice(['Manager', 'Coordinator', 'Technician', 'Receptionist']))
+            for _ in range(staff)
+        ])
+    donor_rows = profiles(DonorProfile, DONOR_FIELDS, users('DONOR', donors), [
+        (group, today - timedelta(days=rng.randrange(1, 720)) if rng.random() < 0.7 else None, *place())
+        for group in _blood_groups(rng, donors)
+    ])
+    consumer_rows = profiles(ConsumerProfile, CONSUMER_FIELDS, users('CONSUMER', consumers), [
+        (group, *place()) for group in _blood_groups(rng, consumers)
+    ])
+    return (
+        [row[0] for row in bank_rows if row[-1] == 'VERIFIED'],
+        [row[:3:2] for row in donor_rows],
+        [row[:3:2] for row in consumer_rows],
+    )
+
+
+# Read only data every worker needs, set once per process by _init_worker
+_shared = {}
+
+
+def _init_worker(shared):
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+    _shared.update(shared)
+
+
+def bag_chunk(task):
+    """
+    Bags of whole banks, so barcodes can be numbered per (bank, day) here:
+    returns (bag rows, transaction rows, {(bank_id, day): last sequence}),
+    rows ready for insert(). Bags are collected over the last
+    COLLECTION_WINDOW_DAYS days; the ones past their shelf life are mostly
+    EXPIRED, the rest mostly AVAILABLE.
+    """
+    from inventory.models import BloodBag, StockTransaction, format_barcode
+
+    seed, index, bag_id, bank_counts = task
+    rng = random.Random(f'{seed}:bags:{index}')
+    now, donors = _shared['now'], _shared['donors']
+    today = now.date()
+    bags, transactions, sequences = [], [], defaultdict(int)
+
+    for bank_id, count in bank_counts:
+        for _ in range(count):
+            donor_id, blood_group = rng.choice(donors)
+            collection_date = today - timedelta(days=rng.randrange(COLLECTION_WINDOW_DAYS))
+            expiration_date = collection_date + timedelta(days=rng.choice(SHELF_LIFE_DAYS))
+            if expiration_date < today:
+                status = rng.choices(['EXPIRED', 'USED'], [60, 40])[0]
+            else:
+                status = rng.choices(['AVAILABLE', 'RESERVED', 'USED'], [80, 5, 15])[0]
+            sequences[bank_id, collection_date] += 1
+            barcode = format_barcode(bank_id, blood_group, collection_date, sequences[bank_id, collection_date])
+            bags.append((bag_id, bank_id, donor_id, blood_group, rng.choice([350, 450]),
+                         collection_date, expiration_date, status, barcode, now, now))
+
+            collected_at = datetime.combine(collection_date, time(), dt_timezone.utc) + \
+                timedelta(minutes=rng.randrange(8 * 60, 18 * 60))
+            transactions.append((bag_id, 'COLLECTION', collected_at))
+            if status in ('USED', 'RESERVED'):
+                transactions.append((bag_id, 'ALLOCATION', collected_at + timedelta(days=rng.randrange(1, 30))))
+            elif status == 'EXPIRED':
+                transactions.append((bag_id, 'DISPOSAL', collected_at + timedelta(days=36)))
+            bag_id += 1
+    return (
+        prepare(BloodBag, BAG_FIELDS, bags),
+        prepare(StockTransaction, TRANSACTION_FIELDS, transactions),
+        dict(sequences),
+    )
+
+
+def request_chunk(task):
+    """count blood requests: mostly 1-2 units, a quarter urgent or worse, 40% still pending."""
+    from inventory.models import BloodRequest
+
+    seed, index, count = task
+    rng = random.Random(f'{seed}:requests:{index}')
+    now, banks, consumers = _shared['now'], _shared['banks'], _shared['consumers']
+    today = now.date()
+
+    requests = []
+    for _ in range(count):
+        status = rng.choices(['PENDING', 'APPROVED', 'REJECTED', 'COMPLETED'], [40, 35, 10, 15])[0]
+        consumer_id, blood_group = rng.choice(consumers)
+        requests.append((
+            uuid.UUID(int=rng.getrandbits(128), version=4), consumer_id, rng.choice(banks), blood_group,
+            rng.choices([1, 2, 3, 4], [50, 30, 12, 8])[0],
+            rng.choices(['NORMAL', 'URGENT', 'EMERGENCY'], [75, 20, 5])[0],
+            f'Patient {rng.randrange(1_000_000)}', rng.randrange(1, 90), rng.choice(['Male', 'Female']),
+            f'Hospital {rng.randrange(500)}', status, now, today + timedelta(days=rng.randrange(-10, 14)),
+            None if status == 'PENDING' else now,
+            'Insufficient stock' if status == 'REJECTED' else None,
+        ))
+    return prepare(BloodRequest, REQUEST_FIELDS, requests)
+
+
+def bag_tasks(rng, seed, banks, count, first_id):
+    """
+    Splits count bags over the banks (a few large banks hold most of the
+    stock) into tasks of about CHUNK_SIZE bags, each with its first bag id.
+    """
+    weights = [rng.paretovariate(1.5) for _ in banks]
+    per_bank = Counter(rng.choices(range(len(banks)), weights=weights, k=count))
+
+    tasks, current, size = [], [], 0
+    for position in range(len(banks)):
+        if per_bank[position]:
+            current.append((banks[position], per_bank[position]))
+            size += per_bank[position]
+        if size >= CHUNK_SIZE or (position == len(banks) - 1 and current):
+            tasks.append((seed, len(tasks), first_id, current))
+            first_id += size
+            current, size = [], 0
+    return tasks
+
+
+def seed(counts, seed=0, jobs=1, log=None):
+    """
+    Adds counts['banks'|'staff'|'donors'|'consumers'|'bags'|'requests'] rows
+    to a migrated database without seeded users. Returns the row counts written.
+    """
+    from django.core.cache import cache
+    from django.db import transaction
+    from django.utils import timezone
+    from inventory.models import BankStockLevel, BarcodeSequence, BloodBag, BloodRequest, StockTransaction
+
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    # Whole seconds, so every database stores the same timestamps
+    now = timezone.now().replace(microsecond=0)
+    written = Counter()
+
+    with transaction.atomic():
+        banks, donors, consumers = seed_users(
+            rng, now, counts['banks'], counts['staff'], counts['donors'], counts['consumers']
+        )
+        written['users'] = counts['banks'] + counts['staff'] + counts['donors'] + counts['consumers']
+        log(f"{written['users']} users and profiles")
+
+        shared = {'now': now, 'banks': banks, 'donors': donors, 'consumers': consumers}
+        tasks = bag_tasks(rng, seed, banks, counts['bags'], next_id(BloodBag)) if banks and donors else []
+        request_tasks = [
+            (seed, index, min(CHUNK_SIZE, counts['requests'] - start))
+            for index, start in enumerate(range(0, counts['requests'] if banks and consumers else 0, CHUNK_SIZE))
+        ]
+
+        pool = Pool(jobs, _init_worker, (shared,)) if jobs > 1 else None
+        if pool is None:
+            _init_worker(shared)
+        try:
+            sequences = {}
+            for bags, transactions, chunk_sequences in (pool.imap if pool else map)(bag_chunk, tasks):
+                insert(BloodBag, BAG_FIELDS, bags)
+                insert(StockTransaction, TRANSACTION_FIELDS, transactions)
+                sequences.update(chunk_sequences)
+                written['bags'] += len(bags)
+                written['transactions'] += len(transactions)
+                log(f"{written['bags']} bags, {written['transactions']} transactions")
+
+            for requests in (pool.imap if pool else map)(request_chunk, request_tasks):
+                insert(BloodRequest, REQUEST_FIELDS, requests)
+                written['requests'] += len(requests)
+                log(f"{written['requests']} requests")
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        # Later barcodes for the same bank and day continue after the seeded ones
+        BarcodeSequence.objects.bulk_create(
+            [BarcodeSequence(blood_bank_id=bank_id, date=date, last_value=last_value)
+             for (bank_id, date), last_value in sequences.items()],
+            batch_size=BATCH_SIZE
+        )
+        BankStockLevel.rebuild()
+    cache.clear()
+    return dict(written)
@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import BloodBag, Admin, BloodBankProfile , BloodRequest
+from rest_framework.settings import api_settings
+from django.db import transaction
+from collections import Counter
+from .models import BloodBag, BloodBankProfile , BloodRequest, StockTransaction, BankStockLevel
 
 class BloodBagSerializer(serializers.ModelSerializer):
     donor_email = serializers.EmailField(
@@ -137,4 +140,117 @@ class BloodRequestResponseSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Rejection reason is required when rejecting a request")
         return data
 
-## end ##
\ No newline at end of file
+
+class BloodBagBatchItemSerializer(BloodBagSerializer):
+    """
+    Field-level validation for one bag of a batch intake. Blood bank and donor
+    emails are resolved for the whole batch at once, so no lookups happen here.
+    """
+
+    def validate_blood_bank_email(self, value):
+        return value
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            unexpected_fields = set(data.keys()) - set(self.fields.keys())
+            if unexpected_fields:
+                raise serializers.ValidationError({
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        f"Got unexpected fields: {', '.join(unexpected_fields)}"
+                    ]
+                })
+        return super().to_internal_value(data)
+
+    def validate(self, data):
+        if data['collection_date'] >= data['expiration_date']:
+            raise serializers.ValidationError("Expiration date must be after collection date")
+        return data
+
+
+class BloodBagBatchSerializer(serializers.ListSerializer):
+    """
+    Validates and creates a list of blood bags in one go:
+    each distinct bank/donor email is looked up once, barcodes are assigned
+    up front and bags plus their COLLECTION transactions are bulk inserted.
+    Errors are reported per item, in the same order as the input.
+    """
+    child = BloodBagBatchItemSerializer()
+
+    def to_internal_value(self, data):
+        from users.models import BloodBankProfile, DonorProfile
+
+        try:
+            attrs = super().to_internal_value(data)
+            errors = [{} for _ in attrs]
+        except serializers.ValidationError as exc:
+            if not isinstance(exc.detail, list):
+                raise
+            # Field errors stop the list before the lookups: validate the
+            # items that passed again, so they get their email errors as well
+            errors = exc.detail
+            attrs = [
+                None if item_errors else self.child.run_validation(item)
+                for item, item_errors in zip(data, errors)
+            ]
+        valid = [item for item in attrs if item is not None]
+        bank_emails = {item['blood_bank']['user']['email'] for item in valid}
+        donor_emails = {item['donor']['user']['email'] for item in valid}
+
+        banks = {
+            email: (bank_id, bank_status)
+            for email, bank_id, bank_status in BloodBankProfile.objects.filter(
+                user__email__in=bank_emails
+            ).values_list('user__email', 'id', 'status')
+        }
+        donors = dict(
+            DonorProfile.objects.filter(
+                user__email__in=donor_emails
+            ).values_list('user__email', 'id')
+        )
+
+        for item, item_errors in zip(attrs, errors):
+            if item is None:
+                continue
+            bank_email = item['blood_bank']['user']['email']
+            donor_email = item['donor']['user']['email']
+
+            if bank_email not in banks:
+                item_errors['blood_bank_email'] = ["Blood bank with this email does not exist."]
+            elif banks[bank_email][1] != 'VERIFIED':
+                item_errors['blood_bank_email'] = [
+                    f"Blood bank is not verified. Current status: {banks[bank_email][1]}"
+                ]
+            if donor_email not in donors:
+                item_errors['donor_email'] = ["Donor with this email does not exist."]
+
+            if not item_errors:
+                item['blood_bank_id'] = banks[bank_email][0]
+                item['donor_id'] = donors[donor_email]
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        blood_bags = [
+            BloodBag(
+                blood_bank_id=item['blood_bank_id'],
+                donor_id=item['donor_id'],
+                blood_group=item['blood_group'],
+                volume_ml=item['volume_ml'],
+                collection_date=item['collection_date'],
+                expiration_date=item['expiration_date'],
+            )
+            for item in validated_data
+        ]
+        with transaction.atomic():
+            BloodBag.assign_barcodes(blood_bags)
+            BloodBag.objects.bulk_create(blood_bags)
+            StockTransaction.objects.bulk_create([
+                StockTransaction(blood_bag=blood_bag, transaction_type='COLLECTION')
+                for blood_bag in blood_bags
+            ])
+            BankStockLevel.adjust(Counter(blood_bag.stock_key() for blood_bag in blood_bags))
+        return blood_bags
+
+## end ##
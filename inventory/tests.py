@@ -1,3 +1,935 @@
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from base64 import urlsafe_b64encode
+from benchmarks.endpoints import ENDPOINTS, Fixtures
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from raktkadi.log_analysis import QuantileSketch
+from raktkadi.metrics import MetricsRegistry
+from unittest import mock, skipUnless
+from users.models import Admin, BloodBankProfile, ConsumerProfile, DonorProfile
+from users.revocation import revocation_list
+from .allocation import FEFOPolicy
+from .alerts import evaluate_alerts
+from .compatibility import compatible_donor_groups
+from .expiry import last_swept_until, sweep_expired_bags
+from .models import (
+    AlertThreshold, BankStockLevel, BarcodeSequence, BloodBag, BloodRequest, ExpirySweep, InventoryAlert,
+    StockTransaction, barcode_check_character,
+)
+from .seeding import seed
+from .views import BloodRequestResponseView
+import gzip
+import io
+import json
+import logging
+import math
+import os
+import random
+import re
+import tempfile
+import threading
+import time
 
-# Create your tests here.
+
+def create_bank(email='bank@test.com', status='VERIFIED'):
+    user = Admin.objects.create_user(email=email, password='secret-pass', name='Bank', user_type='BLOOD_BANK')
+    return BloodBankProfile.objects.create(user=user, address='Address', status=status)
+
+
+def create_donor(email='donor@test.com', blood_group='A+'):
+    user = Admin.objects.create_user(email=email, password='secret-pass', name='Donor', user_type='DONOR')
+    return DonorProfile.objects.create(user=user, blood_group=blood_group, address='Address')
+
+
+def create_consumer(email='consumer@test.com', blood_group='A+'):
+    user = Admin.objects.create_user(email=email, password='secret-pass', name='Consumer', user_type='CONSUMER')
+    return ConsumerProfile.objects.create(user=user, blood_group=blood_group, address='Address')
+
+
+def create_bags(bank, blood_group, expiration_dates, status='AVAILABLE'):
+    """One bag per expiration date, collected 35 days before it."""
+    return [
+        BloodBag.objects.create(
+            blood_bank=bank, blood_group=blood_group, volume_ml=450, status=status,
+            collection_date=expires - timedelta(days=35), expiration_date=expires
+        )
+        for expires in expiration_dates
+    ]
+
+
+def create_request(bank, consumer, blood_group='A+', units_required=1, **fields):
+    return BloodRequest.objects.create(
+        consumer=consumer, blood_bank=bank, blood_group=blood_group, units_required=units_required,
+        patient_name='Patient', patient_age=30, patient_gender='Female', hospital_name='Hospital',
+        required_date=fields.pop('required_date', date.today() + timedelta(days=2)), **fields
+    )
+
+
+class BloodBagBatchTests(TestCase):
+
+    def setUp(self):
+        self.bank = create_bank()
+        self.donor = create_donor()
+        self.today = date.today()
+
+    def item(self, **overrides):
+        return dict({
+            'blood_group': 'A+',
+            'volume_ml': '450.00',
+            'collection_date': str(self.today),
+            'expiration_date': str(self.today + timedelta(days=42)),
+            'donor_email': 'donor@test.com',
+            'blood_bank_email': 'bank@test.com',
+        }, **overrides)
+
+    def post(self, items):
+        return self.client.post('/inventory/create/batch/', items, content_type='application/json')
+
+    def test_errors_are_aligned_with_items(self):
+        create_bank('pending@test.com', status='PENDING')
+        response = self.post([
+            self.item(),
+            self.item(donor_email='nobody@test.com'),
+            self.item(extra='field'),
+            self.item(blood_bank_email='pending@test.com'),
+            self.item(expiration_date=str(self.today)),
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(len(errors), 5)
+        self.assertEqual(errors[0], {})
+        self.assertEqual(list(errors[1]), ['donor_email'])
+        self.assertIn('unexpected fields: extra', errors[2]['non_field_errors'][0])
+        self.assertIn('not verified', errors[3]['blood_bank_email'][0])
+        self.assertIn('Expiration date', errors[4]['non_field_errors'][0])
+        self.assertFalse(BloodBag.objects.exists())
+
+    @override_settings(LOG_PAYLOAD_MAX_LENGTH=10)
+    def test_rejected_batch_logs_the_whole_payload(self):
+        with self.assertLogs('api_logger', 'ERROR') as logs:
+            self.post([self.item(donor_email='nobody@test.com')])
+        self.assertIn("Errors: [{'donor_email'", logs.output[0])
+        self.assertIn("'donor_email': 'nobody@test.com'", logs.output[0])
+
+    @override_settings(BLOOD_BAG_BATCH_MAX_SIZE=3)
+    def test_batch_size_is_capped(self):
+        self.assertEqual(self.post([self.item()] * 4).status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post([self.item()] * 3).status_code, 201)
+        self.assertEqual(BloodBag.objects.count(), 3)
+
+    def test_bags_and_transactions_are_inserted_together(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.post([self.item(blood_group=group) for group in ['A+', 'B+', 'O-'] * 20])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 60)
+        inserts = [query['sql'] for query in context.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(sum('"inventory_bloodbag"' in sql for sql in inserts), 1)
+        self.assertEqual(sum('"inventory_stocktransaction"' in sql for sql in inserts), 1)
+        self.assertEqual(StockTransaction.objects.filter(transaction_type='COLLECTION').count(), 60)
+        self.assertEqual(
+            BankStockLevel.objects.get(blood_bank=self.bank, blood_group='O-', status='AVAILABLE').units, 20
+        )
+
+    def test_failed_insert_leaves_nothing_behind(self):
+        with mock.patch.object(StockTransaction.objects, 'bulk_create', side_effect=RuntimeError('disk full')):
+            response = self.post([self.item()] * 5)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(BloodBag.objects.exists())
+        self.assertFalse(BankStockLevel.objects.filter(units__gt=0).exists())
+
+    def test_barcodes_come_from_one_block_per_bank_and_day(self):
+        yesterday = self.today - timedelta(days=1)
+        response = self.post([self.item()] * 3 + [self.item(collection_date=str(yesterday))] * 2)
+        self.assertEqual(response.status_code, 201)
+
+        sequences = dict(BarcodeSequence.objects.values_list('date', 'last_value'))
+        self.assertEqual(sequences, {self.today: 3, yesterday: 2})
+        barcodes = [bag['barcode'] for bag in response.json()]
+        self.assertEqual([barcode.split('-')[4] for barcode in barcodes], ['00001', '00002', '00003', '00001', '00002'])
+        for barcode in barcodes:
+            body, check = barcode.rsplit('-', 1)
+            self.assertEqual(barcode_check_character(body), check)
+
+        # A single create afterwards continues the same sequence
+        bag = create_bags(self.bank, 'A+', [self.today + timedelta(days=35)])[0]
+        self.assertEqual(bag.barcode.split('-')[4], '00004')
+
+
+class ConcurrentIntakeTests(TransactionTestCase):
+    """Saves from several threads at once, each on its own connection."""
+
+    def run_threads(self, work, threads=8):
+        errors = []
+
+        def run(n):
+            try:
+                work(n)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return errors
+
+    def test_concurrent_creates_get_distinct_barcodes(self):
+        bank = create_bank()
+        expires = date.today() + timedelta(days=30)
+
+        errors = self.run_threads(lambda n: create_bags(bank, 'A+', [expires] * 10))
+
+        self.assertEqual(errors, [])
+        barcodes = list(BloodBag.objects.values_list('barcode', flat=True))
+        self.assertEqual(len(barcodes), 80)
+        self.assertEqual(sorted(barcode.split('-')[4] for barcode in barcodes), [f'{n:05d}' for n in range(1, 81)])
+        self.assertEqual(BarcodeSequence.objects.get().last_value, 80)
+        self.assertEqual(BankStockLevel.available_units(bank.id, 'A+'), 80)
+
+    def test_concurrent_status_changes_keep_the_counters(self):
+        bank = create_bank()
+        bags = create_bags(bank, 'A+', [date.today() + timedelta(days=30)] * 80)
+
+        def work(n):
+            for bag in bags[n * 10:(n + 1) * 10]:
+                bag.status = 'RESERVED'
+                bag.save()
+            bags[n * 10].delete()
+
+        self.assertEqual(self.run_threads(work), [])
+        self.assertEqual(BankStockLevel.rebuild(dry_run=True), [])
+        self.assertEqual(BloodBag.objects.filter(status='RESERVED').count(), 72)
+
+
+
+class AllocationTests(TestCase):
+
+    def setUp(self):
+        self.bank = create_bank()
+        self.consumer = create_consumer()
+        self.today = date.today()
+
+    def respond(self, blood_request, status='APPROVED'):
+        return self.client.patch(
+            f'/inventory/request/{blood_request.id}/respond/', {'status': status}, content_type='application/json'
+        )
+
+    def test_partial_fill_reports_the_shortfall(self):
+        bags = create_bags(self.bank, 'A+', [self.today + timedelta(days=days) for days in (9, 3, 6)])
+        blood_request = create_request(self.bank, self.consumer, units_required=5)
+
+        response = self.respond(blood_request)
+
+        self.assertEqual(response.status_code, 200)
+        allocation = response.json()['allocation']
+        self.assertEqual(
+            {key: allocation[key] for key in ('units_required', 'allocated', 'shortfall', 'partial', 'units_by_blood_group')},
+            {'units_required': 5, 'allocated': 3, 'shortfall': 2, 'partial': True, 'units_by_blood_group': {'A+': 3}}
+        )
+        self.assertEqual(allocation['blood_bag_ids'], [bags[1].id, bags[2].id, bags[0].id])
+        self.assertEqual(set(BloodBag.objects.values_list('status', flat=True)), {'RESERVED'})
+        self.assertEqual(StockTransaction.objects.filter(transaction_type='ALLOCATION').count(), 3)
+        self.assertEqual(blood_request.allocated_blood_bags.count(), 3)
+
+    def test_bag_claimed_meanwhile_is_a_conflict(self):
+        available = create_bags(self.bank, 'A+', [self.today + timedelta(days=5)])
+        claimed = create_bags(self.bank, 'A+', [self.today + timedelta(days=4)], status='RESERVED')
+        blood_request = create_request(self.bank, self.consumer, units_required=2)
+
+        # The policy saw both bags as available, another request reserved one first
+        picked = BloodBag.objects.filter(id__in=[available[0].id, claimed[0].id]).order_by('id')
+        with mock.patch.object(FEFOPolicy, 'candidates', return_value=picked), \
+                mock.patch.object(FEFOPolicy, 'plan', return_value=[('A+', 2)]):
+            response = self.respond(blood_request)
+
+        self.assertEqual(response.status_code, 409)
+        blood_request.refresh_from_db()
+        self.assertEqual(blood_request.status, 'PENDING')
+        self.assertEqual(BloodBag.objects.get(id=available[0].id).status, 'AVAILABLE')
+        self.assertFalse(StockTransaction.objects.filter(transaction_type='ALLOCATION').exists())
+
+    def test_approving_again_does_not_allocate_twice(self):
+        create_bags(self.bank, 'A+', [self.today + timedelta(days=days) for days in range(3, 9)])
+        blood_request = create_request(self.bank, self.consumer, units_required=2)
+
+        first = self.respond(blood_request)
+        second = self.respond(blood_request)
+
+        self.assertEqual(first.json()['allocation']['allocated'], 2)
+        self.assertEqual(second.status_code, 200)
+        self.assertNotIn('allocation', second.json())
+        self.assertEqual(blood_request.allocated_blood_bags.count(), 2)
+        self.assertEqual(BloodBag.objects.filter(status='RESERVED').count(), 2)
+
+    def test_approval_on_a_stale_instance_does_not_allocate_again(self):
+        create_bags(self.bank, 'A+', [self.today + timedelta(days=days) for days in range(3, 9)])
+        blood_request = create_request(self.bank, self.consumer, units_required=2)
+        # Loaded while still PENDING, as a concurrent PATCH would have it
+        stale = BloodRequest.objects.select_related('blood_bank__user').get(pk=blood_request.pk)
+
+        self.assertEqual(self.respond(blood_request).json()['allocation']['allocated'], 2)
+        with mock.patch.object(BloodRequestResponseView, 'get_object', return_value=stale):
+            second = self.respond(blood_request)
+
+        self.assertEqual(second.status_code, 200)
+        self.assertNotIn('allocation', second.json())
+        self.assertEqual(blood_request.allocated_blood_bags.count(), 2)
+        self.assertEqual(BloodBag.objects.filter(status='RESERVED').count(), 2)
+        self.assertEqual(BankStockLevel.available_units(self.bank.id, 'A+'), 4)
+
+    def test_expired_bags_are_never_allocated(self):
+        # Still AVAILABLE because no sweep has run since they expired
+        expired = create_bags(self.bank, 'A+', [self.today - timedelta(days=days) for days in (1, 400)])
+        usable = create_bags(self.bank, 'A+', [self.today])
+        substitute = create_bags(self.bank, 'O+', [self.today + timedelta(days=10)])
+        blood_request = create_request(self.bank, self.consumer, units_required=3)
+
+        allocation = self.respond(blood_request).json()['allocation']
+
+        # The expired A+ bags do not count as A+ availability when planning substitution
+        self.assertEqual(allocation['units_by_blood_group'], {'A+': 1, 'O+': 1})
+        self.assertEqual(allocation['blood_bag_ids'], [usable[0].id, substitute[0].id])
+        self.assertEqual({bag.status for bag in BloodBag.objects.filter(id__in=[bag.id for bag in expired])}, {'AVAILABLE'})
+
+    def test_respond_url_takes_the_request_uuid(self):
+        blood_request = create_request(self.bank, self.consumer)
+        self.assertEqual(self.client.patch(
+            '/inventory/request/1/respond/', {'status': 'REJECTED'}, content_type='application/json'
+        ).status_code, 404)
+        self.assertEqual(self.client.patch(
+            f'/inventory/request/{BloodRequest._meta.pk.default()}/respond/', {'status': 'APPROVED'},
+            content_type='application/json'
+        ).status_code, 404)
+        response = self.client.patch(
+            f'/inventory/request/{blood_request.id}/respond/',
+            {'status': 'REJECTED', 'rejection_reason': 'No stock'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'REJECTED')
+
+
+class SubstitutionTests(TestCase):
+
+    def setUp(self):
+        self.bank = create_bank()
+        self.consumer = create_consumer()
+        soon = date.today() + timedelta(days=5)
+        for blood_group, units in [('O-', 2), ('O+', 1), ('A-', 1), ('B+', 3)]:
+            create_bags(self.bank, blood_group, [soon] * units)
+
+    def approve(self, blood_request):
+        return self.client.patch(
+            f'/inventory/request/{blood_request.id}/respond/', {'status': 'APPROVED'}, content_type='application/json'
+        ).json()['allocation']
+
+    def test_compatible_groups_keep_the_universal_donor_last(self):
+        self.assertEqual(compatible_donor_groups('A+'), ['A+', 'A-', 'O+', 'O-'])
+        self.assertEqual(compatible_donor_groups('AB+'), ['AB+', 'AB-', 'A+', 'A-', 'B+', 'B-', 'O+', 'O-'])
+        self.assertEqual(compatible_donor_groups('B-'), ['B-', 'O-'])
+        self.assertEqual(compatible_donor_groups('O-'), ['O-'])
+
+    def test_request_is_filled_from_compatible_groups_in_order(self):
+        blood_request = create_request(self.bank, self.consumer, 'A+', units_required=3)
+
+        allocation = self.approve(blood_request)
+
+        self.assertEqual(list(allocation['units_by_blood_group'].items()), [('A-', 1), ('O+', 1), ('O-', 1)])
+        self.assertEqual(allocation['shortfall'], 0)
+        notes = StockTransaction.objects.filter(transaction_type='ALLOCATION').values_list('notes', flat=True)
+        self.assertTrue(all('Substituted' in note and 'for A+' in note for note in notes))
+        self.assertEqual(BloodBag.objects.filter(blood_group='O-', status='AVAILABLE').count(), 1)
+        self.assertEqual(BloodBag.objects.filter(blood_group='B+', status='AVAILABLE').count(), 3)
+
+    @override_settings(BLOOD_BAG_ALLOW_SUBSTITUTION=False)
+    def test_substitution_can_be_turned_off(self):
+        blood_request = create_request(self.bank, self.consumer, 'A+', units_required=2)
+
+        allocation = self.approve(blood_request)
+
+        self.assertEqual(allocation['allocated'], 0)
+        self.assertEqual(allocation['shortfall'], 2)
+        self.assertFalse(BloodBag.objects.filter(status='RESERVED').exists())
+
+
+class ExpirySweepTests(TestCase):
+
+    def setUp(self):
+        self.bank = create_bank()
+        self.today = date.today()
+
+    def levels(self, blood_group='A+'):
+        return dict(BankStockLevel.objects.filter(blood_bank=self.bank, blood_group=blood_group).values_list('status', 'units'))
+
+    def disposals(self):
+        return StockTransaction.objects.filter(transaction_type='DISPOSAL')
+
+    def test_bags_are_expired_in_chunks(self):
+        bags = create_bags(self.bank, 'A+', [self.today - timedelta(days=days) for days in range(1, 6)])
+        create_bags(self.bank, 'A+', [self.today, self.today + timedelta(days=3)])
+
+        with CaptureQueriesContext(connection) as context:
+            sweep = sweep_expired_bags(chunk_size=2)
+
+        self.assertEqual(sweep.expired_count, 5)
+        self.assertEqual(set(BloodBag.objects.filter(status='EXPIRED').values_list('id', flat=True)), {bag.id for bag in bags})
+        self.assertEqual(self.disposals().count(), 5)
+        self.assertEqual(self.levels(), {'AVAILABLE': 2, 'EXPIRED': 5})
+        flips = [query for query in context.captured_queries if query['sql'].startswith('UPDATE "inventory_bloodbag"')]
+        self.assertEqual(len(flips), 3)
+
+    def test_next_sweep_starts_from_the_high_water_mark(self):
+        sweep_expired_bags(today=self.today - timedelta(days=10))
+        self.assertEqual(last_swept_until(), self.today - timedelta(days=10))
+
+        # Back-dated intake behind the mark is only picked up by a full sweep
+        old = create_bags(self.bank, 'A+', [self.today - timedelta(days=20)])
+        new = create_bags(self.bank, 'A+', [self.today - timedelta(days=2)])
+        self.assertEqual(sweep_expired_bags().expired_count, 1)
+        self.assertEqual(BloodBag.objects.get(id=new[0].id).status, 'EXPIRED')
+        self.assertEqual(BloodBag.objects.get(id=old[0].id).status, 'AVAILABLE')
+
+        call_command('expire_bags', '--full', stdout=io.StringIO())
+        self.assertEqual(BloodBag.objects.get(id=old[0].id).status, 'EXPIRED')
+        self.assertEqual(self.disposals().count(), 2)
+        self.assertEqual(last_swept_until(), self.today)
+
+    def test_interrupted_sweep_does_not_move_the_mark(self):
+        create_bags(self.bank, 'A+', [self.today - timedelta(days=days) for days in range(1, 5)])
+        adjust = BankStockLevel.adjust
+        calls = []
+
+        def adjust_then_crash(deltas):
+            calls.append(deltas)
+            if len(calls) == 2:
+                raise RuntimeError('killed')
+            adjust(deltas)
+
+        with mock.patch.object(BankStockLevel, 'adjust', side_effect=adjust_then_crash):
+            with self.assertRaises(RuntimeError):
+                sweep_expired_bags(chunk_size=2)
+
+        self.assertIsNone(last_swept_until())
+        self.assertEqual(BloodBag.objects.filter(status='AVAILABLE').count(), 2)
+        self.assertEqual(sweep_expired_bags().expired_count, 2)
+        self.assertFalse(BloodBag.objects.filter(status='AVAILABLE').exists())
+        self.assertEqual(self.levels(), {'AVAILABLE': 0, 'EXPIRED': 4})
+
+    def test_only_flipped_bags_are_disposed_of(self):
+        bags = create_bags(self.bank, 'A+', [self.today - timedelta(days=days) for days in range(1, 4)])
+        update = QuerySet.update
+
+        def reserve_one_first(queryset, **kwargs):
+            # Another writer takes a bag between the sweep's read and its update
+            if queryset.model is BloodBag and kwargs.get('status') == 'EXPIRED':
+                with connection.cursor() as cursor:
+                    cursor.execute("UPDATE inventory_bloodbag SET status = 'RESERVED' WHERE id = %s", [bags[0].id])
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', autospec=True, side_effect=reserve_one_first):
+            sweep = sweep_expired_bags()
+
+        self.assertEqual(sweep.expired_count, 2)
+        self.assertEqual(
+            set(self.disposals().values_list('blood_bag_id', flat=True)), {bags[1].id, bags[2].id}
+        )
+        # The reserved bag left AVAILABLE outside the counters, as a direct write does
+        self.assertEqual(self.levels(), {'AVAILABLE': 1, 'EXPIRED': 2})
+
+
+class InventoryAlertTests(TestCase):
+
+    def setUp(self):
+        self.bank = create_bank()
+        self.later = date.today() + timedelta(days=30)
+
+    def add_bags(self, blood_group, expiration_dates):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_bags(self.bank, blood_group, expiration_dates)
+
+    def active(self):
+        return set(InventoryAlert.objects.filter(is_active=True).values_list('blood_group', 'alert_type'))
+
+    def test_stock_alerts_open_and_resolve_as_units_change(self):
+        self.add_bags('A+', [self.later])
+        self.assertEqual(self.active(), {('A+', 'CRITICAL_SHORTAGE')})
+
+        self.add_bags('A+', [self.later] * 3)
+        self.assertEqual(self.active(), {('A+', 'LOW_STOCK')})
+        critical = InventoryAlert.objects.get(alert_type='CRITICAL_SHORTAGE')
+        self.assertFalse(critical.is_active)
+        self.assertIsNotNone(critical.resolved_at)
+
+        self.add_bags('A+', [self.later] * 2)
+        self.assertEqual(self.active(), set())
+
+    def test_near_expiry_alert_follows_the_expiring_bags(self):
+        expiring = self.add_bags('B+', [date.today() + timedelta(days=3)] + [self.later] * 9)[0]
+        self.assertEqual(self.active(), {('B+', 'NEAR_EXPIRY')})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expiring.status = 'USED'
+            expiring.save()
+        self.assertEqual(self.active(), set())
+
+    def test_evaluation_is_idempotent(self):
+        self.add_bags('O-', [self.later])
+        AlertThreshold.objects.create(blood_bank=self.bank, low_stock_units=3, critical_shortage_units=0, near_expiry_days=7)
+
+        evaluate_alerts(self.bank.id, ['O-', 'AB-'])
+        alerts = list(InventoryAlert.objects.order_by('id').values_list('id', 'blood_group', 'alert_type', 'is_active'))
+        with self.assertNumQueries(3):
+            evaluate_alerts(self.bank.id, ['O-', 'AB-'])
+
+        self.assertEqual(
+            list(InventoryAlert.objects.order_by('id').values_list('id', 'blood_group', 'alert_type', 'is_active')),
+            alerts
+        )
+        # The bank's own thresholds: 1 unit is low stock, not a critical shortage
+        self.assertEqual(self.active(), {('O-', 'LOW_STOCK'), ('AB-', 'CRITICAL_SHORTAGE')})
+
+
+    def test_sweep_raises_near_expiry_with_a_bank_threshold_above_the_default(self):
+        AlertThreshold.objects.create(
+            blood_bank=self.bank, low_stock_units=3, critical_shortage_units=0, near_expiry_days=14
+        )
+        # Outside the default 7 day window, inside the bank's 14 days; created
+        # without running alert evaluation, as if the days had just passed
+        create_bags(self.bank, 'A+', [date.today() + timedelta(days=10)] + [self.later] * 5)
+        ExpirySweep.objects.create(swept_until=date.today() - timedelta(days=7), finished_at=timezone.now())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sweep_expired_bags()
+        self.assertEqual(self.active(), {('A+', 'NEAR_EXPIRY')})
+
+
+class BankStockLevelTests(TestCase):
+
+    def setUp(self):
+        self.bank = create_bank()
+        self.consumer = create_consumer()
+        self.later = date.today() + timedelta(days=30)
+
+    def assertInSync(self):
+        self.assertEqual(BankStockLevel.rebuild(dry_run=True), [])
+
+    def units(self, status, blood_group='A+'):
+        return BankStockLevel.objects.filter(blood_bank=self.bank, blood_group=blood_group, status=status) \
+            .values_list('units', flat=True).first() or 0
+
+    def test_every_status_change_adjusts_the_counters(self):
+        bags = create_bags(self.bank, 'A+', [self.later] * 6)
+        self.assertEqual(self.units('AVAILABLE'), 6)
+
+        bags[0].status = 'USED'
+        bags[0].save()
+        bags[1].blood_group = 'B+'
+        bags[1].save(update_fields=['blood_group'])
+        bags[2].notes = 'Checked'
+        bags[2].save(update_fields=['notes'])
+        bags[3].delete()
+        self.assertEqual((self.units('AVAILABLE'), self.units('USED'), self.units('AVAILABLE', 'B+')), (3, 1, 1))
+        self.assertInSync()
+
+        # Allocation, expiry and batch intake write in bulk
+        blood_request = create_request(self.bank, self.consumer, 'A+', units_required=2)
+        self.client.patch(f'/inventory/request/{blood_request.id}/respond/', {'status': 'APPROVED'}, content_type='application/json')
+        create_bags(self.bank, 'A+', [date.today() - timedelta(days=1)])
+        sweep_expired_bags()
+        create_donor()
+        self.client.post('/inventory/create/batch/', [{
+            'blood_group': 'A+', 'volume_ml': '450.00', 'collection_date': str(date.today()),
+            'expiration_date': str(self.later), 'donor_email': 'donor@test.com', 'blood_bank_email': 'bank@test.com',
+        }] * 2, content_type='application/json')
+        self.assertEqual(
+            (self.units('AVAILABLE'), self.units('RESERVED'), self.units('EXPIRED')), (3, 2, 1)
+        )
+        self.assertInSync()
+
+        # Bulk delete from the admin bypasses BloodBag.delete
+        superuser = Admin.objects.create_superuser(email='admin@test.com', password='secret-pass', name='Admin')
+        self.client.force_login(superuser)
+        reserved = BloodBag.objects.filter(status='RESERVED').values_list('id', flat=True)
+        response = self.client.post('/admin/inventory/bloodbag/', {
+            'action': 'delete_selected', '_selected_action': list(reserved), 'post': 'yes'
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.units('RESERVED'), 0)
+        self.assertInSync()
+
+    def test_rebuild_reports_and_repairs_drift(self):
+        create_bags(self.bank, 'O+', [self.later] * 3)
+        BankStockLevel.objects.filter(blood_group='O+', status='AVAILABLE').update(units=7)
+        BankStockLevel.objects.create(blood_bank=self.bank, blood_group='O+', status='USED', units=2)
+
+        out = io.StringIO()
+        call_command('rebuild_stock_levels', '--dry-run', stdout=out)
+        self.assertIn(f'Blood bank {self.bank.id} O+ AVAILABLE: stored 7, actual 3', out.getvalue())
+        self.assertIn(f'Blood bank {self.bank.id} O+ USED: stored 2, actual 0', out.getvalue())
+        self.assertIn('2 stock levels drifted', out.getvalue())
+        self.assertEqual(self.units('AVAILABLE', 'O+'), 7)
+
+        call_command('rebuild_stock_levels', stdout=io.StringIO())
+        self.assertEqual((self.units('AVAILABLE', 'O+'), self.units('USED', 'O+')), (3, 0))
+        out = io.StringIO()
+        call_command('rebuild_stock_levels', stdout=out)
+        self.assertIn('Stock levels are in sync', out.getvalue())
+
+
+class BloodBankSearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.banks = [create_bank(f'bank{i}@test.com') for i in range(4)]
+        for bank, units in zip(self.banks, [2, 3, 2, 1]):
+            BankStockLevel.adjust({(bank.id, 'O-', 'AVAILABLE'): units})
+
+    def search(self, url='/inventory/blood-banks/O-/'):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def walk(self, url):
+        emails = []
+        while url:
+            page = self.search(url)
+            emails += [bank['email'] for bank in page['results']]
+            url = page['next']
+        return emails
+
+    def test_pages_follow_units_with_the_bank_as_tie_break(self):
+        # bank0 and bank2 hold 2 units each, the bank id orders them
+        expected = ['bank1@test.com', 'bank2@test.com', 'bank0@test.com', 'bank3@test.com']
+        self.assertEqual(self.walk('/inventory/blood-banks/O-/?page_size=1'), expected)
+        self.assertEqual(self.walk('/inventory/blood-banks/O-/?page_size=3&ordering=units'), expected[::-1])
+
+    def test_page_size_is_capped(self):
+        with override_settings(API_PAGE_SIZE=1, API_MAX_PAGE_SIZE=2):
+            self.assertEqual(len(self.search()['results']), 1)
+            self.assertEqual(len(self.search('/inventory/blood-banks/O-/?page_size=100')['results']), 2)
+            self.assertEqual(len(self.search('/inventory/blood-banks/O-/?page_size=0')['results']), 1)
+
+    def test_cursor_values_must_fit_the_ordering_fields(self):
+        for values in (['abc', 1], [None, 1], [[2], 1], [2]):
+            with self.subTest(values=values):
+                cursor = urlsafe_b64encode(json.dumps(values).encode()).decode()
+                response = self.client.get(f'/inventory/blood-banks/O-/?cursor={cursor}')
+                self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get('/inventory/blood-banks/O-/?cursor=not-base64').status_code, 404)
+
+    def test_stock_changes_invalidate_cached_pages(self):
+        self.assertEqual(self.search()['results'][0]['units'], 3)
+        with self.assertNumQueries(0):
+            self.search()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_bags(self.banks[3], 'O-', [date.today() + timedelta(days=10)] * 3)
+        first = self.search()['results'][0]
+        self.assertEqual((first['email'], first['units']), ('bank3@test.com', 4))
+
+
+class HospitalDashboardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def bank_token(self):
+        user = Admin.objects.create_user(email='bank@test.com', password='secret-pass', name='Bank', user_type='BLOOD_BANK')
+        BloodBankProfile.objects.create(user=user, address='Address', status='VERIFIED')
+        login = self.client.post('/api/login/', {'email': 'bank@test.com', 'password': 'secret-pass'}, content_type='application/json')
+        return login.json()['access']
+
+    def test_cached_dashboard_costs_no_query(self):
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {self.bank_token()}"}
+
+        first = self.client.get('/inventory/hospital-dashboard/', **headers)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.client.get('/inventory/hospital-dashboard/', **headers)
+        self.assertEqual(second.json(), first.json())
+
+    async def test_dashboard_is_served_asynchronously(self):
+        token = await sync_to_async(self.bank_token)()
+
+        with self.assertLogs('api_logger') as logs:
+            response = await self.async_client.get(
+                '/inventory/hospital-dashboard/', headers={'Authorization': f'Bearer {token}'}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], 0)
+        # The queries run on the request's sync thread are still counted
+        timing = [line for line in logs.output if 'HospitalDashboardView.get took' in line]
+        self.assertRegex(timing[0], r'Queries: [1-9]')
+
+
+class MetricsTests(TestCase):
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics_expose_request_histograms_and_stock_gauges(self):
+        user = Admin.objects.create_user(email='bank@test.com', password='secret-pass', name='Bank', user_type='BLOOD_BANK')
+        bank = BloodBankProfile.objects.create(user=user, address='Address', status='VERIFIED')
+        BankStockLevel.adjust({(bank.id, 'O-', 'AVAILABLE'): 3})
+        self.client.get('/inventory/blood-banks/O-/')
+
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('raktkadi_available_units{blood_group="O-"} 3', body)
+        self.assertIn('raktkadi_http_request_duration_seconds_count{view="BloodBanksByBloodGroupView",method="get"}', body)
+        self.assertIn('raktkadi_http_requests_total{view="BloodBanksByBloodGroupView",method="get",status="200"}', body)
+
+    def test_scrapes_need_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(METRICS_TOKEN='scrape-token'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    def test_counts_are_flushed_by_a_background_thread(self):
+        with tempfile.TemporaryDirectory() as directory:
+            worker = MetricsRegistry(directory, flush_interval=0.01)
+            worker.counter('jobs_total', 'Jobs.').inc(3)
+            worker.start_flushing()
+            worker.start_flushing()
+            self.assertEqual(len([t for t in threading.enumerate() if t.name == 'metrics-flush']), 1)
+
+            path = os.path.join(directory, f'metrics_{os.getpid()}.json')
+            for _ in range(500):
+                if os.path.exists(path):
+                    break
+                time.sleep(0.01)
+            self.assertEqual(MetricsRegistry._read(path)['jobs_total']['values'], {'[]': 3})
+            worker.retire()
+            time.sleep(0.05)
+            self.assertEqual(sorted(os.listdir(directory)), ['.lock', 'metrics_retired.json'])
+
+    def test_retired_worker_counts_are_kept(self):
+        with tempfile.TemporaryDirectory() as directory:
+            workers = [MetricsRegistry(directory), MetricsRegistry(directory)]
+            for pid, worker in enumerate(workers, start=100):
+                worker.counter('jobs_total', 'Jobs.').inc(pid)
+                with mock.patch('raktkadi.metrics.os.getpid', return_value=pid):
+                    worker.flush(force=True)
+            with mock.patch('raktkadi.metrics.os.getpid', return_value=100):
+                workers[0].retire()
+                workers[0].retire()
+
+            self.assertEqual(sorted(os.listdir(directory)), ['.lock', 'metrics_101.json', 'metrics_retired.json'])
+            with mock.patch('raktkadi.metrics.os.getpid', return_value=101):
+                self.assertIn('jobs_total 201', workers[1].render())
+
+
+class LogAnalysisTests(TestCase):
+
+    def values(self):
+        generator = random.Random(7)
+        return [generator.lognormvariate(3, 1.5) for _ in range(20000)]
+
+    def exact(self, values, q):
+        ordered = sorted(values)
+        return ordered[max(1, math.ceil(q * len(ordered))) - 1]
+
+    def test_sketch_quantiles_are_within_the_relative_accuracy(self):
+        values = self.values()
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+        for q in (0.5, 0.9, 0.95, 0.99, 1):
+            with self.subTest(q=q):
+                exact = self.exact(values, q)
+                self.assertLessEqual(abs(sketch.quantile(q) - exact), exact * 0.01 + 1e-9)
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+
+    def test_merged_sketches_answer_like_one(self):
+        values = self.values()
+        whole, first, second = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for index, value in enumerate(values):
+            whole.add(value)
+            (first if index % 3 else second).add(value)
+        merged = first.merge(second)
+        self.assertEqual((merged.count, merged.max), (whole.count, whole.max))
+        for q in (0.5, 0.95, 0.99):
+            self.assertEqual(merged.quantile(q), whole.quantile(q))
+        with self.assertRaises(ValueError):
+            whole.merge(QuantileSketch(relative_accuracy=0.05))
+
+    def write_log(self, path, lines):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+
+    def request_line(self, time, view, took, status):
+        return (
+            f"[2026-10-18 {time}] INFO - {view} took {took:.2f}ms to execute - "
+            f"DB: 1.00ms, Queries: 1, Status: {status}, Path: /inventory/"
+        )
+
+    def test_command_reads_plain_and_gzipped_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            plain = os.path.join(directory, 'api_log_20261018.log')
+            compressed = os.path.join(directory, 'api_log_20261017.1.log.gz')
+            self.write_log(plain, [
+                self.request_line('10:00:01', 'BloodBagCreateAPIView.post', 12.5, 201),
+                self.request_line('10:00:02', 'BloodBagCreateAPIView.post', 80.0, 500),
+                '[2026-10-18 10:00:02] ERROR - Blood bag creation failed',
+            ])
+            self.write_log(compressed, [
+                self.request_line('09:00:01', 'BloodBagCreateAPIView.post', 40.0, 201),
+                self.request_line('09:00:02', 'HospitalDashboardView.get', 300.0, 200),
+                'not a request line',
+            ])
+
+            outputs = []
+            for jobs in ('1', '2'):
+                out = io.StringIO()
+                call_command('analyze_logs', plain, compressed, '--top', '2', '--jobs', jobs, stdout=out)
+                outputs.append(out.getvalue())
+
+        self.assertEqual(outputs[0], outputs[1])
+        output = outputs[0]
+        self.assertIn('6 lines in 2 files', output)
+        self.assertRegex(output, r'BloodBagCreateAPIView\.post\s+3\s+33\.3%')
+        self.assertRegex(output, r'HospitalDashboardView\.get\s+1\s+0\.0%')
+        self.assertRegex(output, r'2026-10-18 10:00\s+1\s+\(50\.0% of requests\)')
+        slowest = output.split('Slowest 2 requests\n')[1].splitlines()
+        self.assertEqual([line.split()[0] for line in slowest], ['300.00ms', '80.00ms'])
+
+
+class SeedCommandTests(TestCase):
+
+    def seeded_rows(self):
+        return list(BloodBag.objects.order_by('id').values_list('blood_bank_id', 'barcode', 'status'))
+
+    def test_seed_is_deterministic_and_consistent(self):
+        options = dict(banks=5, staff=5, donors=30, consumers=10, bags=300, requests=20, stdout=io.StringIO())
+        call_command('seed', jobs=1, **options)
+        first = self.seeded_rows()
+        call_command('seed', jobs=2, flush=True, **options)
+
+        self.assertEqual(len(first), 300)
+        self.assertEqual(self.seeded_rows(), first)
+        self.assertEqual(BankStockLevel.rebuild(dry_run=True), [])
+        self.assertTrue(Admin.objects.get(email='hospital1@mail.com').check_password('Pass1234'))
+
+        # New bags continue the seeded barcode sequences instead of colliding
+        bag = BloodBag.objects.order_by('-collection_date').first()
+        BloodBag.objects.create(
+            blood_bank_id=bag.blood_bank_id, blood_group=bag.blood_group, volume_ml=450,
+            collection_date=bag.collection_date, expiration_date=bag.expiration_date
+        )
+
+
+def run_endpoint(endpoint, fixtures, indexes):
+    """Sends requests `indexes` of endpoint, returns [(status, captured queries), ...]."""
+    client = Client(raise_request_exception=False)
+    results = []
+    for index in indexes:
+        method, path, body, headers = endpoint.request(fixtures, index)
+        with CaptureQueriesContext(connection) as context:
+            response = client.generic(method, path, body or '', content_type='application/json', headers=headers)
+        results.append((response.status_code, context.captured_queries))
+    return results
+
+
+# Hashing is not what these tests measure
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryScalingTests(TestCase):
+    """
+    Every endpoint of users/urls.py and inventory/urls.py (benchmarks.endpoints)
+    at two seeded data sizes: a request may not run more queries when the
+    tables hold more rows, which is what an N+1 looks like. Both sizes hold
+    more verified banks than a 50 bag batch spreads over, so the batch itself
+    is the same shape in both, and the periodic revocation list refresh is
+    kept out of the counts. The largest of several requests is compared, as
+    some branches depend on the data rather than its size (allocation falling
+    back to compatible blood groups). Every request has to succeed as well, a
+    4xx would mean the fixtures no longer match what the endpoint expects.
+    """
+    sizes = [
+        dict(banks=80, staff=10, donors=60, consumers=20, bags=300, requests=60),
+        dict(banks=150, staff=30, donors=180, consumers=60, bags=3000, requests=180),
+    ]
+
+    def query_counts(self, counts):
+        call_command('flush', interactive=False, verbosity=0)
+        seed(counts)
+        fixtures = Fixtures()
+        result = {}
+        for endpoint in ENDPOINTS:
+            cache.clear()
+            revocation_list.refresh(full=True)
+            runs = run_endpoint(endpoint, fixtures, range(6))
+            self.assertEqual([status for status, _ in runs if status >= 400], [], endpoint.name)
+            result[endpoint.name] = max(len(queries) for _, queries in runs)
+        return result
+
+    def test_query_count_does_not_grow_with_rows(self):
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        try:
+            small, large = [self.query_counts(counts) for counts in self.sizes]
+        finally:
+            logging.getLogger('django.request').setLevel(logging.NOTSET)
+        for name in small:
+            with self.subTest(endpoint=name):
+                self.assertLessEqual(large[name], small[name])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN QUERY PLAN of what the hot inventory views run against
+    inventory_bloodbag: allocation, availability counts and the dashboard.
+    A plan that falls back to scanning the whole table fails.
+    """
+    table = 'inventory_bloodbag'
+    endpoints = ['requests.respond', 'bags.create', 'search.by_blood_group', 'dashboard']
+
+    def full_scans(self, sql):
+        # The table under its own name or an alias such as U0 in subqueries
+        names = {self.table} | set(re.findall(rf'"{self.table}" (?:AS )?"?(\w+)"?', sql))
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        return [line for line in plan if re.match(rf'SCAN ({"|".join(map(re.escape, names))})\b', line)], plan
+
+    def hot_queries(self):
+        """[(endpoint name, sql), ...] of the statements touching the table."""
+        seed(dict(banks=4, staff=4, donors=20, consumers=10, bags=400, requests=40))
+        fixtures = Fixtures()
+        statements = []
+        for endpoint in ENDPOINTS:
+            if endpoint.name not in self.endpoints:
+                continue
+            cache.clear()
+            for status, queries in run_endpoint(endpoint, fixtures, range(3)):
+                self.assertLess(status, 400, endpoint.name)
+                statements += [
+                    (endpoint.name, query['sql']) for query in queries
+                    if self.table in query['sql'] and query['sql'].startswith(('SELECT', 'UPDATE', 'DELETE'))
+                ]
+        self.assertTrue(statements)
+        return statements
+
+    def test_hot_queries_search_an_index(self):
+        for name, sql in self.hot_queries():
+            scans, plan = self.full_scans(sql)
+            with self.subTest(endpoint=name, sql=sql[:120]):
+                self.assertEqual(scans, [], plan)
+
+    def test_reservation_looks_bags_up_by_primary_key(self):
+        # An index on status alone would make this walk every AVAILABLE bag
+        updates = [sql for name, sql in self.hot_queries() if sql.startswith(f'UPDATE "{self.table}"')]
+        self.assertTrue(updates)
+        for sql in updates:
+            _, plan = self.full_scans(sql)
+            self.assertIn('PRIMARY KEY', ' '.join(plan), plan)
@@ -3,8 +3,9 @@ from .views import *
 
 urlpatterns = [
     path('create/', BloodBagCreateAPIView.as_view(), name='blood-bag-create'),
+    path('create/batch/', BloodBagBatchCreateAPIView.as_view(), name='blood-bag-batch-create'),
     path('request/create/', BloodRequestCreateView.as_view(), name='blood-request-create'),
-    path('request/<int:pk>/respond/', BloodRequestResponseView.as_view(), name='blood-request-respond'),
+    path('request/<uuid:pk>/respond/', BloodRequestResponseView.as_view(), name='blood-request-respond'),
     path('blood-banks/<str:blood_group>/', BloodBanksByBloodGroupView.as_view(), name='blood-banks-by-blood-group'),
     # path('blood-group/<str:blood_group>/', BloodInventoryView.as_view(), name='blood-inventory'),
     # path('total/', TotalBagsView.as_view(), name='total-bags'),
@@ -14,3 +14,15 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'raktkadi.settings')
 
 application = get_asgi_application()
+
+from users.revocation import revocation_list  # noqa: E402
+
+# Server processes read other processes' token revocations in the background
+revocation_list.start_refreshing()
+
+from django.conf import settings  # noqa: E402
+
+# Serve the admin's static files like runserver does while DEBUG is on
+if settings.DEBUG:
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+    application = ASGIStaticFilesHandler(application)
@@ -0,0 +1,155 @@
+from collections import defaultdict
+import gzip
+import heapq
+import math
+import re
+
+# "<View>.<method> took <ms>ms to execute", as written by RequestTimingMiddleware
+# (with DB time, query count, status and path) and by the older per view decorator
+REQUEST_LINE = re.compile(
+    r'^\[(?P<time>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\] \w+ - '
+    r'(?P<view>\w+)\.(?P<method>\w+) took (?P<ms>[\d.]+)ms to execute'
+    r'(?: - DB: (?P<db_ms>[\d.]+)ms, Queries: (?P<queries>\d+), Status: (?P<status>\d+), Path: (?P<path>\S*))?'
+)
+ERROR_LINE = re.compile(r'^\[(?P<time>\d{4}-\d\d-\d\d \d\d):\d\d:\d\d\] ERROR - ')
+
+
+class QuantileSketch:
+    """
+    Relative error quantile sketch (DDSketch): values are counted in
+    logarithmic buckets, so any quantile comes back within
+    `relative_accuracy` of the true value, memory is bounded by the range of
+    the values rather than their number, and two sketches merge by adding
+    their bucket counts.
+    """
+    min_value = 1e-3
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        if value < self.min_value:
+            self.zero_count += 1
+        else:
+            self.buckets[math.ceil(math.log(value) / self.log_gamma)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Only sketches with the same relative accuracy can be merged')
+        for index, count in other.buckets.items():
+            self.buckets[index] += count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        # Nearest rank: the smallest value with at least q of the values at or below it
+        rank = max(1, math.ceil(q * self.count))
+        seen = self.zero_count
+        if rank <= seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank <= seen:
+                return min(2 * self.gamma ** index / (self.gamma + 1), self.max)
+        return self.max
+
+
+class LogSummary:
+    """
+    What analyze_logs keeps while streaming: one sketch per view and per
+    (view, hour), request counts (per hour, and per view for the lines that
+    carry a status), 5xx and ERROR line counts and the `top` slowest
+    requests. Summaries of separate files merge into one.
+    """
+
+    def __init__(self, top=10, relative_accuracy=0.01):
+        self.top = top
+        self.relative_accuracy = relative_accuracy
+        self.views = {}
+        self.hours = {}
+        self.hour_requests = defaultdict(int)
+        self.requests_with_status = defaultdict(int)
+        self.server_errors = defaultdict(int)
+        self.error_lines = defaultdict(int)
+        self.slowest = []
+        self.lines = 0
+
+    def _sketch(self, sketches, key):
+        sketch = sketches.get(key)
+        if sketch is None:
+            sketch = sketches[key] = QuantileSketch(self.relative_accuracy)
+        return sketch
+
+    def add_line(self, line):
+        self.lines += 1
+        match = REQUEST_LINE.match(line)
+        if match is None:
+            error = ERROR_LINE.match(line)
+            if error is not None:
+                self.error_lines[error.group('time')] += 1
+            return
+
+        view = f"{match.group('view')}.{match.group('method')}"
+        hour = match.group('time')[:13]
+        ms = float(match.group('ms'))
+        self._sketch(self.views, view).add(ms)
+        self._sketch(self.hours, (view, hour)).add(ms)
+        self.hour_requests[hour] += 1
+        status = match.group('status')
+        if status is not None:
+            self.requests_with_status[view] += 1
+            if int(status) >= 500:
+                self.server_errors[view] += 1
+
+        entry = (ms, match.group('time'), view, status or '-', match.group('path') or '-')
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def merge(self, other):
+        for sketches, others in ((self.views, other.views), (self.hours, other.hours)):
+            for key, sketch in others.items():
+                self._sketch(sketches, key).merge(sketch)
+        for counts, others in (
+            (self.hour_requests, other.hour_requests),
+            (self.requests_with_status, other.requests_with_status),
+            (self.server_errors, other.server_errors),
+            (self.error_lines, other.error_lines),
+        ):
+            for key, count in others.items():
+                counts[key] += count
+        self.slowest = heapq.nlargest(self.top, self.slowest + other.slowest)
+        heapq.heapify(self.slowest)
+        self.lines += other.lines
+        return self
+
+
+def open_log(path):
+    """Text stream over a log file, gzip-rotated (.gz) or not."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, encoding='utf-8', errors='replace')
+
+
+def summarize_file(path, top=10, relative_accuracy=0.01):
+    summary = LogSummary(top, relative_accuracy)
+    with open_log(path) as lines:
+        for line in lines:
+            summary.add_line(line)
+    return summary
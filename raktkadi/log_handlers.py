@@ -0,0 +1,153 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from logging.handlers import BaseRotatingHandler, QueueHandler, QueueListener
+import atexit
+import copy
+import gzip
+import os
+import queue
+import re
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows, where the server runs as a single process
+    fcntl = None
+
+
+class DailyRotatingFileHandler(BaseRotatingHandler):
+    """
+    Writes to <directory>/<prefix>_<YYYYMMDD>.log for the current day.
+
+    A new file is started when the day changes or when the current one would
+    grow past max_bytes; the finished file is gzipped to
+    <prefix>_<YYYYMMDD>.<n>.log.gz. With backup_count, only that many
+    compressed files are kept.
+
+    Several processes (gunicorn workers) may share the file: rotations take
+    a lock, and a process whose file was rotated by another one reopens the
+    new file instead of writing to the removed one.
+    """
+
+    def __init__(self, directory, prefix='log', max_bytes=0, backup_count=0, encoding='utf-8', delay=True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._start_day()
+        super().__init__(self._path(self.day), 'a', encoding=encoding, delay=delay)
+
+    def _start_day(self):
+        now = datetime.now()
+        self.day = now.strftime('%Y%m%d')
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        self.rollover_at = midnight.timestamp()
+
+    def _path(self, day):
+        return os.path.join(self.directory, f'{self.prefix}_{day}.log')
+
+    @contextmanager
+    def _rollover_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, f'.{self.prefix}.lock'), 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _moved(self):
+        """Whether the open file is no longer the one at baseFilename, i.e. another process rotated it."""
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return True
+        opened = os.fstat(self.stream.fileno())
+        return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+    def shouldRollover(self, record):
+        if self.stream is not None and self._moved():
+            self.stream.close()
+            self.stream = None
+        if record.created >= self.rollover_at:
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            size = os.fstat(self.stream.fileno()).st_size
+            return size > 0 and size + len(self.format(record)) + 1 > self.max_bytes
+        return False
+
+    def doRollover(self):
+        with self._rollover_lock():
+            # Another process may have rotated the file while this one waited
+            rotated = self.stream is not None and self._moved()
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            if not rotated and os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+                self._compress(self.baseFilename, self.day)
+            self._start_day()
+            self.baseFilename = os.path.abspath(self._path(self.day))
+            if self.backup_count > 0:
+                self._prune()
+
+    def _compressed(self):
+        """Compressed files as ((day, index), path), oldest first."""
+        pattern = re.compile(re.escape(self.prefix) + r'_(\d{8})\.(\d+)\.log\.gz$')
+        files = []
+        for name in os.listdir(self.directory):
+            match = pattern.match(name)
+            if match:
+                files.append(((match.group(1), int(match.group(2))), os.path.join(self.directory, name)))
+        return sorted(files)
+
+    def _compress(self, path, day):
+        index = max([key[1] for key, _ in self._compressed() if key[0] == day], default=0) + 1
+        target = os.path.join(self.directory, f'{self.prefix}_{day}.{index}.log.gz')
+        with open(path, 'rb') as source, gzip.open(target, 'wb') as destination:
+            shutil.copyfileobj(source, destination)
+        os.remove(path)
+
+    def _prune(self):
+        for _, path in self._compressed()[:-self.backup_count]:
+            os.remove(path)
+
+
+class QueuedFileHandler(QueueHandler):
+    """
+    Hands records to a background QueueListener that writes them through a
+    DailyRotatingFileHandler, so a request never waits on the disk, a
+    rotation or a gzip. Takes the DailyRotatingFileHandler arguments.
+    """
+
+    def __init__(self, directory, prefix='log', max_bytes=0, backup_count=0):
+        super().__init__(queue.SimpleQueue())
+        self.target = DailyRotatingFileHandler(directory, prefix, max_bytes, backup_count)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        # The format string is applied on the listener thread, the message
+        # itself is rendered by prepare() on the calling thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Runs on the calling thread: the message is rendered here, Payload
+        # arguments included (redaction and all), as they may change once the
+        # caller moves on. Only formatting and the file write are left to the
+        # listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def close(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+        self.target.close()
+        super().close()
@@ -0,0 +1,53 @@
+from django.conf import settings
+import logging
+import random
+
+REDACTED = '********'
+
+
+def redact(data):
+    """data with the values of sensitive keys (settings.LOG_PAYLOAD_REDACTED_FIELDS) masked."""
+    if hasattr(data, 'lists'):
+        # QueryDict of a form / multipart request
+        data = {key: values[0] if len(values) == 1 else values for key, values in data.lists()}
+    if isinstance(data, dict):
+        return {
+            key: REDACTED if str(key).lower() in settings.LOG_PAYLOAD_REDACTED_FIELDS else redact(value)
+            for key, value in data.items()
+        }
+    if isinstance(data, (list, tuple)):
+        return [redact(value) for value in data]
+    return data
+
+
+class Payload:
+    """
+    Request payload as a lazy %s logging argument: it is only redacted,
+    rendered and (unless full) cut to settings.LOG_PAYLOAD_MAX_LENGTH
+    characters once a record passes the level checks and reaches a handler.
+    Behind QueuedFileHandler that is still on the calling thread, before the
+    record is queued.
+    """
+
+    def __init__(self, data, full=False):
+        self.data = data
+        self.full = full
+
+    def __str__(self):
+        text = str(redact(self.data))
+        limit = settings.LOG_PAYLOAD_MAX_LENGTH
+        if self.full or len(text) <= limit:
+            return text
+        return f"{text[:limit]}... ({len(text)} chars)"
+
+
+def log_payload(logger, endpoint, message, data):
+    """
+    Logs `message - Data: <payload>` at INFO for a sample of the requests to
+    endpoint, at settings.LOG_PAYLOAD_SAMPLE_RATES[endpoint] or else
+    settings.LOG_PAYLOAD_SAMPLE_RATE. Error paths log Payload(data, full=True)
+    themselves instead.
+    """
+    rate = settings.LOG_PAYLOAD_SAMPLE_RATES.get(endpoint, settings.LOG_PAYLOAD_SAMPLE_RATE)
+    if rate > 0 and logger.isEnabledFor(logging.INFO) and (rate >= 1 or random.random() < rate):
+        logger.info("%s - Data: %s", message, Payload(data))
@@ -0,0 +1,327 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows, where the server runs as a single process
+    fcntl = None
+
+logger = logging.getLogger('api_logger')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labelnames, labels):
+    return json.dumps([str(labels[name]) for name in labelnames])
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Histogram(Counter):
+    """Per label set: the count of each bucket (not cumulative), then sum and count."""
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect_left(self.buckets, value)
+        with self.registry.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 3)
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def inc(self, amount=1, **labels):
+        raise TypeError('Histograms are updated with observe()')
+
+
+class MetricsRegistry:
+    """
+    In-process metrics: counters and histograms updated in memory under one
+    lock, plus collectors called at scrape time for gauges read from the
+    database. Renders the Prometheus text format.
+
+    With a multiprocess `directory`, each process also dumps its counters and
+    histograms to <directory>/metrics_<pid>.json every `flush_interval` seconds
+    from a background thread (see start_flushing(), requests never touch the
+    file), and a scrape in any process sums the files of all of them. The
+    directory should be emptied when the server (re)starts. A process that
+    exits calls retire() to fold its file into metrics_retired.json, so
+    recycled workers neither lose their counts nor pile up files.
+    """
+
+    def __init__(self, directory=None, flush_interval=5):
+        self.lock = threading.Lock()
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._collectors = []
+        self._flushed_at = 0
+        self._retired = False
+        self._flush_lock = threading.Lock()
+        self._flusher_pid = None
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self.lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, documentation, labelnames, **kwargs)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def register_collector(self, collector):
+        """
+        collector() returns [(name, documentation, type, [(labels dict, value), ...]), ...],
+        evaluated on every scrape.
+        """
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: {
+                    'type': metric.type,
+                    'help': metric.documentation,
+                    'labelnames': metric.labelnames,
+                    'buckets': getattr(metric, 'buckets', None),
+                    'values': {
+                        key: list(value) if isinstance(value, list) else value
+                        for key, value in metric.values.items()
+                    },
+                }
+                for name, metric in self._metrics.items()
+            }
+
+    def _path(self):
+        return os.path.join(self.directory, f'metrics_{os.getpid()}.json')
+
+    def flush(self, force=False):
+        """Writes this process's snapshot for the other processes, at most every flush_interval seconds."""
+        if not self.directory:
+            return
+        # Serialized with retire(), so no file is written after it is folded
+        with self._flush_lock:
+            if self._retired:
+                return
+            now = time.monotonic()
+            if not force and now - self._flushed_at < self.flush_interval:
+                return
+            self._flushed_at = now
+            os.makedirs(self.directory, exist_ok=True)
+            self._write(self._path(), self.snapshot())
+
+    def start_flushing(self):
+        """
+        Starts the thread that flushes every flush_interval seconds, once per
+        process: a forked child does not inherit its parent's thread and
+        starts its own. Cheap to call on every request.
+        """
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        with self._flush_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True).start()
+
+    def _flush_periodically(self):
+        while not self._retired:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush(force=True)
+            except OSError as e:
+                logger.warning(f"Metrics flush failed - Error: {str(e)}")
+
+    @contextmanager
+    def _directory_lock(self, exclusive=False):
+        """flock on the directory's lock file: shared to read the files, exclusive to retire one."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, '.lock'), 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _merge(merged, snapshot):
+        for metric_name, metric in snapshot.items():
+            target = merged.setdefault(metric_name, dict(metric, values={}))
+            for key, value in metric['values'].items():
+                current = target['values'].get(key)
+                if current is None:
+                    target['values'][key] = value
+                elif isinstance(value, list):
+                    target['values'][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target['values'][key] = current + value
+        return merged
+
+    @staticmethod
+    def _read(path):
+        with open(path) as file:
+            return json.load(file)
+
+    def _write(self, path, snapshot):
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(snapshot, file)
+        os.replace(temporary, path)
+
+    def _merged(self):
+        if not self.directory:
+            return self.snapshot()
+        self.flush(force=True)
+
+        merged = {}
+        with self._directory_lock():
+            for name in os.listdir(self.directory):
+                if not (name.startswith('metrics_') and name.endswith('.json')):
+                    continue
+                try:
+                    snapshot = self._read(os.path.join(self.directory, name))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable metrics file {name} - Error: {str(e)}")
+                    continue
+                self._merge(merged, snapshot)
+        return merged
+
+    def retire(self):
+        """
+        Adds this process's counts to metrics_retired.json and removes its own
+        file, as one step for concurrent scrapes. Called when a worker exits;
+        the process stops flushing afterwards.
+        """
+        if not self.directory:
+            return
+        with self._flush_lock:
+            if self._retired:
+                return
+            self._retired = True
+        os.makedirs(self.directory, exist_ok=True)
+        retired_path = os.path.join(self.directory, 'metrics_retired.json')
+        with self._flush_lock, self._directory_lock(exclusive=True):
+            try:
+                retired = self._read(retired_path)
+            except FileNotFoundError:
+                retired = {}
+            self._write(retired_path, self._merge(retired, self.snapshot()))
+            try:
+                os.remove(self._path())
+            except FileNotFoundError:
+                pass
+
+    def render(self):
+        lines = []
+        for name, metric in sorted(self._merged().items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for key, value in sorted(metric['values'].items()):
+                labels = list(zip(metric['labelnames'], json.loads(key)))
+                if metric['type'] != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(metric['buckets']) + [math.inf], value):
+                    cumulative += count
+                    bucket_labels = _format_labels(labels + [('le', _format_value(bound))])
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-2])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {_format_value(value[-1])}")
+
+        for collector in self._collectors:
+            for name, documentation, metric_type, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(list(labels.items()))} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry(settings.METRICS_MULTIPROCESS_DIR, settings.METRICS_FLUSH_INTERVAL)
+
+request_duration = registry.histogram(
+    'raktkadi_http_request_duration_seconds', 'Request wall time by view.', ('view', 'method')
+)
+requests_total = registry.counter(
+    'raktkadi_http_requests_total', 'Requests by view and status code.', ('view', 'method', 'status')
+)
+request_errors = registry.counter(
+    'raktkadi_http_request_errors_total', 'Requests answered with a 5xx status, by view.', ('view', 'method')
+)
+db_queries = registry.counter(
+    'raktkadi_db_queries_total', 'Database queries run by view.', ('view', 'method')
+)
+db_duration = registry.counter(
+    'raktkadi_db_query_duration_seconds_total', 'Time spent in database queries by view.', ('view', 'method')
+)
+
+
+def record_request(view, method, status_code, duration, db_time, query_count):
+    """Called by RequestTimingMiddleware once per request."""
+    request_duration.observe(duration, view=view, method=method)
+    requests_total.inc(view=view, method=method, status=status_code)
+    if status_code >= 500:
+        request_errors.inc(view=view, method=method)
+    if query_count:
+        db_queries.inc(query_count, view=view, method=method)
+        db_duration.inc(db_time, view=view, method=method)
+    registry.start_flushing()
+
+
+def metrics_view(request):
+    """Prometheus text format scrape endpoint, for `Bearer <METRICS_TOKEN>` only; refused while no token is set."""
+    token = settings.METRICS_TOKEN
+    if not token or request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
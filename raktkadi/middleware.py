@@ -0,0 +1,85 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from contextlib import ExitStack
+from django.db import connections
+from .metrics import record_request
+import logging
+import time
+
+logger = logging.getLogger('api_logger')
+
+
+class QueryTimer:
+    """execute_wrapper adding up the number and duration of the queries it sees."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '-'
+    view_class = getattr(match.func, 'view_class', None)
+    return view_class.__name__ if view_class is not None else match.func.__name__
+
+
+class RequestTimingMiddleware:
+    """
+    Logs one line per request with its wall time, the time spent in the
+    database and the number of queries, and records them in raktkadi.metrics.
+    Goes first in MIDDLEWARE so the other middleware is timed too. Runs as a
+    coroutine under ASGI, so async views are not pushed onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            self.wrap_connections(stack, timer)
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            # On the request's sync thread, where the async ORM will use the
+            # connections; a connection is tied to the thread that creates it
+            await sync_to_async(self.wrap_connections)(stack, timer)
+            response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    @staticmethod
+    def wrap_connections(stack, timer):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer))
+
+    @staticmethod
+    def record(request, response, duration, timer):
+        view, method = view_name(request), request.method.lower()
+        logger.info(
+            f"{view}.{method} took {duration * 1000:.2f}ms to execute - "
+            f"DB: {timer.duration * 1000:.2f}ms, Queries: {timer.count}, "
+            f"Status: {response.status_code}, Path: {request.path}"
+        )
+        record_request(view, method, response.status_code, duration, timer.duration, timer.count)
@@ -0,0 +1,169 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+import datetime
+import json
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder keeps only milliseconds, a cursor needs the exact value."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor (keyset) pagination over an ordering plus a unique tie-breaker.
+
+    The cursor holds the ordering values of the last row of the page, and the
+    next page is fetched with a WHERE (ordering, unique_field) > cursor filter,
+    so every page costs the same no matter how deep the client has scrolled.
+    Responses look like {"next": <url or null>, "results": [...]}.
+    """
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    invalid_cursor_message = 'Invalid cursor'
+
+    # Allowed orderings, the first one is the default
+    orderings = ('pk',)
+    # Unique field appended to the ordering to break ties
+    unique_field = 'pk'
+
+    def get_page_size(self, request):
+        # Read per request so settings overrides apply
+        default = settings.API_PAGE_SIZE
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return default
+        if page_size <= 0:
+            return default
+        return min(page_size, settings.API_MAX_PAGE_SIZE)
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(self.ordering_query_param)
+        if ordering not in self.orderings:
+            ordering = self.orderings[0]
+
+        fields = [ordering]
+        if ordering.lstrip('-') != self.unique_field:
+            descending = ordering.startswith('-')
+            fields.append(('-' if descending else '') + self.unique_field)
+        return fields
+
+    def cursor_fields(self):
+        """Fields a row needs to carry so a cursor can be built from it, for values() querysets."""
+        fields = [ordering.lstrip('-') for ordering in self.orderings] + [self.unique_field]
+        return list(dict.fromkeys(fields))
+
+    def ordering_field(self, queryset, name):
+        """Model field (or annotation output field) a cursor value is compared with."""
+        if name == 'pk':
+            return queryset.model._meta.pk
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def decode_cursor(self, request, queryset):
+        """
+        The cursor values converted to the types of their ordering fields. A
+        cursor is client input: one that does not decode, or whose values do
+        not fit the fields, is rejected rather than reaching the query.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        cursor = []
+        for name, value in zip(self.ordering, values):
+            field = self.ordering_field(queryset, name.lstrip('-'))
+            if isinstance(value, (list, dict)):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                value = field.to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            cursor.append(value)
+        return cursor
+
+    def encode_cursor(self, values):
+        data = json.dumps(values, cls=CursorEncoder)
+        return urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+    def after(self, values):
+        """Q selecting the rows strictly after values in self.ordering."""
+        condition = Q()
+        for index in reversed(range(len(self.ordering))):
+            field = self.ordering[index].lstrip('-')
+            lookup = 'lt' if self.ordering[index].startswith('-') else 'gt'
+            strictly_after = Q(**{f'{field}__{lookup}': values[index]})
+            if index == len(self.ordering) - 1:
+                condition = strictly_after
+            else:
+                condition = strictly_after | (Q(**{field: values[index]}) & condition)
+        return condition
+
+    def _value(self, row, field):
+        field = field.lstrip('-')
+        if isinstance(row, dict):
+            return row[field]
+        return getattr(row, field)
+
+    def page_queryset(self, queryset, request):
+        """The rows of the requested page plus one, to learn whether a next page exists."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor(request, queryset)
+        if cursor is not None:
+            queryset = queryset.filter(self.after(cursor))
+        return queryset[:self.page_size + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_rows(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, fetching through the async ORM."""
+        return self.paginate_rows([row async for row in self.page_queryset(queryset, request)])
+
+    def paginate_rows(self, rows):
+        page = rows[:self.page_size]
+
+        self.next_cursor = None
+        if len(rows) > self.page_size:
+            self.next_cursor = self.encode_cursor([
+                self._value(page[-1], field) for field in self.ordering
+            ])
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
@@ -13,7 +13,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
-from datetime import datetime
+import tempfile
 import logging
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'raktkadi.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -99,6 +100,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than the default shared-cache memory database, whose
+        # table locks fail concurrent writers at once instead of letting them
+        # wait, so tests see the locking the server does
+        'TEST': {'NAME': os.path.join(tempfile.gettempdir(), 'raktkadi-test.sqlite3')},
     }
 }
 
@@ -145,13 +150,46 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+## cache settings ##
+# Per-process memory cache. Set REDIS_URL (e.g. redis://redis:6379/0) when
+# running several workers (gunicorn.conf.py) so invalidations reach all of them.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'raktkadi',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'raktkadi',
+        }
+    }
+
 ## auth user model ##
 AUTH_USER_MODEL = 'users.Admin'
 
+## authentication backends ##
+AUTHENTICATION_BACKENDS = [
+    'users.backends.CustomAuthBackend',
+]
+
+# Seconds a user record stays in the in-process cache used by token
+# authentication, and the most users kept per process
+USER_CACHE_TIMEOUT = 30
+USER_CACHE_MAX_SIZE = 10000
+
+# Seconds between reads of newly revoked tokens by the background thread of
+# each server process
+TOKEN_REVOCATION_REFRESH_INTERVAL = 2
+
 ## rest framework settings ##   
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
     ),
 }
 
@@ -171,6 +209,55 @@ from rest_framework_simplejwt.settings import api_settings
 api_settings.USER_ID_FIELD = 'email'
 api_settings.USER_ID_CLAIM = 'email'
 
+## pagination settings ##
+# Default and maximum page sizes of the cursor paginated list endpoints
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+## inventory settings ##
+# Upper bound on the number of bags accepted by inventory/create/batch/
+BLOOD_BAG_BATCH_MAX_SIZE = 5000
+
+# Order in which bags are handed out when a request is approved.
+# Use 'inventory.allocation.ExpiryAwareFEFOPolicy' to also skip bags that
+# expire before the request's required_date.
+BLOOD_BAG_ALLOCATION_POLICY = 'inventory.allocation.FEFOPolicy'
+
+# Fill a request from ABO/Rh compatible groups once its own group runs out
+BLOOD_BAG_ALLOW_SUBSTITUTION = True
+
+# Order in which compatible donor groups are drawn after the exact group.
+# Keep the universal donor O- last so it is saved for when nothing else fits.
+BLOOD_GROUP_SUBSTITUTION_ORDER = ['AB+', 'AB-', 'A+', 'A-', 'B+', 'B-', 'O+', 'O-']
+
+# Seconds between in-process expiry sweeps, None to rely on `manage.py expire_bags`
+BLOOD_BAG_EXPIRY_SWEEP_INTERVAL = None
+
+# Seconds a cached hospital dashboard may live; writes invalidate it earlier
+HOSPITAL_DASHBOARD_CACHE_TIMEOUT = 300
+
+# Seconds a cached public blood bank search page may live; stock changes invalidate it earlier
+BLOOD_BANK_SEARCH_CACHE_TIMEOUT = 60
+
+# Default inventory alert thresholds, overridable per bank with AlertThreshold
+INVENTORY_ALERT_THRESHOLDS = {
+    'LOW_STOCK': 5,             # available units at or below which LOW_STOCK opens
+    'CRITICAL_SHORTAGE': 2,     # available units at or below which CRITICAL_SHORTAGE opens
+    'NEAR_EXPIRY_DAYS': 7,      # bags expiring within this many days raise NEAR_EXPIRY
+}
+
+## metrics settings ##
+# /metrics serves Prometheus text format. With several worker processes, point
+# METRICS_MULTIPROCESS_DIR at a directory they share (emptied on start) and
+# each worker writes its counters there every METRICS_FLUSH_INTERVAL seconds,
+# from a background thread rather than on the request path.
+# gunicorn.conf.py sets and empties it for its workers.
+# Scrapes must send `Authorization: Bearer <METRICS_TOKEN>`; without a token
+# /metrics answers 403 to everyone, so set one wherever it is scraped.
+METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
 ## jazzmin settings ##
 JAZZMIN_SETTINGS = {
     "site_title": "Raktkadi Admin",
@@ -228,6 +315,21 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 
 ## logging settings ##
+# logs/api_log_<YYYYMMDD>.log, rotated daily and past API_LOG_MAX_BYTES into
+# gzipped api_log_<YYYYMMDD>.<n>.log.gz files, keeping API_LOG_BACKUP_COUNT
+# of them (0 keeps all)
+API_LOG_MAX_BYTES = 50 * 1024 * 1024
+API_LOG_BACKUP_COUNT = 0
+
+# Request payloads on the create endpoints are logged for this share of the
+# requests (per view class in LOG_PAYLOAD_SAMPLE_RATES), cut to
+# LOG_PAYLOAD_MAX_LENGTH characters and with these keys masked. Failed
+# requests always log the whole payload.
+LOG_PAYLOAD_SAMPLE_RATE = 0.1
+LOG_PAYLOAD_SAMPLE_RATES = {}
+LOG_PAYLOAD_MAX_LENGTH = 1000
+LOG_PAYLOAD_REDACTED_FIELDS = ('password', 'refresh', 'access', 'token')
+
 # settings.py
 # import os
 # Logging configuration
@@ -243,8 +345,11 @@ LOGGING = {
     'handlers': {
         'api_log_file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'logs', f'api_log_{datetime.now().strftime("%Y%m%d")}.log'),
+            'class': 'raktkadi.log_handlers.QueuedFileHandler',
+            'directory': os.path.join(BASE_DIR, 'logs'),
+            'prefix': 'api_log',
+            'max_bytes': API_LOG_MAX_BYTES,
+            'backup_count': API_LOG_BACKUP_COUNT,
             'formatter': 'api_formatter',
         },
     },
@@ -3,12 +3,14 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path , include
 from users.views import home_view
+from .metrics import metrics_view
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('users.urls')),
     path('inventory/', include('inventory.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('', home_view, name='home'),
 ]
 
@@ -0,0 +1,40 @@
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+import inspect
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines (`async def get(...)`), so Django
+    serves it without a thread of its own under ASGI. Authentication,
+    permission and throttle checks may read the database and run through
+    sync_to_async; the handler itself is awaited on the event loop and should
+    use the async ORM and cache methods (afirst(), `async for`, cache.aget()).
+    Under WSGI and the test client Django runs it with async_to_sync.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            # options() and http_method_not_allowed() stay synchronous
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'raktkadi.settings')
 
 application = get_wsgi_application()
+
+from users.revocation import revocation_list  # noqa: E402
+
+# Server processes read other processes' token revocations in the background
+revocation_list.start_refreshing()
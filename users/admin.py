@@ -30,6 +30,11 @@ class ConsumerProfileAdmin(admin.ModelAdmin):
     search_fields = ('blood_group',)
     list_filter = ('blood_group',)
 
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'jti', 'reason', 'revoked_at', 'expires_at')
+    search_fields = ('user', 'jti')
+    list_filter = ('reason',)
+
 class SuperUserAdmin(admin.ModelAdmin):
     list_display = ('email', 'name', 'contact', 'user_type', 'is_active', 'is_staff', 'is_superuser', 'date_joined')
     search_fields = ('email', 'name', 'contact', 'user_type')
@@ -45,4 +50,5 @@ admin.site.register(Admin, SuperUserAdmin)
 admin.site.register(BloodBankProfile, BloodBankProfileAdmin)
 admin.site.register(StaffProfile, StaffProfileAdmin)
 admin.site.register(DonorProfile, DonorProfileAdmin)
-admin.site.register(ConsumerProfile, ConsumerProfileAdmin)
\ No newline at end of file
+admin.site.register(ConsumerProfile, ConsumerProfileAdmin)
+admin.site.register(RevokedToken, RevokedTokenAdmin)
\ No newline at end of file
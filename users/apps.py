@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_save
 
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from .backends import user_changed
+        from .models import Admin, BloodBankProfile
+        from .revocation import access_changed, user_deleted
+
+        for model in (Admin, BloodBankProfile):
+            post_save.connect(user_changed, sender=model, dispatch_uid=f'user_cache_{model.__name__}_save')
+            post_delete.connect(user_changed, sender=model, dispatch_uid=f'user_cache_{model.__name__}_delete')
+            pre_save.connect(access_changed, sender=model, dispatch_uid=f'revocation_{model.__name__}_save')
+        post_delete.connect(user_deleted, sender=Admin, dispatch_uid='revocation_Admin_delete')
@@ -0,0 +1,91 @@
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .backends import user_cache
+from .revocation import revocation_list
+from .models import Admin
+
+USER_TYPE_CLAIM = 'user_type'
+BLOOD_BANK_CLAIM = 'blood_bank_id'
+
+
+def get_tokens_for_user(user):
+    """
+    Refresh token for user carrying its role and, for blood banks, the
+    BloodBankProfile id; access tokens derived from it inherit both claims.
+    """
+    refresh = RefreshToken.for_user(user)
+    profile = getattr(user, 'blood_bank_profile', None) if user.user_type == 'BLOOD_BANK' else None
+    refresh[USER_TYPE_CLAIM] = user.user_type
+    refresh[BLOOD_BANK_CLAIM] = profile.id if profile is not None else None
+    return refresh
+
+
+class ClaimsUser(TokenUser):
+    """
+    Stateless user built from the token claims: enough for the role checks of
+    users.permissions and for reading the user's blood bank, without a query.
+    """
+
+    @cached_property
+    def email(self):
+        return self.id
+
+    @cached_property
+    def user_type(self):
+        return self.token[USER_TYPE_CLAIM]
+
+    @cached_property
+    def blood_bank_id(self):
+        return self.token.get(BLOOD_BANK_CLAIM)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication reading the token's user through the in-process user
+    cache. For endpoints that need the full Admin instance as request.user.
+    Revoked tokens are refused before the user is looked at.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if revocation_list.is_revoked(validated_token):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        return validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = user_cache.get(user_id)
+        except Admin.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+
+class ClaimsJWTAuthentication(CachedJWTAuthentication):
+    """
+    Default authentication: request.user is a ClaimsUser read from the token,
+    so no query runs before the view. Tokens minted without the claims fall
+    back to the cached database user.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token or USER_TYPE_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        return ClaimsUser(validated_token)
@@ -1,8 +1,86 @@
+from collections import OrderedDict
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
-from .models import Admin, BloodBank, Staff, Donor, Consumer
+from django.db import transaction
+from .models import Admin, BloodBankProfile
+import copy
 import logging
+import threading
+import time
+
+logger = logging.getLogger('api_logger')
+
+
+def load_user(email):
+    """
+    The Admin row for email in one query on the primary key, with the blood
+    bank profile joined in so the verification gate costs nothing extra.
+    """
+    return Admin.objects.select_related('blood_bank_profile').get(email=email)
+
+
+def is_unverified_blood_bank(user):
+    """The login gate: blood banks may only sign in once verified."""
+    if user.user_type != 'BLOOD_BANK':
+        return False
+    profile = getattr(user, 'blood_bank_profile', None)
+    return profile is None or profile.status != 'VERIFIED'
+
+
+class UserCache:
+    """
+    Short lived in-process cache of user records, keyed by email.
+
+    Authentication runs on every API request; within `timeout` seconds a user
+    is served from memory instead of the database. Entries are dropped when the
+    user or its blood bank profile is saved or deleted in this process, other
+    processes catch up when the entry expires. Callers get their own copy of
+    the cached instance.
+    """
+
+    def __init__(self, timeout, max_size):
+        self.timeout = timeout
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, email):
+        """The user for email, raises Admin.DoesNotExist like a lookup would."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(email)
+                return copy.copy(entry[1])
+
+        user = load_user(email)
+        if self.timeout:
+            with self._lock:
+                self._entries[email] = (now + self.timeout, user)
+                self._entries.move_to_end(email)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return copy.copy(user)
+
+    def invalidate(self, email):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(settings.USER_CACHE_TIMEOUT, settings.USER_CACHE_MAX_SIZE)
+
+
+def user_changed(sender, instance, **kwargs):
+    """post_save / post_delete receiver for Admin and BloodBankProfile."""
+    email = instance.user_id if sender is BloodBankProfile else instance.email
+    # Again after commit, a request may have cached the old row in between
+    user_cache.invalidate(email)
+    transaction.on_commit(lambda: user_cache.invalidate(email))
 
-logger = logging.getLogger(__name__)
 
 class CustomAuthBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
@@ -11,77 +89,24 @@ class CustomAuthBackend(ModelBackend):
             email = kwargs.get('email')
         if email is None or password is None:
             return None
-        
-        # Try authenticating as Admin
-        try:
-            user = Admin.objects.get(email=email)
-            if user.check_password(password):
-                logger.info(f"Authenticated admin: {email}")
-                return user
-        except Admin.DoesNotExist:
-            pass
 
-        # Try authenticating as BloodBank
-        try:
-            user = BloodBank.objects.get(email=email)
-            if user.check_password(password):
-                logger.info(f"Authenticated blood bank: {email}")
-                return user
-        except BloodBank.DoesNotExist:
-            pass
-
-        # Try authenticating as Staff
         try:
-            user = Staff.objects.get(email=email)
-            if user.check_password(password):
-                logger.info(f"Authenticated staff: {email}")
-                return user
-        except Staff.DoesNotExist:
-            pass
-
-        # Try authenticating as Donor
-        try:
-            user = Donor.objects.get(email=email)
-            if user.check_password(password):
-                logger.info(f"Authenticated donor: {email}")
-                return user
-        except Donor.DoesNotExist:
-            pass
-
-        # Try authenticating as Consumer
-        try:
-            user = Consumer.objects.get(email=email)
-            if user.check_password(password):
-                logger.info(f"Authenticated consumer: {email}")
-                return user
-        except Consumer.DoesNotExist:
-            pass
+            user = load_user(email)
+        except Admin.DoesNotExist:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            Admin().set_password(password)
+            logger.warning(f"Failed authentication attempt for: {email}")
+            return None
 
+        if user.check_password(password) and self.user_can_authenticate(user):
+            logger.info(f"Authenticated {user.user_type.lower()}: {email}")
+            return user
         logger.warning(f"Failed authentication attempt for: {email}")
         return None
 
     def get_user(self, user_id):
         try:
-            return Admin.objects.get(pk=user_id)
+            user = user_cache.get(user_id)
         except Admin.DoesNotExist:
-            pass
-
-        try:
-            return BloodBank.objects.get(pk=user_id)
-        except BloodBank.DoesNotExist:
-            pass
-
-        try:
-            return Staff.objects.get(pk=user_id)
-        except Staff.DoesNotExist:
-            pass
-
-        try:
-            return Donor.objects.get(pk=user_id)
-        except Donor.DoesNotExist:
-            pass
-
-        try:
-            return Consumer.objects.get(pk=user_id)
-        except Consumer.DoesNotExist:
             return None
+        return user if self.user_can_authenticate(user) else None
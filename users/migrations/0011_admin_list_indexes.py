@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0010_bloodbankprofile_city_bloodbankprofile_pincode_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='admin',
+            index=models.Index(fields=['user_type', 'email'], name='admin_type_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='admin',
+            index=models.Index(fields=['user_type', 'date_joined', 'email'], name='admin_type_joined_idx'),
+        ),
+    ]
@@ -33,6 +33,15 @@ class CustomUserManager(BaseUserManager):
 
         return self.create_user(email, password, **extra_fields)
 
+    def lock(self, **filters):
+        """
+        Locks the matching users' rows for the rest of the transaction with a
+        no-op update, its first statement: that takes SQLite's write lock at
+        once, where reading first would need a lock upgrade that fails with
+        "database is locked" under concurrent writes.
+        """
+        return self.filter(**filters).update(email=models.F('email'))
+
 class Admin(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True, primary_key=True)
     name = models.CharField(max_length=255)
@@ -66,6 +75,11 @@ class Admin(AbstractBaseUser, PermissionsMixin):
     class Meta:
         verbose_name = "User"
         verbose_name_plural = "Admins"
+        indexes = [
+            # Keyset pagination of the per-role user lists
+            models.Index(fields=['user_type', 'email'], name='admin_type_email_idx'),
+            models.Index(fields=['user_type', 'date_joined', 'email'], name='admin_type_joined_idx'),
+        ]
 
 def store_license(instance, filename):
     ext = filename.split('.')[-1]
@@ -151,4 +165,24 @@ class ConsumerProfile(models.Model):
     
     class Meta:
         verbose_name = "Consumer"
-        verbose_name_plural = "Consumers"
\ No newline at end of file
+        verbose_name_plural = "Consumers"
+
+class RevokedToken(models.Model):
+    """
+    A revoked access token (jti set) or, with only user set, every token
+    the user was issued up to revoked_at. Rows are kept until expires_at, past
+    which any token they could match has expired anyway. user is a plain email
+    column so revocations survive the user being deleted.
+    """
+    jti = models.CharField(max_length=255, null=True, blank=True)
+    user = models.EmailField()
+    reason = models.CharField(max_length=255, blank=True)
+    revoked_at = models.DateTimeField(default=now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.jti or 'all tokens'} of {self.user}"
+
+    class Meta:
+        verbose_name = "Revoked token"
+        verbose_name_plural = "Revoked tokens"
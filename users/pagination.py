@@ -0,0 +1,7 @@
+from raktkadi.pagination import KeysetPagination
+
+
+class UserListPagination(KeysetPagination):
+    """Keyset pagination for the user list endpoints, by email or join date."""
+    orderings = ('email', '-email', 'date_joined', '-date_joined')
+    unique_field = 'email'
@@ -0,0 +1,186 @@
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from .models import Admin, BloodBankProfile, RevokedToken
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('api_logger')
+
+
+def jti_hash(jti):
+    """64 bit digest of a jti, what the in-process list stores instead of the string."""
+    return int.from_bytes(hashlib.blake2b(jti.encode(), digest_size=8).digest(), 'big')
+
+
+class RevocationList:
+    """
+    In-process copy of the RevokedToken table for the per request check.
+
+    Revoked jtis are held as a sorted array of 64 bit digests (8 bytes each,
+    binary searched), revoked users as email -> revocation timestamp. In a
+    server process a background thread (see start_refreshing()) reads, every
+    `refresh_interval` seconds, the rows revoked since the newest one seen,
+    less `overlap`: revoked_at is stamped before its transaction commits, so
+    a row can become visible after newer ones have been read. Every
+    `full_reload_interval` seconds the list is rebuilt from the unexpired rows
+    so it does not grow forever. Requests only read the list in memory.
+    Revocations made in this process apply at once; elsewhere (tests, the
+    shell) the list only changes through them and refresh(). When the table
+    cannot be read the last copy is kept and the read is retried at the next
+    interval.
+    """
+    full_reload_interval = 600
+    overlap = timedelta(seconds=60)
+
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._refresher_pid = None
+        self.clear()
+
+    def clear(self):
+        self._jtis = array('Q')
+        self._users = {}
+        self._seen_until = None
+        self._reloaded_at = None
+
+    def _merge(self, jtis, users):
+        if jtis:
+            # Rows in the overlap are read again, keep each digest once
+            self._jtis = array('Q', sorted(set(self._jtis.tolist()).union(jti_hash(jti) for jti in jtis)))
+        for email, revoked_at in users.items():
+            self._users[email] = max(revoked_at, self._users.get(email, revoked_at))
+
+    def refresh(self, full=False):
+        now = time.monotonic()
+        full = full or self._reloaded_at is None or now - self._reloaded_at > self.full_reload_interval
+        rows = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+        if not full and self._seen_until is not None:
+            rows = rows.filter(revoked_at__gte=self._seen_until - self.overlap)
+
+        jtis, users, seen_until = [], {}, None if full else self._seen_until
+        try:
+            for jti, email, revoked_at in rows.values_list('jti', 'user', 'revoked_at'):
+                if jti:
+                    jtis.append(jti)
+                else:
+                    users[email] = max(revoked_at.timestamp(), users.get(email, 0))
+                seen_until = revoked_at if seen_until is None else max(seen_until, revoked_at)
+        except DatabaseError as e:
+            logger.warning(f"Revoked token refresh failed, keeping the current list - Error: {str(e)}")
+            return
+
+        with self._lock:
+            if full:
+                self._jtis, self._users = array('Q'), {}
+                self._reloaded_at = now
+            self._merge(jtis, users)
+            self._seen_until = seen_until
+
+    def start_refreshing(self):
+        """
+        Starts the thread that refreshes every refresh_interval seconds, once
+        per process: a forked child does not inherit its parent's thread and
+        starts its own on its first check. Its first read runs at once, until
+        it finishes a new process sees no revocations from other processes,
+        no staler than refresh_interval allows anyway.
+        """
+        self._refreshing = True
+        if self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+        threading.Thread(target=self._refresh_periodically, name='revocation-refresh', daemon=True).start()
+
+    def _refresh_periodically(self):
+        from django.db import close_old_connections
+
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Revoked token refresh failed - Error: {str(e)}")
+            finally:
+                close_old_connections()
+            time.sleep(self.refresh_interval)
+
+    def add(self, jtis=(), users=None):
+        with self._lock:
+            self._merge(list(jtis), users or {})
+
+    def is_revoked(self, token):
+        if self._refreshing:
+            self.start_refreshing()
+
+        revoked_at = self._users.get(token.get(api_settings.USER_ID_CLAIM))
+        if revoked_at is not None and token.get('iat', 0) <= revoked_at:
+            return True
+
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti is None or not self._jtis:
+            return False
+        digest = jti_hash(jti)
+        index = bisect_left(self._jtis, digest)
+        return index < len(self._jtis) and self._jtis[index] == digest
+
+
+revocation_list = RevocationList(settings.TOKEN_REVOCATION_REFRESH_INTERVAL)
+
+
+def _expires_at():
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    return timezone.now() + lifetime + timedelta(seconds=1)
+
+
+def revoke_token(token, reason=''):
+    """Revokes one token (access or refresh) by its jti."""
+    jti = token[api_settings.JTI_CLAIM]
+    RevokedToken.objects.create(
+        jti=jti,
+        user=token.get(api_settings.USER_ID_CLAIM, ''),
+        reason=reason,
+        expires_at=_expires_at()
+    )
+    transaction.on_commit(lambda: revocation_list.add(jtis=[jti]))
+    logger.info(f"Token revoked - jti: {jti}, Reason: {reason}")
+
+
+def revoke_user(email, reason=''):
+    """Revokes every token issued to email up to now."""
+    revoked = RevokedToken.objects.create(user=email, reason=reason, expires_at=_expires_at())
+    revoked_at = revoked.revoked_at.timestamp()
+    transaction.on_commit(lambda: revocation_list.add(users={email: revoked_at}))
+    logger.info(f"Tokens revoked - User: {email}, Reason: {reason}")
+
+
+def access_changed(sender, instance, **kwargs):
+    """
+    pre_save receiver for Admin and BloodBankProfile: revokes the user's
+    tokens when the account is deactivated or the bank loses its verification.
+    """
+    if instance._state.adding or instance.pk is None:
+        return
+    if sender is Admin:
+        was_active = Admin.objects.filter(pk=instance.pk).values_list('is_active', flat=True).first()
+        if was_active and not instance.is_active:
+            revoke_user(instance.email, 'deactivated')
+    elif sender is BloodBankProfile:
+        old_status = BloodBankProfile.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        if old_status == 'VERIFIED' and instance.status != 'VERIFIED':
+            revoke_user(instance.user_id, f'verification {instance.status.lower()}')
+
+
+def user_deleted(sender, instance, **kwargs):
+    """post_delete receiver for Admin."""
+    revoke_user(instance.email, 'deleted')
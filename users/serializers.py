@@ -5,6 +5,91 @@ from django.contrib.auth import authenticate
 
 User = get_user_model()
 
+class ProfileRelatedMixin:
+    """
+    Lets a user serializer that reads fields through `source='<profile>.<field>'`
+    prepare its queryset: setup_eager_loading() adds select_related() for every
+    relation named in those sources, so listing N users costs one query
+    instead of N + 1.
+    """
+
+    @classmethod
+    def related_fields(cls):
+        return sorted({
+            field.source.split('.')[0]
+            for field in cls._declared_fields.values()
+            if field.source and '.' in field.source
+        })
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        return queryset.select_related(*cls.related_fields())
+
+    @classmethod
+    def values_serializer(cls):
+        if '_values_serializer' not in cls.__dict__:
+            cls._values_serializer = ValuesReadSerializer(cls)
+        return cls._values_serializer
+
+
+class ValuesReadSerializer:
+    """
+    Read-only fast path for a ModelSerializer on list endpoints: values()
+    pulls only the columns behind its readable fields, and each row is mapped
+    to the dict the serializer itself would produce, without building model
+    instances or going through the DRF field machinery for every cell.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        model = serializer_class.Meta.model
+        self.columns = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            lookup = field.source.replace('.', '__')
+            self.columns.append((name, lookup, self._converter(model, field, lookup)))
+
+    def _converter(self, model, field, lookup):
+        # Columns of these come back from the database already in their
+        # representation (str / bool), None included
+        if type(field) in (serializers.CharField, serializers.EmailField, serializers.BooleanField):
+            return None
+        if isinstance(field, serializers.FileField):
+            *relations, name = lookup.split('__')
+            for relation in relations:
+                model = model._meta.get_field(relation).related_model
+            storage = model._meta.get_field(name).storage
+
+            def file_url(value, request):
+                if not value:
+                    return None
+                url = storage.url(value)
+                return request.build_absolute_uri(url) if request is not None else url
+            return file_url
+        return lambda value, request: field.to_representation(value)
+
+    def values(self, queryset, *extra_fields):
+        """The queryset as rows of the needed columns, plus extra_fields (e.g. cursor fields)."""
+        lookups = [lookup for _, lookup, _ in self.columns]
+        lookups += [field for field in extra_fields if field not in lookups]
+        return queryset.values(*lookups)
+
+    def data(self, rows, context=None):
+        """Rows of values() mapped to the serializer's output, in field order."""
+        request = (context or {}).get('request')
+        columns = self.columns
+        result = []
+        for row in rows:
+            item = {}
+            for name, lookup, convert in columns:
+                value = row[lookup]
+                if convert is not None and value is not None:
+                    value = convert(value, request)
+                item[name] = value
+            result.append(item)
+        return result
+
 ## login serializer ##
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -82,7 +167,7 @@ class BloodBankRegistrationSerializer(serializers.Serializer):
 
         return user
 
-class BloodBankSerializer(serializers.ModelSerializer):
+class BloodBankSerializer(ProfileRelatedMixin, serializers.ModelSerializer):
     address = serializers.CharField(source='blood_bank_profile.address')
     city = serializers.CharField(source='blood_bank_profile.city')
     state = serializers.CharField(source='blood_bank_profile.state')
@@ -137,6 +222,19 @@ class StaffRegistrationSerializer(serializers.Serializer):
     
     # Staff Profile fields
     role = serializers.CharField()
+    blood_bank_email = serializers.EmailField()
+
+    def validate_blood_bank_email(self, value):
+        """The verified blood bank the staff member works at, by its email"""
+        try:
+            blood_bank = BloodBankProfile.objects.get(user__email=value)
+        except BloodBankProfile.DoesNotExist:
+            raise serializers.ValidationError("Blood bank not found")
+        if blood_bank.status != 'VERIFIED':
+            raise serializers.ValidationError(
+                f"Blood bank is not verified. Current status: {blood_bank.status}"
+            )
+        return blood_bank
 
     def validate(self, data):
         unexpected_fields = set(self.initial_data.keys()) - set(self.fields.keys())
@@ -150,6 +248,7 @@ class StaffRegistrationSerializer(serializers.Serializer):
         # Extract profile data
         profile_data = {
             'role': validated_data.pop('role'),
+            'blood_bank': validated_data.pop('blood_bank_email'),
         }
 
         # Create user
@@ -161,7 +260,7 @@ class StaffRegistrationSerializer(serializers.Serializer):
 
         return user
 
-class StaffSerializer(serializers.ModelSerializer):
+class StaffSerializer(ProfileRelatedMixin, serializers.ModelSerializer):
     role = serializers.CharField(source='staff_profile.role')
 
     class Meta:
@@ -242,7 +341,7 @@ class DonorRegistrationSerializer(serializers.Serializer):
 
         return user
 
-class DonorSerializer(serializers.ModelSerializer):
+class DonorSerializer(ProfileRelatedMixin, serializers.ModelSerializer):
     blood_group = serializers.CharField(source='donor_profile.blood_group')
     last_donation = serializers.DateField(source='donor_profile.last_donation', required=False)
     address = serializers.CharField(source='donor_profile.address')
@@ -326,7 +425,7 @@ class ConsumerRegistrationSerializer(serializers.Serializer):
 
         return user
 
-class ConsumerSerializer(serializers.ModelSerializer):
+class ConsumerSerializer(ProfileRelatedMixin, serializers.ModelSerializer):
     blood_group = serializers.CharField(source='consumer_profile.blood_group')
     address = serializers.CharField(source='consumer_profile.address')
     city = serializers.CharField(source='consumer_profile.city')
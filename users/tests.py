@@ -1,3 +1,449 @@
-from django.test import TestCase
+from base64 import urlsafe_b64encode
+from datetime import date, datetime, timedelta
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection
+from django.db.models.query import ValuesListIterable
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from raktkadi.log_handlers import DailyRotatingFileHandler
+from raktkadi.log_payloads import Payload
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from unittest import mock
 
-# Create your tests here.
+from .backends import user_cache
+from .revocation import RevocationList, revocation_list
+from .models import Admin, BloodBankProfile, ConsumerProfile, DonorProfile, RevokedToken, StaffProfile
+from .serializers import BloodBankSerializer, ConsumerSerializer, DonorSerializer
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+User = get_user_model()
+
+
+class UserListQueryCountTests(TestCase):
+    """
+    Listing users must not fetch profiles row by row: the query count of every
+    list endpoint has to stay the same when the number of rows grows.
+    """
+
+    def create_users(self, count, offset=0):
+        for i in range(offset, offset + count):
+            bank_user = Admin.objects.create(email=f'bank{i}@test.com', name='Bank', user_type='BLOOD_BANK')
+            bank = BloodBankProfile.objects.create(user=bank_user, address='Address', status='VERIFIED')
+            staff_user = Admin.objects.create(email=f'staff{i}@test.com', name='Staff', user_type='STAFF')
+            StaffProfile.objects.create(user=staff_user, blood_bank=bank, role='Technician')
+            donor_user = Admin.objects.create(email=f'donor{i}@test.com', name='Donor', user_type='DONOR')
+            DonorProfile.objects.create(user=donor_user, blood_group='A+', address='Address')
+            consumer_user = Admin.objects.create(email=f'consumer{i}@test.com', name='Consumer', user_type='CONSUMER')
+            ConsumerProfile.objects.create(user=consumer_user, blood_group='A+', address='Address')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        urls = [
+            '/api/blood-banks/',
+            '/api/blood-banks/verified/',
+            '/api/staff/',
+            '/api/donors/',
+            '/api/consumers/',
+        ]
+        self.create_users(2)
+        small = {url: self.count_queries(url) for url in urls}
+        self.create_users(10, offset=2)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), small[url])
+                self.assertEqual(small[url], 1)
+
+    def test_detail_loads_profile_in_one_query(self):
+        self.create_users(1)
+        for url in [
+            '/api/blood-banks/bank0@test.com/',
+            '/api/staff/staff0@test.com/',
+            '/api/donors/donor0@test.com/',
+            '/api/consumers/consumer0@test.com/',
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), 1)
+
+
+class UserListPaginationTests(TestCase):
+
+    def setUp(self):
+        joined = timezone.now()
+        # donor1 and donor2 joined at the same instant, the email orders them
+        for name, offset in [('donor0', 2), ('donor2', 1), ('donor1', 1), ('donor3', 0)]:
+            user = User.objects.create(email=f'{name}@test.com', name='Donor', user_type='DONOR')
+            DonorProfile.objects.create(user=user, blood_group='A+', address='Address')
+            # date_joined is auto_now_add
+            User.objects.filter(pk=user.pk).update(date_joined=joined - timedelta(minutes=offset))
+
+    def walk(self, url):
+        emails = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            emails += [donor['email'] for donor in response.json()['results']]
+            url = response.json()['next']
+        return emails
+
+    def cursor(self, values):
+        return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def test_orderings_walk_every_row_once(self):
+        by_date = ['donor0@test.com', 'donor1@test.com', 'donor2@test.com', 'donor3@test.com']
+        self.assertEqual(self.walk('/api/donors/?page_size=1&ordering=date_joined'), by_date)
+        self.assertEqual(self.walk('/api/donors/?page_size=3&ordering=-date_joined'), by_date[::-1])
+        self.assertEqual(self.walk('/api/donors/?page_size=2&ordering=-email'), sorted(by_date, reverse=True))
+        # Unknown orderings fall back to the default, by email
+        self.assertEqual(self.walk('/api/donors/?page_size=2&ordering=password'), sorted(by_date))
+
+    def test_default_page_size_follows_settings(self):
+        with override_settings(API_PAGE_SIZE=3, API_MAX_PAGE_SIZE=3):
+            response = self.client.get('/api/donors/?page_size=10')
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertIsNotNone(response.json()['next'])
+
+    def test_cursor_values_must_fit_the_ordering_fields(self):
+        for url in [
+            f"/api/donors/?ordering=date_joined&cursor={self.cursor(['x', 'y'])}",
+            f"/api/donors/?cursor={self.cursor([None])}",
+            f"/api/blood-banks/verified/?cursor={self.cursor([None])}",
+            f"/api/donors/?cursor={self.cursor(['a@test.com', 'b@test.com'])}",
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ValuesReadSerializerTests(TestCase):
+    """The values() read path must render exactly what the serializers render."""
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_output_is_byte_identical(self):
+        bank_user = Admin.objects.create(email='bank@test.com', name='Bank', contact='+919999999999', user_type='BLOOD_BANK')
+        BloodBankProfile.objects.create(
+            user=bank_user, address='Address', pincode='411001', status='VERIFIED',
+            license_document='blood_bank_documents/license/bank@test.com.pdf'
+        )
+        Admin.objects.create(email='bare@test.com', name='No profile', user_type='BLOOD_BANK')
+        donor_user = Admin.objects.create(email='donor@test.com', name='Donor', user_type='DONOR')
+        DonorProfile.objects.create(user=donor_user, blood_group='O-', address='Address', last_donation=date(2024, 1, 31))
+        consumer_user = Admin.objects.create(email='consumer@test.com', name='Consumer', user_type='CONSUMER', is_active=False)
+        ConsumerProfile.objects.create(user=consumer_user, blood_group='AB+', address='Address', city='Pune')
+
+        for serializer_class, user_type in [
+            (BloodBankSerializer, 'BLOOD_BANK'),
+            (DonorSerializer, 'DONOR'),
+            (ConsumerSerializer, 'CONSUMER'),
+        ]:
+            with self.subTest(serializer=serializer_class.__name__):
+                queryset = User.objects.filter(user_type=user_type).order_by('email')
+                expected = serializer_class(serializer_class.setup_eager_loading(queryset), many=True).data
+                reader = serializer_class.values_serializer()
+                self.assertEqual(self.render(reader.data(reader.values(queryset))), self.render(expected))
+
+
+class AuthenticationTests(TestCase):
+    """Login is one user lookup, token requests are served from the user cache."""
+
+    def setUp(self):
+        user_cache.clear()
+        revocation_list.clear()
+        revocation_list.refresh()
+        self.donor = User.objects.create_user(email='donor@test.com', password='secret-pass', name='Donor', user_type='DONOR')
+        bank_user = User.objects.create_user(email='bank@test.com', password='secret-pass', name='Bank', user_type='BLOOD_BANK')
+        self.bank = BloodBankProfile.objects.create(user=bank_user, address='Address')
+
+    def login(self, email):
+        return self.client.post('/api/login/', {'email': email, 'password': 'secret-pass'}, content_type='application/json')
+
+    def test_login_is_one_lookup(self):
+        with self.assertNumQueries(1):
+            response = self.login('donor@test.com')
+        self.assertEqual(response.json()['user_type'], 'DONOR')
+
+    def test_unverified_blood_bank_is_refused(self):
+        with self.assertNumQueries(1):
+            response = self.login('bank@test.com')
+        self.assertEqual(response.status_code, 403)
+
+        self.bank.status = 'VERIFIED'
+        self.bank.save()
+        self.assertIn('access', self.login('bank@test.com').json())
+
+    def test_permission_checks_read_token_claims(self):
+        access = self.login('donor@test.com').json()['access']
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {access}'}
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/test/donor/', **headers).status_code, 200)
+            self.assertEqual(self.client.get('/api/test/staff/', **headers).status_code, 403)
+
+    def test_blood_bank_token_carries_bank_id(self):
+        self.bank.status = 'VERIFIED'
+        self.bank.save()
+        access = AccessToken(self.login('bank@test.com').json()['access'])
+        self.assertEqual(access['user_type'], 'BLOOD_BANK')
+        self.assertEqual(access['blood_bank_id'], self.bank.id)
+
+    def test_tokens_without_claims_use_the_user_cache(self):
+        access = RefreshToken.for_user(self.donor).access_token
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {access}'}
+        self.assertEqual(self.client.get('/api/test/donor/', **headers).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/test/donor/', **headers).status_code, 200)
+            self.assertEqual(self.client.get('/api/test/staff/', **headers).status_code, 403)
+
+        self.donor.is_active = False
+        self.donor.save()
+        self.assertEqual(self.client.get('/api/test/donor/', **headers).status_code, 401)
+
+
+class StaffRegistrationTests(TestCase):
+
+    def setUp(self):
+        bank_user = User.objects.create_user(email='bank@test.com', password='secret-pass', name='Bank', user_type='BLOOD_BANK')
+        self.bank = BloodBankProfile.objects.create(user=bank_user, address='Address', status='VERIFIED')
+
+    def register(self, blood_bank_email):
+        return self.client.post('/api/staff/', {
+            'email': 'staff@test.com', 'password': 'secret-pass', 'name': 'Staff', 'contact': '+919999999999',
+            'role': 'Technician', 'blood_bank_email': blood_bank_email,
+        }, content_type='application/json')
+
+    def test_staff_joins_the_given_blood_bank(self):
+        response = self.register('bank@test.com')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(StaffProfile.objects.get(user__email='staff@test.com').blood_bank, self.bank)
+
+    def test_unknown_blood_bank_is_refused(self):
+        response = self.register('nobank@test.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['blood_bank_email'], ['Blood bank not found'])
+        self.assertFalse(User.objects.filter(email='staff@test.com').exists())
+
+    def test_unverified_blood_bank_is_refused(self):
+        self.bank.status = 'PENDING'
+        self.bank.save()
+        response = self.register('bank@test.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['blood_bank_email'], ['Blood bank is not verified. Current status: PENDING'])
+        self.assertFalse(User.objects.filter(email='staff@test.com').exists())
+
+
+
+class ConcurrentWriteTests(TransactionTestCase):
+    """Requests from several threads at once, each on its own connection."""
+
+    def run_threads(self, work, threads=8):
+        statuses = []
+
+        def run(n):
+            try:
+                statuses.extend(work(Client(), n))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return statuses
+
+    def test_concurrent_updates_all_succeed(self):
+        user = User.objects.create(email='donor@test.com', name='Donor', user_type='DONOR')
+        DonorProfile.objects.create(user=user, blood_group='A+', address='Address')
+
+        statuses = self.run_threads(lambda client, n: [
+            client.put('/api/donors/donor@test.com/', {'city': f'City {n}'}, content_type='application/json').status_code
+            for _ in range(5)
+        ])
+        self.assertEqual(statuses, [200] * 40)
+
+    def test_concurrent_staff_registrations_all_succeed(self):
+        bank_user = User.objects.create(email='bank@test.com', name='Bank', user_type='BLOOD_BANK')
+        BloodBankProfile.objects.create(user=bank_user, address='Address', status='VERIFIED')
+
+        statuses = self.run_threads(lambda client, n: [client.post('/api/staff/', {
+            'email': f'staff{n}@test.com', 'password': 'secret-pass', 'name': 'Staff', 'contact': '+919999999999',
+            'role': 'Technician', 'blood_bank_email': 'bank@test.com',
+        }, content_type='application/json').status_code])
+        self.assertEqual(statuses, [201] * 8)
+        self.assertEqual(StaffProfile.objects.count(), 8)
+
+class TokenRevocationTests(TestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        revocation_list.clear()
+        revocation_list.refresh()
+        bank_user = User.objects.create_user(email='bank@test.com', password='secret-pass', name='Bank', user_type='BLOOD_BANK')
+        self.bank = BloodBankProfile.objects.create(user=bank_user, address='Address', status='VERIFIED')
+        staff_user = User.objects.create_user(email='staff@test.com', password='secret-pass', name='Staff', user_type='STAFF')
+        StaffProfile.objects.create(user=staff_user, blood_bank=self.bank, role='Technician')
+
+    def headers(self, email):
+        login = self.client.post('/api/login/', {'email': email, 'password': 'secret-pass'}, content_type='application/json')
+        return {'HTTP_AUTHORIZATION': f"Bearer {login.json()['access']}"}
+
+    def test_deleted_staff_token_is_refused(self):
+        headers = self.headers('staff@test.com')
+        self.assertEqual(self.client.get('/api/test/staff/', **headers).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete('/api/staff/staff@test.com/')
+        self.assertEqual(self.client.get('/api/test/staff/', **headers).status_code, 401)
+
+    def test_pulled_verification_revokes_blood_bank_tokens(self):
+        headers = self.headers('bank@test.com')
+        self.assertEqual(self.client.get('/api/test/bloodbank/', **headers).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bank.status = 'REJECTED'
+            self.bank.save()
+        self.assertEqual(self.client.get('/api/test/bloodbank/', **headers).status_code, 401)
+
+    def test_revocations_from_other_processes_are_picked_up(self):
+        headers = self.headers('staff@test.com')
+        token = AccessToken(headers['HTTP_AUTHORIZATION'].split()[1])
+        self.assertEqual(self.client.get('/api/test/staff/', **headers).status_code, 200)
+
+        # Written straight to the table, as another process would
+        RevokedToken.objects.create(jti=token['jti'], user='staff@test.com', expires_at=token.current_time + timedelta(hours=1))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/test/staff/', **headers).status_code, 200)
+        revocation_list.refresh()
+        self.assertEqual(self.client.get('/api/test/staff/', **headers).status_code, 401)
+        self.assertEqual(self.client.get('/api/test/staff/', **self.headers('staff@test.com')).status_code, 200)
+
+    def test_logout_revokes_only_the_presented_token(self):
+        first, second = self.headers('staff@test.com'), self.headers('staff@test.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/api/logout/', **first).status_code, 200)
+        self.assertEqual(self.client.get('/api/test/staff/', **first).status_code, 401)
+        self.assertEqual(self.client.post('/api/logout/', **first).status_code, 401)
+        self.assertEqual(self.client.get('/api/test/staff/', **second).status_code, 200)
+        self.assertEqual(self.client.post('/api/logout/').status_code, 401)
+
+    def test_rows_committed_out_of_order_are_picked_up(self):
+        late, early = self.headers('staff@test.com'), self.headers('staff@test.com')
+        expires_at = timezone.now() + timedelta(hours=1)
+        RevokedToken.objects.create(
+            id=100, jti=AccessToken(early['HTTP_AUTHORIZATION'].split()[1])['jti'], user='staff@test.com',
+            expires_at=expires_at
+        )
+        revocation_list.refresh()
+        self.assertEqual(self.client.get('/api/test/staff/', **early).status_code, 401)
+
+        # A lower id revoked a moment earlier, committed after the refresh above
+        RevokedToken.objects.create(
+            id=50, jti=AccessToken(late['HTTP_AUTHORIZATION'].split()[1])['jti'], user='staff@test.com',
+            revoked_at=timezone.now() - timedelta(seconds=5), expires_at=expires_at
+        )
+        revocation_list.refresh()
+        self.assertEqual(self.client.get('/api/test/staff/', **late).status_code, 401)
+
+    def test_failed_refresh_keeps_the_current_list(self):
+        headers = self.headers('staff@test.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/logout/', **headers)
+        revocation_list.refresh()
+
+        with mock.patch.object(ValuesListIterable, '__iter__', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('api_logger', 'WARNING') as logs:
+                revocation_list.refresh(full=True)
+        self.assertIn('database is locked', logs.output[0])
+        self.assertEqual(self.client.get('/api/test/staff/', **headers).status_code, 401)
+
+    def test_server_processes_refresh_in_the_background(self):
+        revocations = RevocationList(3600)
+        refreshed = threading.Event()
+        with mock.patch.object(revocations, 'refresh', side_effect=refreshed.set) as refresh, \
+                mock.patch('threading.Thread.start', autospec=True, side_effect=threading.Thread.start) as start:
+            revocations.start_refreshing()
+            self.assertTrue(refreshed.wait(5))
+            with self.assertNumQueries(0):
+                self.assertFalse(revocations.is_revoked({'jti': 'unknown', 'user_id': 'staff@test.com'}))
+            revocations.start_refreshing()
+        self.assertEqual(start.call_count, 1)
+        self.assertEqual(refresh.call_count, 1)
+
+
+class PayloadLoggingTests(TestCase):
+
+    def test_failed_login_logs_redacted_payload(self):
+        with self.assertLogs('api_logger', 'WARNING') as logs:
+            self.client.post('/api/login/', {'email': 'nobody@test.com', 'password': 'hunter22'}, content_type='application/json')
+        output = '\n'.join(logs.output)
+        self.assertIn('nobody@test.com', output)
+        self.assertNotIn('hunter22', output)
+
+    @override_settings(LOG_PAYLOAD_MAX_LENGTH=20)
+    def test_payload_is_rendered_lazily_and_truncated(self):
+        payload = Payload({'email': 'a' * 50, 'password': 'hunter22'})
+        self.assertTrue(str(payload).endswith('chars)'))
+        self.assertNotIn('hunter22', str(Payload(payload.data, full=True)))
+        self.assertIn('a' * 50, str(Payload(payload.data, full=True)))
+
+
+class LogRotationTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def handler(self, **kwargs):
+        handler = DailyRotatingFileHandler(self.directory, 'api', **kwargs)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.addCleanup(handler.close)
+        return handler
+
+    def log(self, handler, message):
+        handler.handle(logging.LogRecord('api_logger', logging.INFO, __file__, 0, message, None, None))
+
+    def read(self, name):
+        path = os.path.join(self.directory, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'rt') as file:
+            return file.read().splitlines()
+
+    def test_day_change_compresses_the_finished_day(self):
+        handler = self.handler()
+        # Pretend the handler was started on an earlier day
+        handler.day = '20260101'
+        handler.baseFilename = os.path.join(self.directory, 'api_20260101.log')
+        handler.rollover_at = time.time() + 3600
+        self.log(handler, 'first day')
+        handler.rollover_at = time.time()
+        self.log(handler, 'second day')
+
+        today = datetime.now().strftime('%Y%m%d')
+        files = sorted(name for name in os.listdir(self.directory) if not name.startswith('.'))
+        self.assertEqual(files, ['api_20260101.1.log.gz', f'api_{today}.log'])
+        self.assertEqual(self.read('api_20260101.1.log.gz'), ['first day'])
+        self.assertEqual(self.read(f'api_{today}.log'), ['second day'])
+
+    def test_size_rotation_numbers_and_prunes_the_compressed_files(self):
+        handler = self.handler(max_bytes=25, backup_count=2)
+        for i in range(5):
+            self.log(handler, f'message {i} ' + 'x' * 10)
+
+        today = datetime.now().strftime('%Y%m%d')
+        files = sorted(name for name in os.listdir(self.directory) if not name.startswith('.'))
+        # Every message filled a file; rotations 1 and 2 were pruned
+        self.assertEqual(files, [f'api_{today}.3.log.gz', f'api_{today}.4.log.gz', f'api_{today}.log'])
+        self.assertEqual(self.read(f'api_{today}.3.log.gz'), ['message 2 ' + 'x' * 10])
+        self.assertEqual(self.read(f'api_{today}.4.log.gz'), ['message 3 ' + 'x' * 10])
+        self.assertEqual(self.read(f'api_{today}.log'), ['message 4 ' + 'x' * 10])
@@ -5,6 +5,7 @@ urlpatterns = [
 
     ## login urls ##
     path('login/', LoginView.as_view(), name='login'),
+    path('logout/', LogoutView.as_view(), name='logout'),
 
     ## User urls ##
     path('blood-banks/', BloodBankView.as_view(), name='blood-bank-list'),
@@ -4,35 +4,21 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.db import transaction
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from .serializers import *
 from .permissions import *
 from .models import *
+from .pagination import UserListPagination
+from .authentication import get_tokens_for_user
+from .backends import is_unverified_blood_bank
+from .revocation import revoke_token
+from raktkadi.log_payloads import Payload, log_payload
+from raktkadi.views import AsyncAPIView
 import logging
-import time
-from functools import wraps
 
 logger = logging.getLogger('api_logger')
 User = get_user_model()
 
-def log_execution_time(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        execution_time = (end_time - start_time) * 1000  # Convert to milliseconds
-        
-        # Get view class name and method
-        view_class = args[0].__class__.__name__
-        method_name = func.__name__
-        
-        logger.info(f"{view_class}.{method_name} took {execution_time:.2f}ms to execute")
-        return result
-    return wrapper
-
-@log_execution_time
 def home_view(request):
     logger.info(f"Home page accessed - IP: {request.META.get('REMOTE_ADDR')}")
     return render(request, 'home.html')
@@ -41,46 +27,60 @@ class LoginView(APIView):
     permission_classes = [AllowAny]
     serializer_class = LoginSerializer
 
-    @log_execution_time
     def post(self, request):
-        logger.info(f"Login attempt - Email: {request.data.get('email')}")
+        log_payload(logger, 'LoginView', "Login attempt", request.data)
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             user = serializer.validated_data
 
-            if user.user_type == 'BLOOD_BANK' and user.blood_bank_profile.status != 'VERIFIED':
-                logger.warning(f"Login attempt by unverified blood bank - Email: {user.email}")
+            if is_unverified_blood_bank(user):
+                logger.warning("Login attempt by unverified blood bank - Email: %s", user.email)
                 return Response({
                     "error": "Your blood bank account is pending verification. Please wait for admin approval."
                 }, status=status.HTTP_403_FORBIDDEN)
 
-            refresh = RefreshToken.for_user(user)
+            refresh = get_tokens_for_user(user)
             user_type = user.user_type
-            logger.info(f"Successful login - Email: {user.email}, Type: {user_type}")
+            logger.info("Successful login - Email: %s, Type: %s", user.email, user_type)
             return Response({
                 "refresh": str(refresh),
                 "access": str(refresh.access_token),
                 "user_type": user_type
             }, status=status.HTTP_200_OK)
-        logger.warning(f"Failed login attempt - Errors: {serializer.errors}")
+        logger.warning(
+            "Failed login attempt - Errors: %s, Data: %s", serializer.errors, Payload(request.data, full=True)
+        )
         return Response(serializer.errors, status=status.HTTP_200_OK)
 
+class LogoutView(APIView):
+    """Revokes the access token the request was authenticated with."""
+    permission_classes = [IsAuthenticated]
+
+    @transaction.atomic
+    def post(self, request):
+        revoke_token(request.auth, 'logout')
+        logger.info("Logout - Email: %s", request.user.email)
+        return Response({"message": "Logged out successfully"}, status=status.HTTP_200_OK)
+
 class BloodBankView(APIView):
     permission_classes = [AllowAny]
 
-    @log_execution_time
     def get(self, request, email=None):
         logger.info(f"Blood bank fetch - Email: {email if email else 'all'}")
         if email:
-            blood_bank = get_object_or_404(User, email=email, user_type='BLOOD_BANK')
+            blood_bank = get_object_or_404(BloodBankSerializer.setup_eager_loading(User.objects), email=email, user_type='BLOOD_BANK')
             serializer = BloodBankSerializer(blood_bank)
             return Response(serializer.data)
-        blood_banks = User.objects.filter(user_type='BLOOD_BANK')
-        serializer = BloodBankSerializer(blood_banks, many=True)
-        return Response(serializer.data)
+        paginator = UserListPagination()
+        reader = BloodBankSerializer.values_serializer()
+        blood_banks = paginator.paginate_queryset(
+            reader.values(User.objects.filter(user_type='BLOOD_BANK'), *paginator.cursor_fields()),
+            request,
+            view=self
+        )
+        return paginator.get_paginated_response(reader.data(blood_banks))
 
     @transaction.atomic
-    @log_execution_time
     def post(self, request):
         logger.info("Blood bank registration attempt")
         serializer = BloodBankRegistrationSerializer(data=request.data)
@@ -97,11 +97,11 @@ class BloodBankView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @transaction.atomic
-    @log_execution_time
     def put(self, request, email):
         logger.info(f"Blood bank update attempt - Email: {email}")
         try:
-            blood_bank = get_object_or_404(User, email=email, user_type='BLOOD_BANK')
+            User.objects.lock(email=email, user_type='BLOOD_BANK')
+            blood_bank = get_object_or_404(BloodBankSerializer.setup_eager_loading(User.objects), email=email, user_type='BLOOD_BANK')
             serializer = BloodBankSerializer(blood_bank, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -113,7 +113,6 @@ class BloodBankView(APIView):
             logger.error(f"Blood bank not found - Email: {email}")
             return Response({"error": "Blood bank not found"}, status=status.HTTP_404_NOT_FOUND)
         
-    @log_execution_time
     def delete(self, request, email):
         logger.info(f"Blood bank deletion attempt - Email: {email}")
         try:
@@ -125,39 +124,51 @@ class BloodBankView(APIView):
             logger.error(f"Blood bank not found for deletion - Email: {email}")
             return Response({"error": "Blood bank not found"}, status=status.HTTP_404_NOT_FOUND)
 
-class VerifiedBloodBankView(APIView):
+class VerifiedBloodBankView(AsyncAPIView):
     permission_classes = [AllowAny]
 
-    @log_execution_time
-    def get(self, request):
+    async def get(self, request):
         logger.info("Fetching verified blood banks")
-        verified_blood_banks = User.objects.filter(user_type='BLOOD_BANK', blood_bank_profile__status='VERIFIED')
-        serializer = BloodBankSerializer(verified_blood_banks, many=True)
+        paginator = UserListPagination()
+        reader = BloodBankSerializer.values_serializer()
+        verified_blood_banks = await paginator.apaginate_queryset(
+            reader.values(
+                User.objects.filter(user_type='BLOOD_BANK', blood_bank_profile__status='VERIFIED'),
+                *paginator.cursor_fields()
+            ),
+            request,
+            view=self
+        )
         logger.info(f"Retrieved {len(verified_blood_banks)} verified blood banks")
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return paginator.get_paginated_response(reader.data(verified_blood_banks))
 
 class StaffView(APIView):
     permission_classes = [AllowAny]
 
-    @log_execution_time
     def get(self, request, email=None):
         logger.info(f"Staff fetch - Email: {email if email else 'all'}")
         if email:
-            staff = get_object_or_404(User, email=email, user_type='STAFF')
+            staff = get_object_or_404(StaffSerializer.setup_eager_loading(User.objects), email=email, user_type='STAFF')
             serializer = StaffSerializer(staff)
             return Response(serializer.data)
-        staff_members = User.objects.filter(user_type='STAFF')
-        serializer = StaffSerializer(staff_members, many=True)
-        return Response(serializer.data)
+        paginator = UserListPagination()
+        reader = StaffSerializer.values_serializer()
+        staff_members = paginator.paginate_queryset(
+            reader.values(User.objects.filter(user_type='STAFF'), *paginator.cursor_fields()),
+            request,
+            view=self
+        )
+        return paginator.get_paginated_response(reader.data(staff_members))
 
-    @transaction.atomic
-    @log_execution_time
     def post(self, request):
         logger.info("Staff registration attempt")
         serializer = StaffRegistrationSerializer(data=request.data)
+        # Validated before the transaction: its blood bank read would
+        # otherwise come before the inserts and need a lock upgrade
         if serializer.is_valid():
             try:
-                user = serializer.save()
+                with transaction.atomic():
+                    user = serializer.save()
                 logger.info(f"Staff registered successfully - Email: {user.email}")
                 response_serializer = StaffSerializer(user)
                 return Response(response_serializer.data, status=status.HTTP_201_CREATED)
@@ -168,11 +179,11 @@ class StaffView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @transaction.atomic
-    @log_execution_time
     def put(self, request, email):
         logger.info(f"Staff update attempt - Email: {email}")
         try:
-            staff = get_object_or_404(User, email=email, user_type='STAFF')
+            User.objects.lock(email=email, user_type='STAFF')
+            staff = get_object_or_404(StaffSerializer.setup_eager_loading(User.objects), email=email, user_type='STAFF')
             serializer = StaffSerializer(staff, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -184,7 +195,6 @@ class StaffView(APIView):
             logger.error(f"Staff not found - Email: {email}")
             return Response({"error": "Staff member not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    @log_execution_time
     def delete(self, request, email):
         logger.info(f"Staff deletion attempt - Email: {email}")
         try:
@@ -199,19 +209,22 @@ class StaffView(APIView):
 class DonorView(APIView):
     permission_classes = [AllowAny]
 
-    @log_execution_time
     def get(self, request, email=None):
         logger.info(f"Donor fetch - Email: {email if email else 'all'}")
         if email:
-            donor = get_object_or_404(User, email=email, user_type='DONOR')
+            donor = get_object_or_404(DonorSerializer.setup_eager_loading(User.objects), email=email, user_type='DONOR')
             serializer = DonorSerializer(donor)
             return Response(serializer.data)
-        donors = User.objects.filter(user_type='DONOR')
-        serializer = DonorSerializer(donors, many=True)
-        return Response(serializer.data)
+        paginator = UserListPagination()
+        reader = DonorSerializer.values_serializer()
+        donors = paginator.paginate_queryset(
+            reader.values(User.objects.filter(user_type='DONOR'), *paginator.cursor_fields()),
+            request,
+            view=self
+        )
+        return paginator.get_paginated_response(reader.data(donors))
 
     @transaction.atomic
-    @log_execution_time
     def post(self, request):
         logger.info("Donor registration attempt")
         serializer = DonorRegistrationSerializer(data=request.data)
@@ -228,11 +241,11 @@ class DonorView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @transaction.atomic
-    @log_execution_time
     def put(self, request, email):
         logger.info(f"Donor update attempt - Email: {email}")
         try:
-            donor = get_object_or_404(User, email=email, user_type='DONOR')
+            User.objects.lock(email=email, user_type='DONOR')
+            donor = get_object_or_404(DonorSerializer.setup_eager_loading(User.objects), email=email, user_type='DONOR')
             serializer = DonorSerializer(donor, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -244,7 +257,6 @@ class DonorView(APIView):
             logger.error(f"Donor not found - Email: {email}")
             return Response({"error": "Donor not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    @log_execution_time
     def delete(self, request, email):
         logger.info(f"Donor deletion attempt - Email: {email}")
         try:
@@ -259,19 +271,22 @@ class DonorView(APIView):
 class ConsumerView(APIView):
     permission_classes = [AllowAny]
 
-    @log_execution_time
     def get(self, request, email=None):
         logger.info(f"Consumer fetch - Email: {email if email else 'all'}")
         if email:
-            consumer = get_object_or_404(User, email=email, user_type='CONSUMER')
+            consumer = get_object_or_404(ConsumerSerializer.setup_eager_loading(User.objects), email=email, user_type='CONSUMER')
             serializer = ConsumerSerializer(consumer)
             return Response(serializer.data)
-        consumers = User.objects.filter(user_type='CONSUMER')
-        serializer = ConsumerSerializer(consumers, many=True)
-        return Response(serializer.data)
+        paginator = UserListPagination()
+        reader = ConsumerSerializer.values_serializer()
+        consumers = paginator.paginate_queryset(
+            reader.values(User.objects.filter(user_type='CONSUMER'), *paginator.cursor_fields()),
+            request,
+            view=self
+        )
+        return paginator.get_paginated_response(reader.data(consumers))
 
     @transaction.atomic
-    @log_execution_time
     def post(self, request):
         logger.info("Consumer registration attempt")
         serializer = ConsumerRegistrationSerializer(data=request.data)
@@ -288,11 +303,11 @@ class ConsumerView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @transaction.atomic
-    @log_execution_time
     def put(self, request, email):
         logger.info(f"Consumer update attempt - Email: {email}")
         try:
-            consumer = get_object_or_404(User, email=email, user_type='CONSUMER')
+            User.objects.lock(email=email, user_type='CONSUMER')
+            consumer = get_object_or_404(ConsumerSerializer.setup_eager_loading(User.objects), email=email, user_type='CONSUMER')
             serializer = ConsumerSerializer(consumer, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -304,7 +319,6 @@ class ConsumerView(APIView):
             logger.error(f"Consumer not found - Email: {email}")
             return Response({"error": "Consumer not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    @log_execution_time
     def delete(self, request, email):
         logger.info(f"Consumer deletion attempt - Email: {email}")
         try:
@@ -319,7 +333,6 @@ class ConsumerView(APIView):
 class Test_blood_bank(APIView):
     permission_classes = [IsBloodBank]
 
-    @log_execution_time
     def get(self, request, *args, **kwargs):
         logger.info(f"Test blood bank access - User: {request.user.email}")
         return Response({"message": "Welcome Blood Bank!"})
@@ -327,7 +340,6 @@ class Test_blood_bank(APIView):
 class Test_staff(APIView):
     permission_classes = [IsStaff]
 
-    @log_execution_time
     def get(self, request, *args, **kwargs):
         logger.info(f"Test staff access - User: {request.user.email}")
         return Response({"message": "Welcome staff!"})
@@ -335,7 +347,6 @@ class Test_staff(APIView):
 class Test_donor(APIView):
     permission_classes = [IsDonor]
 
-    @log_execution_time
     def get(self, request, *args, **kwargs):
         logger.info(f"Test donor access - User: {request.user.email}")
         return Response({"message": "Welcome donor!"})
@@ -343,7 +354,6 @@ class Test_donor(APIView):
 class Test_consumer(APIView):
     permission_classes = [IsConsumer]
     
-    @log_execution_time
     def get(self, request, *args, **kwargs):
         logger.info(f"Test consumer access - User: {request.user.email}")
         return Response({"message": "Welcome consumer!"})
\ No newline at end of file